@@ -0,0 +1,70 @@
+"""
+Measure p50/p99 latency of /api/projects and /api/sessions/{id} against the local database.
+
+Runs the requests in-process through FastAPI's TestClient, with the startup
+scan and watcher disabled and one long-lived event loop so worker threads (and
+their pooled connections) are reused. Each endpoint is measured once with the
+pooled Storage connections and once with a fresh connection per call, which is
+how every Storage/Analytics method worked before pooling.
+
+    python benchmarks/api_latency.py [--requests N] [--session SESSION_ID]
+"""
+import argparse
+import sqlite3
+import statistics
+import time
+
+from fastapi.testclient import TestClient
+
+from claude_viewer import server
+from claude_viewer.storage import Storage
+
+
+def fresh_reader(self):
+    conn = sqlite3.connect(self.db_path)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def measure(client, path, requests):
+    client.get(path)  # warm up
+    samples = []
+    for _ in range(requests):
+        start = time.perf_counter()
+        response = client.get(path)
+        samples.append((time.perf_counter() - start) * 1000)
+        response.raise_for_status()
+    quantiles = statistics.quantiles(samples, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--requests", type=int, default=500, help="Requests per endpoint and mode")
+    ap.add_argument("--session", help="Session to fetch (default: the one with the most messages)")
+    args = ap.parse_args()
+
+    session_id = args.session
+    if session_id is None:
+        row = server.storage.reader().execute(
+            "SELECT session_id FROM messages GROUP BY session_id ORDER BY count(*) DESC LIMIT 1"
+        ).fetchone()
+        if row is None:
+            raise SystemExit(f"No sessions in {server.DB_PATH}, run the server once to scan the logs")
+        session_id = row[0]
+
+    server.app.router.on_startup.clear()
+    paths = ["/api/projects", f"/api/sessions/{session_id}"]
+    pooled_reader = Storage.reader
+
+    with TestClient(server.app) as client:
+        for mode in ("per-call", "pooled"):
+            Storage.reader = fresh_reader if mode == "per-call" else pooled_reader
+            for path in paths:
+                p50, p99 = measure(client, path, args.requests)
+                print(f"{mode:>8}  {path:<50} p50 {p50:7.2f} ms  p99 {p99:7.2f} ms")
+    Storage.reader = pooled_reader
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Time reading many files at a commit: one `git show` per file vs the shared `git cat-file --batch` process.
+
+Builds a throwaway repository with --files files of --lines lines in one commit,
+then reads all of them at HEAD with a `git show HEAD:path` subprocess per file,
+with GitObjectStore.read_blobs (one request over the long-lived process, first
+call includes starting it, then warm), and from the working tree with open()
+for reference.
+
+    python benchmarks/git_blob_reads.py [--files N] [--lines N]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+from pathlib import Path
+
+from claude_viewer.git_objects import GitObjectStore
+
+
+def build_repo(root: Path, files: int, lines: int):
+    env = dict(os.environ, GIT_AUTHOR_NAME="bench", GIT_AUTHOR_EMAIL="bench@localhost",
+               GIT_COMMITTER_NAME="bench", GIT_COMMITTER_EMAIL="bench@localhost")
+    subprocess.run(["git", "init", "-q"], cwd=root, check=True)
+    paths = []
+    for f in range(files):
+        path = f"src/pkg_{f % 20}/module_{f}.py"
+        (root / path).parent.mkdir(parents=True, exist_ok=True)
+        (root / path).write_text("\n".join(f"value_{f}_{i} = {i}" for i in range(lines)), encoding="utf-8")
+        paths.append(path)
+    subprocess.run(["git", "add", "-A"], cwd=root, check=True)
+    subprocess.run(["git", "commit", "-qm", "bench"], cwd=root, check=True, env=env)
+    return paths
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--files", type=int, default=500)
+    ap.add_argument("--lines", type=int, default=200, help="Lines per file")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        paths = build_repo(root, args.files, args.lines)
+        print(f"{args.files} files of {args.lines} lines")
+
+        elapsed, shown = timed(lambda: [
+            subprocess.run(["git", "show", f"HEAD:{path}"], cwd=root, capture_output=True, check=True).stdout
+            for path in paths
+        ])
+        print(f"{'git show per file':>22} {elapsed * 1000:>9.1f}ms")
+
+        store = GitObjectStore(root)
+        try:
+            elapsed, cold = timed(lambda: store.read_blobs("HEAD", paths))
+            print(f"{'cat-file batch, cold':>22} {elapsed * 1000:>9.1f}ms")
+            elapsed, warm = timed(lambda: store.read_blobs("HEAD", paths))
+            print(f"{'cat-file batch, warm':>22} {elapsed * 1000:>9.1f}ms")
+        finally:
+            store.close()
+
+        elapsed, opened = timed(lambda: [(root / path).read_bytes() for path in paths])
+        print(f"{'open() working tree':>22} {elapsed * 1000:>9.1f}ms")
+
+        assert shown == cold == warm == opened
+
+
+if __name__ == "__main__":
+    main()
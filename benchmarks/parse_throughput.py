@@ -0,0 +1,59 @@
+"""
+Measure LogParser.parse_session throughput (MB/s) on a directory of session logs.
+
+Runs every .jsonl file through the parser with and without the bytes-level
+line prefilter and lazy toolUseResult decoding, so both numbers come from the
+same corpus and page cache.
+
+    python benchmarks/parse_throughput.py [LOG_DIR] [--repeat N]
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+
+from claude_viewer import parser as parser_module
+from claude_viewer.config import CLAUDE_LOG_PATH
+from claude_viewer.parser import LogParser
+
+
+def run(files, repeat):
+    parser = LogParser(Path("."))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        messages = 0
+        for file_path in files:
+            messages += len(parser.parse_session(str(file_path))["messages"])
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, messages
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("log_dir", nargs="?", default=str(CLAUDE_LOG_PATH))
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per mode, the fastest is reported")
+    args = ap.parse_args()
+
+    files = sorted(Path(args.log_dir).glob("*/*.jsonl"))
+    total_mb = sum(f.stat().st_size for f in files) / (1024 * 1024)
+    print(f"{len(files)} files, {total_mb:.1f} MB")
+
+    can_skip_line, decode_record = parser_module._can_skip_line, parser_module._decode_record
+    results = {}
+    for mode in ("full decode", "prefilter"):
+        if mode == "prefilter":
+            parser_module._can_skip_line, parser_module._decode_record = can_skip_line, decode_record
+        else:
+            parser_module._can_skip_line, parser_module._decode_record = (lambda line: False), json.loads
+        elapsed, messages = run(files, args.repeat)
+        results[mode] = elapsed
+        print(f"{mode:>12}: {elapsed:.3f}s  {total_mb / elapsed:.1f} MB/s  ({messages} messages)")
+    parser_module._can_skip_line, parser_module._decode_record = can_skip_line, decode_record
+
+    print(f"speedup: {results['full decode'] / results['prefilter']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Time project-wide code survival: one request per session vs the project survival job.
+
+Builds a throwaway project whose files were each written by several sessions
+(the session's version is the file with a few lines changed), then scores the
+whole project three ways, with an empty survival cache each time:
+calculate_oneshot_stats for every session (one /oneshot round trip each, every
+current file read and split once per session), calculate_project_survival
+in-process, and calculate_project_survival on a process pool. Prints the
+warm (fully cached) project job last.
+
+    python benchmarks/project_survival.py [--files N] [--sessions N] [--lines N] [--workers N]
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from claude_viewer import analytics as analytics_module
+from claude_viewer.analytics import Analytics
+from claude_viewer.storage import Storage
+
+REPO = Path(__file__).resolve().parent.parent
+
+
+def build_project(storage: Storage, project_dir: Path, files: int, sessions: int, lines: int):
+    rng = random.Random(0)
+    pool = [line for path in sorted((REPO / "claude_viewer").glob("*.py"))
+            for line in path.read_text(encoding="utf-8").splitlines()]
+    contents = []
+    for f in range(files):
+        start = rng.randrange(len(pool))
+        current = (pool * (lines // len(pool) + 2))[start:start + lines]
+        (project_dir / f"module_{f}.py").write_text("\n".join(current), encoding="utf-8")
+        contents.append(current)
+
+    batch = []
+    for s in range(sessions):
+        session_id = f"session-{s:04d}"
+        msgs = []
+        for f, current in enumerate(contents):
+            written = list(current)
+            for _ in range(rng.randint(0, 10)):
+                i = rng.randrange(len(written))
+                written[i] = f"session_{s}_line_{i} = None"
+            tool_input = json.dumps({"file_path": f"module_{f}.py", "content": "\n".join(written)})
+            msgs.append({
+                "role": "assistant",
+                "timestamp": f"2026-01-01T{s % 24:02d}:{f % 60:02d}:00",
+                "blocks": [("tool_use", "Write", f"toolu_{s}_{f}", tool_input, None)],
+            })
+        info = {"session_id": session_id, "file_path": f"/logs/bench/{session_id}.jsonl"}
+        batch.append(("bench", info, msgs, {}, str(project_dir)))
+    storage.save_sessions_batch(batch)
+
+
+def clear_cache(storage: Storage):
+    storage.writer.flush()
+    storage.writer.submit(lambda c: c.execute("DELETE FROM survival_cache"), wait=True)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--files", type=int, default=200)
+    ap.add_argument("--sessions", type=int, default=20, help="Sessions, each writing every file")
+    ap.add_argument("--lines", type=int, default=1000, help="Lines per file")
+    ap.add_argument("--workers", type=int, default=None, help="Pool size (default: one per CPU, at least 2)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_dir = Path(tmp) / "project"
+        project_dir.mkdir()
+        storage = Storage(Path(tmp) / "survival.db")
+        build_project(storage, project_dir, args.files, args.sessions, args.lines)
+        analytics = Analytics(storage.db_path, storage=storage)
+        session_ids = [s["id"] for s in storage.get_sessions("bench")]
+        print(f"{args.sessions} sessions x {args.files} files of {args.lines} lines")
+
+        clear_cache(storage)
+        elapsed, per_session = timed(lambda: [analytics.calculate_oneshot_stats(sid) for sid in session_ids])
+        print(f"{'per-session requests':>24} {elapsed * 1000:>9.0f}ms")
+
+        clear_cache(storage)
+        elapsed, inline = timed(lambda: analytics.calculate_project_survival("bench", workers=1))
+        print(f"{'project job, in-process':>24} {elapsed * 1000:>9.0f}ms  ({inline['scored']} writes scored)")
+
+        clear_cache(storage)
+        workers = args.workers or max(2, os.cpu_count() or 1)
+        min_lines, analytics_module.SURVIVAL_POOL_MIN_LINES = analytics_module.SURVIVAL_POOL_MIN_LINES, 0
+        try:
+            elapsed, pooled = timed(lambda: analytics.calculate_project_survival("bench", workers=workers))
+        finally:
+            analytics_module.SURVIVAL_POOL_MIN_LINES = min_lines
+        print(f"{'project job, pool':>24} {elapsed * 1000:>9.0f}ms  ({workers} workers)")
+
+        storage.writer.flush()
+        elapsed, warm = timed(lambda: analytics.calculate_project_survival("bench"))
+        print(f"{'project job, cached':>24} {elapsed * 1000:>9.0f}ms  ({warm['cached']} writes cached)")
+
+        scores = {s["session_id"]: s["overall_score"] for s in inline["sessions"]}
+        assert scores == {s["session_id"]: s["overall_score"] for s in pooled["sessions"]}
+        assert scores == {sid: stats["overall_score"] for sid, stats in zip(session_ids, per_session)}
+        assert inline["files"] == pooled["files"] == warm["files"]
+
+
+if __name__ == "__main__":
+    main()
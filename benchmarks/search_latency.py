@@ -0,0 +1,87 @@
+"""
+Measure /api/search query latency (Storage.search_messages) on a synthetic corpus.
+
+Builds a throwaway database with N messages of Zipf-distributed words (so there
+are rare, medium and very common terms), then reports p50/p99 for ranked
+queries, filtered queries and a second page.
+
+    python benchmarks/search_latency.py [--messages N] [--repeat N]
+"""
+import argparse
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from claude_viewer.storage import Storage, serialize_session
+
+VOCABULARY = [f"word{i}" for i in range(20000)]
+MESSAGES_PER_SESSION = 200
+
+
+def build_corpus(storage: Storage, messages: int):
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(len(VOCABULARY))]
+    sessions = max(1, messages // MESSAGES_PER_SESSION)
+    start = time.perf_counter()
+    for chunk in range(0, sessions, 50):
+        records = []
+        for s in range(chunk, min(chunk + 50, sessions)):
+            info = {"session_id": f"session-{s:06d}", "file_path": f"/logs/p/{s}.jsonl"}
+            msgs = []
+            for m in range(MESSAGES_PER_SESSION):
+                text = " ".join(rng.choices(VOCABULARY, weights, k=40))
+                msgs.append({
+                    "role": "user" if m % 2 == 0 else "assistant",
+                    "timestamp": f"2026-{1 + s % 12:02d}-{1 + m % 28:02d}T00:00:{m % 60:02d}",
+                    "blocks": [("text", None, None, None, text)],
+                })
+            project = f"project-{s % 20}"
+            records.append((project, None, *serialize_session(project, info, msgs, {"model": f"model-{s % 3}"})))
+        storage.save_serialized_batch(records)
+    storage.optimize_search_index()
+    print(f"built {sessions * MESSAGES_PER_SESSION} messages in {time.perf_counter() - start:.1f}s")
+
+
+def measure(fn, repeat):
+    fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    quantiles = statistics.quantiles(samples, n=100)
+    return quantiles[49], quantiles[98]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--messages", type=int, default=1_000_000)
+    ap.add_argument("--repeat", type=int, default=50, help="Runs per query")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = Storage(Path(tmp) / "search.db")
+        build_corpus(storage, args.messages)
+
+        first_page = storage.search_messages("word500")
+        cases = {
+            "rare term": lambda: storage.search_messages("word15000"),
+            "medium term": lambda: storage.search_messages("word500"),
+            "common term": lambda: storage.search_messages("word3"),
+            "two terms": lambda: storage.search_messages("word40 word900"),
+            "phrase": lambda: storage.search_messages('"word1 word2"'),
+            "medium + project": lambda: storage.search_messages("word500", project="project-7"),
+            "medium + role/date": lambda: storage.search_messages(
+                "word500", role="user", since="2026-03-01", until="2026-06-01"
+            ),
+            "medium, page 2": lambda: storage.search_messages("word500", cursor=first_page["next_cursor"]),
+        }
+        for name, fn in cases.items():
+            p50, p99 = measure(fn, args.repeat)
+            print(f"{name:>20}: p50 {p50:8.2f} ms  p99 {p99:8.2f} ms  ({len(fn()['results'])} results)")
+
+
+if __name__ == "__main__":
+    main()
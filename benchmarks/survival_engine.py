@@ -0,0 +1,153 @@
+"""
+Time the survival engine (claude_viewer.survival) against plain difflib and check it keeps the stored scores.
+
+Scores must not change with the implementation: the engine counts difflib's
+matching blocks (longest block first, autojunk on), the count the One-Shot
+percentages have always used. The check runs the frozen corpus in
+tests/fixtures/survival_corpus.json, the same one tests/test_survival.py uses,
+and fails on any retained count that differs from the stored one.
+
+The engine is faster only where that is exact: a file still as the session
+wrote it is counted with one list comparison, and the project survival job
+indexes each current file once for all the writes to it (survival_against_file)
+instead of once per write. Edited single files cost what difflib costs, on
+code and on repetitive content alike.
+
+    python benchmarks/survival_engine.py [--sizes 1000,5000,20000] [--writes 20]
+"""
+import argparse
+import difflib
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from claude_viewer.survival import retained_lines, survival, survival_against_file
+
+REPO = Path(__file__).resolve().parent.parent
+CORPUS = REPO / "tests" / "fixtures" / "survival_corpus.json"
+
+
+def difflib_retained(a, b) -> int:
+    """Retained lines as the One-Shot stats counted them before the survival engine."""
+    return sum(block.size for block in difflib.SequenceMatcher(None, a, b).get_matching_blocks())
+
+
+def _edit_small(rng, lines):
+    lines = list(lines)
+    for _ in range(rng.randint(1, 3)):
+        i = rng.randrange(len(lines))
+        lines[i] = lines[i] + "  # fixed"
+    return lines
+
+
+def _edit_refactor(rng, lines):
+    # Rewrite a random share of the lines, interleaved with the kept ones
+    share = rng.uniform(0.2, 0.8)
+    return [f"rewritten_{i} = {rng.random()}" if rng.random() < share else line for i, line in enumerate(lines)]
+
+
+def _edit_shuffle_functions(rng, lines):
+    # Reorder top-level chunks (split at blank lines), like reorganizing a module
+    chunks, chunk = [], []
+    for line in lines:
+        chunk.append(line)
+        if not line.strip():
+            chunks.append(chunk)
+            chunk = []
+    chunks.append(chunk)
+    rng.shuffle(chunks)
+    return [line for chunk in chunks for line in chunk]
+
+
+EDITS = [
+    ("unchanged", lambda rng, lines: list(lines)),
+    ("small", _edit_small),
+    ("refactor", _edit_refactor),
+    ("shuffle", _edit_shuffle_functions),
+]
+
+
+def check_corpus() -> bool:
+    corpus = json.loads(CORPUS.read_text(encoding="utf-8"))
+    failures = []
+    for case in corpus["cases"]:
+        base = corpus["bases"][case["base"]]
+        session = base[case["session"][0]:case["session"][1]] if case["session"] else base
+        current = [base[line] if isinstance(line, int) else line for line in case["current"]]
+        retained = retained_lines(session, current)
+        if retained != case["retained"]:
+            failures.append((case["name"], case["retained"], retained))
+    print(f"corpus: {len(corpus['cases'])} cases, {len(failures)} with a changed score")
+    for name, expected, retained in failures:
+        print(f"FAIL {name}: stored {expected} engine {retained}")
+    return not failures
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def source_lines():
+    return [line for path in sorted((REPO / "claude_viewer").glob("*.py"))
+            for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def bench_files(sizes):
+    rng = random.Random(1)
+    pool = source_lines()
+    print(f"{'lines':>7} {'content':>10} {'edit':>9} {'difflib':>10} {'engine':>10} {'speedup':>8} {'score %':>8}")
+    for size in sizes:
+        start = rng.randrange(len(pool))
+        sources = {
+            "code": (pool * (size // len(pool) + 2))[start:start + size],
+            # Generated code, fixtures, CSS: ~100 distinct lines, each just under the autojunk threshold
+            "repetitive": [f"    value_{rng.randrange(max(1, size // 49))} = 0" for _ in range(size)],
+        }
+        for content, session in sources.items():
+            for name, edit in EDITS:
+                current = edit(rng, session)
+                old_time, old = timed(difflib_retained, session, current)
+                new_time, new = timed(retained_lines, session, current)
+                assert new == old, (size, content, name, old, new)
+                print(f"{size:>7} {content:>10} {name:>9} {old_time * 1000:>8.1f}ms {new_time * 1000:>8.1f}ms "
+                      f"{old_time / new_time:>7.1f}x {new / size * 100:>8.1f}")
+
+
+def bench_writes(sizes, writes: int):
+    """Many sessions' writes to one file: one matcher per write vs survival_against_file."""
+    rng = random.Random(2)
+    pool = source_lines()
+    print(f"\n{'lines':>7} {'writes':>7} {'per write':>10} {'per file':>10} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "current.py"
+        for size in sizes:
+            start = rng.randrange(len(pool))
+            current = (pool * (size // len(pool) + 2))[start:start + size]
+            path.write_text("\n".join(current), encoding="utf-8")
+            contents = ["\n".join(_edit_small(rng, current)) for _ in range(writes)]
+            old_time, old = timed(lambda: [survival(content, path.read_text(encoding="utf-8")) for content in contents])
+            new_time, new = timed(survival_against_file, str(path), contents)
+            assert new == old
+            print(f"{size:>7} {writes:>7} {old_time * 1000:>8.1f}ms {new_time * 1000:>8.1f}ms {old_time / new_time:>7.1f}x")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--sizes", default="1000,5000,20000", help="Comma-separated line counts to time")
+    ap.add_argument("--writes", type=int, default=20, help="Writes scored against one file")
+    args = ap.parse_args()
+
+    ok = check_corpus()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    bench_files(sizes)
+    bench_writes(sizes, args.writes)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
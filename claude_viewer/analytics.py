@@ -1,48 +1,150 @@
-import sqlite3
 import subprocess
 import os
-import json
-import re
+import multiprocessing
 import difflib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, Any, List, Optional
-from .storage import Storage
+from .git_objects import GitObjectStore, object_store
+from .storage import Storage, unpack_text
+from .survival import survival, survival_against_file
+
+# Default number of points a token usage series is downsampled to
+DEFAULT_SERIES_POINTS = 300
+# Project survival jobs scoring fewer session lines than this run in-process;
+# starting worker processes would take longer than the scoring itself
+SURVIVAL_POOL_MIN_LINES = 1_000_000
+# What calculate_oneshot_stats scores against: the working tree, HEAD, or the
+# first commit made at or after the session's last message
+ONESHOT_SOURCES = ("worktree", "head", "session_end")
+# Change indexes (per session) and diffs (per change) kept by get_session_changes/get_change_diff
+CHANGE_INDEX_CACHE_SIZE = 32
+CHANGE_DIFF_CACHE_SIZE = 256
+
+
+class GitReadError(Exception):
+    """Reading files from the project's git repository failed (see GitObjectStore.read_blobs)."""
+
+
+def lttb(points: List[Dict[str, Any]], threshold: int, x: str, y: str) -> List[Dict[str, Any]]:
+    """
+    Downsample a series with Largest-Triangle-Three-Buckets.
+
+    Keeps the first and last point and, from each of threshold - 2 equal buckets in
+    between, the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, which preserves the visual shape.
+
+    Args:
+        points: Series ordered by x
+        threshold: Number of points to keep
+        x, y: Keys of the coordinates in each point
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        # Average of the next bucket (the last point for the final bucket)
+        avg_start = int((i + 1) * every) + 1
+        avg_end = min(int((i + 2) * every) + 1, n)
+        bucket = points[avg_start:avg_end]
+        avg_x = sum(p[x] for p in bucket) / len(bucket)
+        avg_y = sum(p[y] for p in bucket) / len(bucket)
+
+        ax, ay = points[a][x], points[a][y]
+        best_area = -1
+        best = int(i * every) + 1
+        for j in range(int(i * every) + 1, int((i + 1) * every) + 1):
+            area = abs((ax - avg_x) * (points[j][y] - ay) - (ax - points[j][x]) * (avg_y - ay))
+            if area > best_area:
+                best_area = area
+                best = j
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+class LRUCache:
+    """Thread-safe mapping that keeps the most recently used `size` entries."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.size:
+                self._items.popitem(last=False)
+
+
+def _epoch(timestamp: str) -> Optional[float]:
+    """Unix time of an ISO 8601 log timestamp; naive timestamps are UTC, as the logs write them."""
+    try:
+        parsed = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _isoformat(epoch: float) -> str:
+    return datetime.fromtimestamp(epoch, timezone.utc).isoformat()
+
 
 class Analytics:
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path, storage: Optional[Storage] = None):
         self.db_path = db_path
-        self.storage = Storage(db_path)
+        # Share the server's Storage so its pooled reader connections are reused
+        self.storage = storage or Storage(db_path)
+        # Keyed by session generation, so entries of re-ingested sessions are never served
+        self._change_indexes = LRUCache(CHANGE_INDEX_CACHE_SIZE)
+        self._change_diffs = LRUCache(CHANGE_DIFF_CACHE_SIZE)
 
     def get_stats(self) -> Dict[str, Any]:
-        """Aggregate stats from the DB."""
-        with sqlite3.connect(self.db_path) as db:
+        """Aggregate stats from the rollup tables, which Storage keeps current on every write."""
+        with self.storage.reader() as db:
             total_projects = db.execute("SELECT COUNT(*) FROM projects").fetchone()[0]
-            total_sessions = db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
-            total_messages = db.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
-            
-            # Messages over time (group by day) - limit to last 30 days
+            total_sessions, total_messages, total_tokens = db.execute(
+                "SELECT SUM(sessions), SUM(messages), SUM(tokens) FROM rollup_projects"
+            ).fetchone()
+            total_sessions = total_sessions or 0
+            total_messages = total_messages or 0
+            total_tokens = total_tokens or 0
+
+            # Messages over time (group by day) - last 365 active days
             daily_activity = db.execute("""
-                SELECT 
-                    date(m.timestamp), 
-                    count(m.id),
-                    count(DISTINCT s.id),
-                    count(DISTINCT s.project_name)
-                FROM messages m
-                JOIN sessions s ON m.session_id = s.id
-                WHERE m.timestamp IS NOT NULL 
-                GROUP BY date(m.timestamp) 
-                ORDER BY date(m.timestamp) DESC 
+                SELECT day, SUM(messages), count(*), count(DISTINCT project_name)
+                FROM rollup_session_days
+                GROUP BY day
+                ORDER BY day DESC
                 LIMIT 365
             """).fetchall()
 
             # Stats by Tag
             tag_stats_rows = db.execute("""
-                SELECT t.name, t.color, count(DISTINCT s.id) as sessions, count(m.id) as messages
-                FROM tags t
-                JOIN session_tags st ON t.id = st.tag_id
-                JOIN sessions s ON st.session_id = s.id
-                LEFT JOIN messages m ON s.id = m.session_id
-                GROUP BY t.id
+                SELECT t.name, t.color, r.sessions, r.messages
+                FROM rollup_tags r
+                JOIN tags t ON t.id = r.tag_id
+                WHERE r.sessions > 0
+                ORDER BY t.id
             """).fetchall()
             
             tag_stats = [
@@ -50,29 +152,17 @@ class Analytics:
                 for r in tag_stats_rows
             ]
 
-            # Token Stats
-            total_tokens = db.execute("SELECT SUM(total_tokens) FROM sessions").fetchone()[0] or 0
-            
             # Model Usage
             model_stats_rows = db.execute("""
-                SELECT model, count(*) 
-                FROM sessions 
-                WHERE model IS NOT NULL 
-                GROUP BY model
+                SELECT model, sessions
+                FROM rollup_models
+                WHERE sessions > 0
+                ORDER BY model
             """).fetchall()
             model_stats = [{"model": r[0], "count": r[1]} for r in model_stats_rows]
 
-            # Hourly Activity
-            hourly_activity_rows = db.execute("""
-                SELECT strftime('%H', timestamp) as hour, count(*)
-                FROM messages
-                WHERE timestamp IS NOT NULL
-                GROUP BY hour
-                ORDER BY hour
-            """).fetchall()
-            
-            # Fill all 24 hours
-            hourly_map = {int(r[0]): r[1] for r in hourly_activity_rows if r[0] is not None}
+            # Hourly Activity, filled to all 24 hours
+            hourly_map = dict(db.execute("SELECT hour, messages FROM rollup_hours").fetchall())
             hourly_activity = [{"hour": h, "count": hourly_map.get(h, 0)} for h in range(24)]
 
         # Find the most used model
@@ -94,8 +184,7 @@ class Analytics:
 
     def get_project_details(self, project_name: str) -> Optional[Dict[str, Any]]:
         """Get detailed stats and info for a specific project."""
-        with sqlite3.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+        with self.storage.reader() as db:
             project = db.execute("SELECT * FROM projects WHERE name = ?", (project_name,)).fetchone()
             
             if not project:
@@ -172,244 +261,715 @@ class Analytics:
                 "configs": config_files
             }
 
+    def get_session_token_usage(self, session_id: str, start: Optional[str] = None, end: Optional[str] = None,
+                                points: int = DEFAULT_SERIES_POINTS) -> Dict[str, Any]:
+        """
+        Cumulative token usage of a session, downsampled with LTTB.
+
+        Args:
+            start, end: Optional ISO timestamp range of the returned points
+            points: Maximum number of points returned
+
+        Returns:
+            Dict with points (seq, timestamp and cumulative input, output, total,
+            cache_creation and cache_read tokens) and total_points before downsampling
+        """
+        with self.storage.reader() as db:
+            rows = db.execute("""
+                SELECT * FROM (
+                    SELECT seq, timestamp,
+                           SUM(input_tokens) OVER w AS input,
+                           SUM(output_tokens) OVER w AS output,
+                           SUM(cache_creation_tokens) OVER w AS cache_creation,
+                           SUM(cache_read_tokens) OVER w AS cache_read
+                    FROM token_usage
+                    WHERE session_id = ?
+                    WINDOW w AS (ORDER BY seq)
+                )
+                WHERE (? IS NULL OR timestamp >= ?) AND (? IS NULL OR timestamp <= ?)
+                ORDER BY seq
+            """, (session_id, start, start, end, end)).fetchall()
+
+        series = []
+        for row in rows:
+            point = dict(row)
+            point['total'] = point['input'] + point['output']
+            series.append(point)
+
+        return {
+            "points": lttb(series, points, x='seq', y='total'),
+            "total_points": len(series)
+        }
+
+    def get_token_timeline(self, start: Optional[str] = None, end: Optional[str] = None,
+                           points: int = DEFAULT_SERIES_POINTS, project_name: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Token usage across sessions, summed into at most `points` equal time buckets.
+
+        Args:
+            start, end: Optional ISO timestamp range
+            points: Maximum number of buckets
+            project_name: Only count sessions of this project
+
+        Returns:
+            Dict with buckets (start time, input, output, total, cache_creation,
+            cache_read tokens and number of sessions) and bucket_seconds
+        """
+        conditions = ["julianday(timestamp) IS NOT NULL"]
+        params: List[Any] = []
+        if start:
+            conditions.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            conditions.append("timestamp <= ?")
+            params.append(end)
+        if project_name:
+            conditions.append("session_id IN (SELECT id FROM sessions WHERE project_name = ?)")
+            params.append(project_name)
+        where = " AND ".join(conditions)
+
+        with self.storage.reader() as db:
+            low, high = db.execute(
+                f"SELECT MIN(julianday(timestamp)), MAX(julianday(timestamp)) FROM token_usage WHERE {where}", params
+            ).fetchone()
+            if low is None:
+                return {"buckets": [], "bucket_seconds": 0}
+
+            # Buckets in days (julianday units), at least one second wide
+            width = max((high - low) / points, 1 / 86400)
+            rows = db.execute(f"""
+                SELECT strftime('%Y-%m-%dT%H:%M:%SZ', ? + bucket * ?) AS start,
+                       input, output, cache_creation, cache_read, sessions
+                FROM (
+                    SELECT MIN(CAST((julianday(timestamp) - ?) / ? AS INTEGER), ?) AS bucket,
+                           SUM(input_tokens) AS input,
+                           SUM(output_tokens) AS output,
+                           SUM(cache_creation_tokens) AS cache_creation,
+                           SUM(cache_read_tokens) AS cache_read,
+                           COUNT(DISTINCT session_id) AS sessions
+                    FROM token_usage
+                    WHERE {where}
+                    GROUP BY bucket
+                )
+                ORDER BY bucket
+            """, [low, width, low, width, points - 1, *params]).fetchall()
+
+        buckets = []
+        for row in rows:
+            bucket = dict(row)
+            bucket['total'] = bucket['input'] + bucket['output']
+            buckets.append(bucket)
+
+        return {
+            "buckets": buckets,
+            "bucket_seconds": round(width * 86400, 3)
+        }
+
+    def _generation(self, session_id: str) -> Optional[int]:
+        with self.storage.reader() as db:
+            row = db.execute("SELECT generation FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
     def get_session_changes(self, session_id: str) -> List[Dict[str, Any]]:
-        """Extracts file changes from a session's messages."""
-        with sqlite3.connect(self.db_path) as conn:
-            conn.row_factory = sqlite3.Row
-            c = conn.cursor()
-            
-            c.execute("""
-                SELECT content, timestamp 
-                FROM messages 
-                WHERE session_id = ? AND role = 'assistant'
-                ORDER BY timestamp ASC
-            """, (session_id,))
-            
-            messages = c.fetchall()
-        
+        """
+        Index of a session's file changes, read from the tool_calls table filled at ingest.
+
+        Contents and diffs are left out, see get_change_diff. size, added and removed
+        were computed at ingest (see tool_calls.change_stats), so no content is read.
+
+        Returns:
+            [{id, tool, type, path, timestamp, size, added, removed}] in session order,
+            size being the new content's length in bytes
+        """
+        generation = self._generation(session_id)
+        if generation is None:
+            return []
+        cached = self._change_indexes.get((session_id, generation))
+        if cached is not None:
+            return cached
+
+        with self.storage.reader() as conn:
+            rows = conn.execute("""
+                SELECT id, tool_name, change_type, path, timestamp, size, added, removed
+                FROM tool_calls
+                WHERE session_id = ? AND change_type IS NOT NULL
+                ORDER BY timestamp ASC, message_id ASC, ordinal ASC
+            """, (session_id,)).fetchall()
+
         changes = []
-        
-        # Regex to find tool-use blocks
-        # Format: <tool-use name="ToolName">\n{JSON}\n</tool-use>
-        tool_pattern = re.compile(r'<tool-use name="([^"]+)">\n(.*?)\n</tool-use>', re.DOTALL)
-        
-        for msg_row in messages:
-            content = msg_row['content']
-            timestamp = msg_row['timestamp']
-            
-            for match in tool_pattern.finditer(content):
-                tool_name = match.group(1)
-                input_json = match.group(2)
-                
-                # Check heuristics
-                if any(x in tool_name.lower() for x in ['write', 'edit', 'replace', 'create', 'append']):
-                    try:
-                        input_data = json.loads(input_json)
-                        
-                        path = (
-                            input_data.get('path') or 
-                            input_data.get('file_path') or 
-                            input_data.get('TargetFile') or
-                            input_data.get('filename') or
-                            input_data.get('target_file') or
-                            input_data.get('file')
-                        )
-                        
-                        if path:
-                            # Extract content or diff
-                            file_content = (
-                                input_data.get('content') or 
-                                input_data.get('code') or 
-                                input_data.get('file_content') or
-                                input_data.get('CodeContent') or 
-                                input_data.get('ReplacementContent') or
-                                input_data.get('new_string')
-                            )
-                            
-                            target_content = (
-                                input_data.get('TargetContent') or
-                                input_data.get('old_string')
-                            )
-                            
-                            # Handle chunks for multi-replace
-                            if 'ReplacementChunks' in input_data:
-                                chunks = input_data['ReplacementChunks']
-                                if isinstance(chunks, list):
-                                    targets = []
-                                    replacements = []
-                                    for i, chunk in enumerate(chunks):
-                                        targets.append(chunk.get('TargetContent', ''))
-                                        replacements.append(chunk.get('ReplacementContent', ''))
-                                    
-                                    # Use aggregated contents
-                                    if not file_content:
-                                        file_content = "\n\n... [unchanged] ...\n\n".join(replacements)
-                                    if not target_content:
-                                        target_content = "\n\n... [unchanged] ...\n\n".join(targets)
-                            
-                            # Handle 'edits' list (another format)
-                            elif 'edits' in input_data:
-                                edits = input_data['edits']
-                                if isinstance(edits, list):
-                                    targets = []
-                                    replacements = []
-                                    for i, edit in enumerate(edits):
-                                        targets.append(edit.get('old_string', ''))
-                                        replacements.append(edit.get('new_string', ''))
-                                    
-                                    if not file_content:
-                                        file_content = "\n\n... [unchanged] ...\n\n".join(replacements)
-                                    if not target_content:
-                                        target_content = "\n\n... [unchanged] ...\n\n".join(targets)
-
-                            # Generate Diff
-                            # Parse content into lines, handling potential None
-                            target_lines = (target_content or '').splitlines()
-                            file_lines = (file_content or '').splitlines()
-                            
-                            diff = ""
-                            try:
-                                diff = '\n'.join(difflib.unified_diff(
-                                    target_lines, 
-                                    file_lines, 
-                                    fromfile='Original', 
-                                    tofile='New', 
-                                    lineterm=''
-                                ))
-                            except Exception:
-                                pass
-
-                            change_type = 'write'
-                            if 'replace' in tool_name.lower() or 'edit' in tool_name.lower():
-                                change_type = 'edit'
-                                
-                            changes.append({
-                                'tool': tool_name,
-                                'type': change_type,
-                                'path': path,
-                                'timestamp': timestamp,
-                                'content': file_content,
-                                'target_content': target_content,
-                                'diff': diff
-                            })
-                            
-                    except json.JSONDecodeError:
-                        continue
-                        
+        for row in rows:
+            changes.append({
+                'id': row['id'],
+                'tool': row['tool_name'] or '',
+                'type': row['change_type'],
+                'path': row['path'],
+                'timestamp': row['timestamp'],
+                'size': row['size'] or 0,
+                'added': row['added'] or 0,
+                'removed': row['removed'] or 0
+            })
+
+        self._change_indexes.put((session_id, generation), changes)
         return changes
 
-    def calculate_oneshot_stats(self, session_id: str, exclude_extensions: List[str] = None) -> Dict[str, Any]:
-        """Calculates 'One Shot' code survival stats for a session."""
-        if exclude_extensions is None:
-            exclude_extensions = ['.md', '.txt']
-            
-        # Get project path
-        with sqlite3.connect(self.db_path) as db:
-            db.row_factory = sqlite3.Row
+    def get_change_diff(self, session_id: str, change_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Contents and unified diff of one file change, computed on first access.
+
+        Returns:
+            Dict with id, path, content, target_content and diff, or None if the
+            session has no such change
+        """
+        generation = self._generation(session_id)
+        if generation is None:
+            return None
+        key = (session_id, generation, change_id)
+        cached = self._change_diffs.get(key)
+        if cached is not None:
+            return cached
+
+        with self.storage.reader() as conn:
+            row = conn.execute("""
+                SELECT path, new_content, old_content FROM tool_calls
+                WHERE id = ? AND session_id = ? AND change_type IS NOT NULL
+            """, (change_id, session_id)).fetchone()
+        if row is None:
+            return None
+
+        file_content = unpack_text(row['new_content'])
+        target_content = unpack_text(row['old_content'])
+
+        # Generate Diff
+        # Parse content into lines, handling potential None
+        target_lines = (target_content or '').splitlines()
+        file_lines = (file_content or '').splitlines()
+
+        diff = ""
+        try:
+            diff = '\n'.join(difflib.unified_diff(
+                target_lines,
+                file_lines,
+                fromfile='Original',
+                tofile='New',
+                lineterm=''
+            ))
+        except Exception:
+            pass
+
+        change = {
+            'id': change_id,
+            'path': row['path'],
+            'content': file_content,
+            'target_content': target_content,
+            'diff': diff
+        }
+        self._change_diffs.put(key, change)
+        return change
+
+    def _session_source(self, session_id: str) -> Optional[tuple]:
+        """(project path, ingest generation) of a session, or None without a known project path."""
+        with self.storage.reader() as db:
             row = db.execute("""
-                SELECT p.path 
+                SELECT p.path, s.generation
                 FROM sessions s
                 JOIN projects p ON s.project_name = p.name
                 WHERE s.id = ?
             """, (session_id,)).fetchone()
-            
-            if not row or not row['path']:
-                return {"error": "Project path not found"}
-            
-            project_path = Path(row['path'])
-
-        changes = self.get_session_changes(session_id)
-        
-        # Group changes by file (take the latest change for each file)
-        files_map = {}
-        for change in changes:
-            path_str = change['path']
+        if not row or not row['path']:
+            return None
+        return Path(row['path']), row['generation']
+
+    def _latest_writes(self, session_id: str, exclude_extensions: List[str] = ()) -> Dict[str, int]:
+        """Path -> tool_calls id of the session's latest change to each file, in order of first change."""
+        with self.storage.reader() as db:
+            rows = db.execute("""
+                SELECT id, path FROM tool_calls
+                WHERE session_id = ? AND change_type IS NOT NULL
+                ORDER BY timestamp ASC, message_id ASC, ordinal ASC
+            """, (session_id,)).fetchall()
+
+        writes = {}
+        for row in rows:
             # Skip excluded extensions
-            if any(path_str.endswith(ext) for ext in exclude_extensions):
+            if any(row['path'].endswith(ext) for ext in exclude_extensions):
                 continue
-                
-            # Store the latest change content for this file
-            files_map[path_str] = change
+            writes[row['path']] = row['id']
+        return writes
+
+    def _write_content(self, tool_call_id: int) -> str:
+        with self.storage.reader() as db:
+            row = db.execute("SELECT new_content FROM tool_calls WHERE id = ?", (tool_call_id,)).fetchone()
+        return (unpack_text(row['new_content']) if row else None) or ""
+
+    @staticmethod
+    def _resolve_file(project_path: Path, rel_path: str) -> Optional[Path]:
+        """Current location of a file a session wrote, or None if it no longer exists."""
+        # Handle absolute vs relative paths
+        path_obj = Path(rel_path)
+        if path_obj.is_absolute():
+            full_path = path_obj
+        else:
+            full_path = project_path / rel_path.lstrip('/')
+        if full_path.exists():
+            return full_path
+
+        # Try to see if it works relative to project path (fallback)
+        if path_obj.is_absolute():
+            fallback = project_path / rel_path.lstrip('/')
+            if fallback.exists():
+                return fallback
+        return None
+
+    @staticmethod
+    def _file_stat(rel_path: str, status: str, score: float, total_lines: Optional[int], retained_lines: Optional[int]) -> Dict[str, Any]:
+        if status == "deleted":
+            return {"path": rel_path, "score": 0, "status": "deleted"}
+        return {
+            "path": rel_path,
+            "score": round(score * 100, 1),
+            "status": status,
+            "total_lines": total_lines,
+            "retained_lines": retained_lines
+        }
+
+    def _score_file(self, full_path: Optional[Path], tool_call_id: int) -> Optional[tuple]:
+        """(status, score, total_lines, retained_lines) of a session's write against the current file, None if unreadable."""
+        # If file doesn't exist, score is 0
+        if full_path is None:
+            return ("deleted", 0, None, None)
+        try:
+            # Read current file content
+            with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
+                current_content = f.read()
+
+            # Calculate similarity (Line consistency logic): session lines still present in order
+            retained_lines, total_lines = survival(self._write_content(tool_call_id), current_content)
+        except Exception:
+            # Handle permission errors or bin files
+            return None
+
+        return self._classify(retained_lines, total_lines)
+
+    @staticmethod
+    def _classify(retained_lines: int, total_lines: int) -> tuple:
+        """(status, score, total_lines, retained_lines) for a write of total_lines of which retained_lines survive."""
+        score = (retained_lines / total_lines) if total_lines > 0 else 0
+        is_perfect = score > 0.99
+        return ("perfect" if is_perfect else "modified" if score > 0 else "replaced", score, total_lines, retained_lines)
+
+    def calculate_oneshot_stats(self, session_id: str, exclude_extensions: List[str] = None,
+                                source: str = "worktree") -> Dict[str, Any]:
+        """
+        Calculates 'One Shot' code survival stats for a session.
+
+        Per-file results are cached in survival_cache and reused while the session's
+        ingest generation and the file's mtime and size are unchanged. File contents
+        are not included, see get_oneshot_file.
+
+        Args:
+            source: One of ONESHOT_SOURCES. The git sources read files from the
+                project's repository (see _git_oneshot_stats) and are not cached;
+                if the repository cannot be read the working tree is scored instead,
+                with source "worktree" and the reason in source_error
+        """
+        if source not in ONESHOT_SOURCES:
+            raise ValueError(f"Unknown survival source: {source}")
+        if exclude_extensions is None:
+            exclude_extensions = ['.md', '.txt']
+
+        session_source = self._session_source(session_id)
+        if session_source is None:
+            return {"error": "Project path not found"}
+        project_path, generation = session_source
+
+        # Latest change for each file
+        writes = self._latest_writes(session_id, exclude_extensions)
+        source_error = None
+        if source != "worktree":
+            try:
+                return self._git_oneshot_stats(session_id, project_path, writes, source)
+            except GitReadError as e:
+                # Score against the working tree instead, and say so
+                source_error = str(e)
+
+        with self.storage.reader() as db:
+            cached = {
+                row['path']: row for row in db.execute(
+                    "SELECT * FROM survival_cache WHERE session_id = ? AND generation = ?", (session_id, generation)
+                ).fetchall()
+            }
 
         file_stats = []
+        fresh = []
         total_score = 0
         file_count = 0
 
-        for rel_path, change in files_map.items():
-            # Handle absolute vs relative paths
-            path_obj = Path(rel_path)
-            if path_obj.is_absolute():
-                full_path = path_obj
+        for rel_path, tool_call_id in writes.items():
+            full_path = self._resolve_file(project_path, rel_path)
+            signature = (None, None)
+            if full_path is not None:
+                try:
+                    st = full_path.stat()
+                    signature = (st.st_mtime_ns, st.st_size)
+                except OSError:
+                    continue
+
+            hit = cached.get(rel_path)
+            if hit is not None and (hit['file_mtime_ns'], hit['file_size']) == signature:
+                result = (hit['status'], hit['score'], hit['total_lines'], hit['retained_lines'])
             else:
-                full_path = project_path / rel_path.lstrip('/')
-            
-            # If file doesn't exist, score is 0
-            if not full_path.exists():
-                # Try to see if it works relative to project path (fallback)
-                if path_obj.is_absolute():
-                     fallback = project_path / rel_path.lstrip('/')
-                     if fallback.exists():
-                         full_path = fallback
-                     else:
-                        file_stats.append({
-                            "path": rel_path,
-                            "score": 0,
-                            "status": "deleted"
-                        })
-                        file_count += 1
-                        continue
-                else:
-                    file_stats.append({
-                        "path": rel_path,
-                        "score": 0,
-                        "status": "deleted"
-                    })
-                    file_count += 1
+                result = self._score_file(full_path, tool_call_id)
+                if result is None:
                     continue
-                
+                fresh.append((rel_path, *signature, *result))
+
+            file_stats.append(self._file_stat(rel_path, *result))
+            total_score += result[1]
+            file_count += 1
+
+        self.storage.save_survival_results(session_id, generation, fresh)
+
+        overall_score = (total_score / file_count * 100) if file_count > 0 else 0
+
+        stats = {
+            "overall_score": round(overall_score, 1),
+            "file_count": file_count,
+            "file_stats": sorted(file_stats, key=lambda x: x['score'], reverse=True)
+        }
+        if source_error is not None:
+            stats["source"] = "worktree"
+            stats["source_error"] = source_error
+        return stats
+
+    def get_oneshot_file(self, session_id: str, path: str) -> Optional[Dict[str, Any]]:
+        """
+        Contents behind one file of the One-Shot stats: what the session last wrote
+        and what the file holds now (None if it was deleted).
+
+        Returns:
+            Dict with path, session_content and current_content, or None if the
+            session never changed that file
+        """
+        source = self._session_source(session_id)
+        if source is None:
+            return None
+        project_path, _ = source
+
+        tool_call_id = self._latest_writes(session_id).get(path)
+        if tool_call_id is None:
+            return None
+
+        current_content = None
+        full_path = self._resolve_file(project_path, path)
+        if full_path is not None:
             try:
-                # Read current file content
                 with open(full_path, 'r', encoding='utf-8', errors='ignore') as f:
                     current_content = f.read()
+            except OSError:
+                # Deleted or unreadable since it was resolved: shown like a deleted file
+                pass
 
-                session_content = change['content'] or ""
-                
-                # Calculate similarity (Line consistency logic)
-                session_lines = session_content.splitlines()
-                current_lines = current_content.splitlines()
-                
-                matcher = difflib.SequenceMatcher(None, session_lines, current_lines)
-                
-                # Count matching lines
-                matching_blocks = matcher.get_matching_blocks()
-                retained_lines = sum(block.size for block in matching_blocks)
-                total_lines = len(session_lines)
-                
-                score = (retained_lines / total_lines) if total_lines > 0 else 0
-                
-                is_perfect = score > 0.99
-                
-                file_stats.append({
-                    "path": rel_path,
-                    "score": round(score * 100, 1),
-                    "status": "perfect" if is_perfect else "modified" if score > 0 else "replaced",
-                    "total_lines": total_lines,
-                    "retained_lines": retained_lines,
-                    "session_content": session_content,
-                    "current_content": current_content
-                })
-                
-                total_score += score
-                file_count += 1
-                
-            except Exception as e:
-                # Handle permission errors or bin files
+        return {
+            "path": path,
+            "session_content": self._write_content(tool_call_id),
+            "current_content": current_content
+        }
+
+    def calculate_project_survival(self, project_name: str, exclude_extensions: List[str] = None,
+                                   workers: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Code survival of every session of a project, as in calculate_oneshot_stats.
+
+        Each session's latest write to each file is scored against the file's current
+        content. Results are shared with the per-session stats through survival_cache,
+        so only writes whose session or file changed since the last run are scored.
+        Those are grouped by file, so each current file is read and split once, and
+        scored in a process pool once there are SURVIVAL_POOL_MIN_LINES lines to score.
+
+        Args:
+            workers: Worker processes (default: one per CPU)
+
+        Returns:
+            Dict with project-wide totals, a per-session and a per-file breakdown,
+            or None if the project does not exist
+        """
+        if exclude_extensions is None:
+            exclude_extensions = ['.md', '.txt']
+
+        with self.storage.reader() as db:
+            project = db.execute("SELECT path FROM projects WHERE name = ?", (project_name,)).fetchone()
+            if project is None:
+                return None
+            if not project['path']:
+                return {"error": "Project path not found"}
+            rows = db.execute("""
+                SELECT s.id AS session_id, s.start_time, s.generation, t.id, t.path
+                FROM sessions s
+                JOIN tool_calls t ON t.session_id = s.id
+                WHERE s.project_name = ? AND t.change_type IS NOT NULL
+                ORDER BY t.timestamp ASC, t.message_id ASC, t.ordinal ASC
+            """, (project_name,)).fetchall()
+            cached = {
+                (row['session_id'], row['path']): row for row in db.execute("""
+                    SELECT c.* FROM survival_cache c
+                    JOIN sessions s ON c.session_id = s.id AND c.generation = s.generation
+                    WHERE s.project_name = ?
+                """, (project_name,)).fetchall()
+            }
+        project_path = Path(project['path'])
+
+        # Latest change of each session to each file
+        sessions = {}
+        writes = {}
+        for row in rows:
+            if any(row['path'].endswith(ext) for ext in exclude_extensions):
                 continue
+            sessions[row['session_id']] = row
+            writes[(row['session_id'], row['path'])] = row['id']
 
-        overall_score = (total_score / file_count * 100) if file_count > 0 else 0
+        # Stat each file once; writes that are not cached for its current signature are scored per file
+        files = {}
+        results = {}
+        fresh = {}
+        stale = {}
+        for (session_id, rel_path), tool_call_id in writes.items():
+            if rel_path not in files:
+                full_path = self._resolve_file(project_path, rel_path)
+                signature = (None, None)
+                if full_path is not None:
+                    try:
+                        st = full_path.stat()
+                        signature = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        full_path = False
+                files[rel_path] = (full_path, signature)
+            full_path, signature = files[rel_path]
+            if full_path is False:
+                continue
+
+            hit = cached.get((session_id, rel_path))
+            if hit is not None and (hit['file_mtime_ns'], hit['file_size']) == signature:
+                results[(session_id, rel_path)] = (hit['status'], hit['score'], hit['total_lines'], hit['retained_lines'])
+            elif full_path is None:
+                results[(session_id, rel_path)] = ("deleted", 0, None, None)
+                fresh.setdefault(session_id, []).append((rel_path, *signature, "deleted", 0, None, None))
+            else:
+                stale.setdefault(str(full_path), []).append((session_id, rel_path, tool_call_id))
+
+        scored = sum(len(session_results) for session_results in fresh.values())
+        for full_path, file_results in self._score_files(stale, workers):
+            for (session_id, rel_path, _), counts in zip(stale[full_path], file_results or ()):
+                result = self._classify(*counts)
+                results[(session_id, rel_path)] = result
+                fresh.setdefault(session_id, []).append((rel_path, *files[rel_path][1], *result))
+                scored += 1
+
+        for session_id, session_results in fresh.items():
+            self.storage.save_survival_results(session_id, sessions[session_id]['generation'], session_results)
+
+        return self._survival_summary(project_name, sessions, results, scored)
+
+    def _score_files(self, stale: Dict[str, List[tuple]], workers: Optional[int]):
+        """Yield (file path, survival_against_file result) for each file with writes to score."""
+        paths = list(stale)
+        contents = [[self._write_content(tool_call_id) for _, _, tool_call_id in stale[path]] for path in paths]
+        workers = workers or os.cpu_count() or 1
+        lines = sum(content.count("\n") + 1 for file_contents in contents for content in file_contents)
+        if workers == 1 or len(paths) < 2 or lines < SURVIVAL_POOL_MIN_LINES:
+            yield from zip(paths, map(survival_against_file, paths, contents))
+            return
+        # spawn: never fork the server with its watcher/uvicorn threads running
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            yield from zip(paths, executor.map(survival_against_file, paths, contents, chunksize=4))
+
+    def _survival_summary(self, project_name: str, sessions: Dict[str, Any], results: Dict[tuple, tuple],
+                          scored: int) -> Dict[str, Any]:
+        """Project, per-session and per-file totals of (session, file) survival results."""
+        def totals(items):
+            items = list(items)
+            total_lines = sum(result[2] or 0 for result in items)
+            retained_lines = sum(result[3] or 0 for result in items)
+            return {
+                # Mean of the file scores, like the One-Shot stats
+                "overall_score": round(sum(result[1] for result in items) / len(items) * 100, 1) if items else 0,
+                "total_lines": total_lines,
+                "retained_lines": retained_lines,
+            }
+
+        by_session = {}
+        by_file = {}
+        for (session_id, rel_path), result in results.items():
+            by_session.setdefault(session_id, []).append(result)
+            by_file.setdefault(rel_path, []).append(result)
+
+        session_stats = [
+            {
+                "session_id": session_id,
+                "start_time": sessions[session_id]['start_time'],
+                "file_count": len(items),
+                **totals(items),
+            }
+            for session_id, items in by_session.items()
+        ]
+        file_stats = [
+            {
+                "path": rel_path,
+                "session_count": len(items),
+                "deleted": items[0][0] == "deleted",
+                **totals(items),
+            }
+            for rel_path, items in by_file.items()
+        ]
+
+        return {
+            "project_name": project_name,
+            **totals(results.values()),
+            "session_count": len(session_stats),
+            "file_count": len(file_stats),
+            "scored": scored,
+            "cached": len(results) - scored,
+            "sessions": sorted(session_stats, key=lambda x: x['start_time'] or '', reverse=True),
+            "files": sorted(file_stats, key=lambda x: x['overall_score'], reverse=True),
+        }
+
+    def _session_end(self, session_id: str) -> Optional[float]:
+        """Time of the session's last message as a Unix timestamp."""
+        with self.storage.reader() as db:
+            row = db.execute("SELECT MAX(timestamp) FROM messages WHERE session_id = ?", (session_id,)).fetchone()
+        return _epoch(row[0]) if row and row[0] else None
+
+    @staticmethod
+    def _repository_path(root: Path, project_path: Path, rel_path: str) -> Optional[str]:
+        """Path of a file a session wrote relative to the repository root, or None if outside it."""
+        path_obj = Path(rel_path)
+        full_path = path_obj if path_obj.is_absolute() else project_path / rel_path
+        try:
+            return full_path.resolve().relative_to(root).as_posix()
+        except ValueError:
+            return None
+
+    def _git_files(self, store: GitObjectStore, project_path: Path, writes: Dict[str, int]) -> List[tuple]:
+        """(rel_path, repository path, written content) of the writes to files inside the repository."""
+        files = []
+        for rel_path, tool_call_id in writes.items():
+            repo_path = self._repository_path(store.root, project_path, rel_path)
+            if repo_path is not None:
+                files.append((rel_path, repo_path, self._write_content(tool_call_id)))
+        return files
+
+    def _score_at_commit(self, store: GitObjectStore, commit: str, files: List[tuple]) -> Dict[str, Any]:
+        """
+        One-Shot stats of _git_files against their blobs at commit, all read in one cat-file request.
+
+        Raises:
+            GitReadError: If the cat-file process failed or answered out of step
+        """
+        try:
+            blobs = store.read_blobs(commit, [repo_path for _, repo_path, _ in files])
+        except (OSError, ValueError) as e:
+            raise GitReadError(f"Could not read commit {commit[:12]} from the git repository: {e}") from e
+        file_stats = []
+        total_score = 0
+        for (rel_path, _, content), blob in zip(files, blobs):
+            if blob is None:
+                result = ("deleted", 0, None, None)
+            else:
+                result = self._classify(*survival(content, blob.decode('utf-8', errors='ignore')))
+            file_stats.append(self._file_stat(rel_path, *result))
+            total_score += result[1]
 
+        overall_score = (total_score / len(files) * 100) if files else 0
         return {
             "overall_score": round(overall_score, 1),
-            "file_count": file_count,
+            "file_count": len(files),
             "file_stats": sorted(file_stats, key=lambda x: x['score'], reverse=True)
         }
+
+    def _git_oneshot_stats(self, session_id: str, project_path: Path, writes: Dict[str, int], source: str) -> Dict[str, Any]:
+        """
+        calculate_oneshot_stats against the project's git repository instead of the working tree.
+
+        Files are read at HEAD, or for "session_end" at the first commit made at or
+        after the session's last message (falling back to HEAD if there is none yet).
+        Files outside the repository are left out; files missing at the commit count
+        as deleted.
+        """
+        store = object_store(project_path)
+        if store is None:
+            return {"error": "Not a git repository"}
+        head = store.head()
+        if head is None:
+            return {"error": "Repository has no commits"}
+
+        commit, commit_time = head, None
+        if source == "session_end":
+            end = self._session_end(session_id)
+            commits = store.commits_since(head, end) if end is not None else []
+            if commits:
+                commit_time, commit = commits[0]
+
+        stats = self._score_at_commit(store, commit, self._git_files(store, project_path, writes))
+        stats["commit"] = commit
+        stats["commit_time"] = _isoformat(commit_time) if commit_time is not None else None
+        return stats
+
+    def calculate_survival_history(self, session_id: str, exclude_extensions: List[str] = None,
+                                   points: int = 20) -> Dict[str, Any]:
+        """
+        Survival curve of a session's code over the project's git history.
+
+        Scores the session's latest writes (as in calculate_oneshot_stats) against
+        the commits of HEAD's first-parent history made after the session's last
+        message, from the first of them to HEAD. All blobs come from the repository's
+        shared cat-file process, so no process is started per file or commit.
+
+        Args:
+            points: Commits to sample at most, always including the first and HEAD
+
+        Returns:
+            Dict with session_end, head, total_commits and points: [{commit,
+            commit_time, overall_score, file_count}], oldest first
+
+        Raises:
+            GitReadError: If reading the repository failed
+        """
+        if exclude_extensions is None:
+            exclude_extensions = ['.md', '.txt']
+
+        source = self._session_source(session_id)
+        if source is None:
+            return {"error": "Project path not found"}
+        project_path, _ = source
+        store = object_store(project_path)
+        if store is None:
+            return {"error": "Not a git repository"}
+        head = store.head()
+        if head is None:
+            return {"error": "Repository has no commits"}
+
+        end = self._session_end(session_id)
+        commits = store.commits_since(head, end) if end is not None else []
+        if len(commits) > points:
+            indices = sorted({round(i * (len(commits) - 1) / (points - 1)) for i in range(points)})
+            sampled = [commits[i] for i in indices]
+        else:
+            sampled = commits
+
+        files = self._git_files(store, project_path, self._latest_writes(session_id, exclude_extensions))
+        curve = []
+        for commit_time, commit in sampled:
+            stats = self._score_at_commit(store, commit, files)
+            curve.append({
+                "commit": commit,
+                "commit_time": _isoformat(commit_time),
+                "overall_score": stats["overall_score"],
+                "file_count": stats["file_count"],
+            })
+
+        return {
+            "session_end": _isoformat(end) if end is not None else None,
+            "head": head,
+            "total_commits": len(commits),
+            "points": curve,
+        }
+
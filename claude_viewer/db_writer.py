@@ -0,0 +1,270 @@
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Keyed asynchronous writes wait this long in the queue so later updates to the same key coalesce into them
+COALESCE_WINDOW = 0.05
+# Maximum number of jobs committed together in one transaction
+MAX_GROUP_SIZE = 64
+# Commit latencies kept for the percentile metrics
+LATENCY_SAMPLES = 1000
+
+
+def _noop(c: sqlite3.Cursor):
+    pass
+
+
+@dataclass
+class WriteJob:
+    fn: Callable
+    args: tuple
+    key: Any = None
+    merge: Optional[Callable[[tuple, tuple], tuple]] = None
+    transaction: bool = True
+    deferrable: bool = False
+    background: bool = False  # Someone submitted without waiting, nobody may see the outcome
+    enqueued: float = field(default_factory=time.monotonic)
+    futures: List[Future] = field(default_factory=list)
+
+
+class DBWriter:
+    """
+    Single writer thread that owns the database write connection.
+
+    Every mutation is a job on one queue, so writers never contend on the SQLite
+    write lock. The thread takes all queued jobs (up to MAX_GROUP_SIZE) and runs
+    them in one transaction with a savepoint per job: one commit for the group,
+    and a failing job only rolls back its own changes.
+
+    Jobs submitted with a key and a merge function coalesce: while a job for that
+    key is still queued, a new one is merged into it instead of being queued
+    again. Keyed jobs submitted without waiting stay in the queue for at least
+    COALESCE_WINDOW so bursts of updates to the same session become one write.
+    A barrier job (e.g. a delete) ends coalescing for everything queued before it,
+    so no later write can be merged ahead of it.
+    """
+
+    def __init__(self, connect: Callable[[], sqlite3.Connection], coalesce_window: float = COALESCE_WINDOW,
+                 max_group_size: int = MAX_GROUP_SIZE, name: str = "db-writer"):
+        self._connect = connect
+        self.coalesce_window = coalesce_window
+        self.max_group_size = max_group_size
+        self._name = name
+        self._queue: Deque[WriteJob] = deque()
+        self._pending: Dict[Any, WriteJob] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Why the writer thread stopped, if it could not go on (e.g. the database cannot be opened)
+        self._error: Optional[Exception] = None
+
+        # Metrics
+        self._submitted = 0
+        self._coalesced = 0
+        self._failed = 0
+        self._commits = 0
+        self._committed_jobs = 0
+        self._max_queue_depth = 0
+        self._commit_latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+
+    def submit(self, fn: Callable, *args, key: Any = None, merge: Optional[Callable[[tuple, tuple], tuple]] = None,
+               transaction: bool = True, barrier: bool = False, wait: bool = True):
+        """
+        Queue fn(cursor, *args) to run on the writer thread.
+
+        Args:
+            key: Coalescing key (e.g. the session id); needs merge
+            merge: merge(queued_args, new_args) -> args of the single write replacing both
+            transaction: False runs fn(connection) alone, outside any transaction (e.g. VACUUM)
+            barrier: Later jobs are never merged into jobs queued before this one
+            wait: Block until committed and return fn's result (re-raising its error);
+                otherwise return a Future
+
+        Must not be called from inside a job, which would wait on itself.
+
+        Raises:
+            RuntimeError: If the writer is closed or its thread has failed
+        """
+        future: Future = Future()
+        with self._cond:
+            if self._error is not None:
+                raise RuntimeError(f"Database writer failed: {self._error}") from self._error
+            if self._stopping:
+                raise RuntimeError("Database writer is closed")
+            self._submitted += 1
+            queued = self._pending.get(key) if key is not None and merge is not None else None
+            if queued is not None:
+                queued.args = merge(queued.args, args)
+                queued.futures.append(future)
+                queued.background = queued.background or not wait
+                self._coalesced += 1
+            else:
+                job = WriteJob(fn, args, key=key, merge=merge, transaction=transaction,
+                               deferrable=key is not None and not wait, background=not wait, futures=[future])
+                if barrier:
+                    self._pending.clear()
+                self._queue.append(job)
+                if key is not None and merge is not None:
+                    self._pending[key] = job
+                self._max_queue_depth = max(self._max_queue_depth, len(self._queue))
+                self._ensure_thread()
+                self._cond.notify()
+        return future.result() if wait else future
+
+    def flush(self):
+        """Wait until every job queued so far is committed (or failed)."""
+        self.submit(_noop)
+
+    def _ensure_thread(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=self._name, daemon=True)
+            self._thread.start()
+
+    def close(self, timeout: Optional[float] = None):
+        """Stop accepting jobs, finish the queued ones and stop the writer thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, coalescing and commit latency (milliseconds) counters."""
+        with self._cond:
+            latencies = sorted(self._commit_latencies)
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_queue_depth,
+                "submitted": self._submitted,
+                "coalesced": self._coalesced,
+                "failed": self._failed,
+                "commits": self._commits,
+                "jobs_per_commit": round(self._committed_jobs / self._commits, 2) if self._commits else 0,
+                "commit_latency_ms": {
+                    "last": round(self._commit_latencies[-1] * 1000, 2) if latencies else 0,
+                    "p50": round(latencies[len(latencies) // 2] * 1000, 2) if latencies else 0,
+                    "p99": round(latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)] * 1000, 2) if latencies else 0,
+                    "max": round(latencies[-1] * 1000, 2) if latencies else 0,
+                },
+            }
+
+    def _hold_time(self, job: WriteJob) -> float:
+        """Seconds a job still stays queued for coalescing (<= 0 when it may run)."""
+        if not job.deferrable:
+            return 0
+        return job.enqueued + self.coalesce_window - time.monotonic()
+
+    def _take_group(self) -> Optional[List[WriteJob]]:
+        """Wait for work and dequeue the next group of jobs; None once closed and drained."""
+        with self._cond:
+            while True:
+                while not self._queue and not self._stopping:
+                    self._cond.wait()
+                if not self._queue:
+                    return None
+                delay = self._hold_time(self._queue[0])
+                if delay <= 0 or self._stopping:
+                    break
+                # Give updates to the same key time to arrive and coalesce
+                self._cond.wait(delay)
+
+            group = [self._queue.popleft()]
+            if group[0].transaction:
+                while (self._queue and len(group) < self.max_group_size and self._queue[0].transaction
+                       and (self._stopping or self._hold_time(self._queue[0]) <= 0)):
+                    group.append(self._queue.popleft())
+            for job in group:
+                if job.key is not None and self._pending.get(job.key) is job:
+                    del self._pending[job.key]
+            return group
+
+    def _run(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            logger.error(f"Could not open the database for writing: {e}")
+            self._fail(e)
+            return
+        try:
+            while True:
+                group = self._take_group()
+                if group is None:
+                    break
+                if group[0].transaction:
+                    self._run_group(conn, group)
+                else:
+                    job = group[0]
+                    try:
+                        self._resolve(job, result=job.fn(conn, *job.args))
+                    except Exception as e:
+                        self._resolve(job, error=e)
+        except Exception as e:
+            logger.error(f"Database writer stopped: {e}")
+            self._fail(e)
+        finally:
+            conn.close()
+
+    def _fail(self, error: Exception):
+        """The writer thread cannot go on: fail every queued job and refuse new ones."""
+        with self._cond:
+            self._error = error
+            jobs = list(self._queue)
+            self._queue.clear()
+            self._pending.clear()
+        for job in jobs:
+            self._resolve(job, error=error)
+
+    def _run_group(self, conn: sqlite3.Connection, group: List[WriteJob]):
+        """Run jobs in one transaction, each inside a savepoint, and commit once."""
+        start = time.perf_counter()
+        outcomes = []
+        c = conn.cursor()
+        try:
+            c.execute("BEGIN")
+            for job in group:
+                c.execute("SAVEPOINT job")
+                try:
+                    outcomes.append((job.fn(c, *job.args), None))
+                    c.execute("RELEASE job")
+                except Exception as e:
+                    c.execute("ROLLBACK TO job")
+                    c.execute("RELEASE job")
+                    outcomes.append((None, e))
+            c.execute("COMMIT")
+        except Exception as e:
+            # The transaction itself failed (e.g. disk full): nothing in the group was written
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"Database write failed: {e}")
+            for job in group:
+                self._resolve(job, error=e)
+            return
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self._commits += 1
+            self._committed_jobs += len(group)
+            self._commit_latencies.append(elapsed)
+        for job, (result, error) in zip(group, outcomes):
+            self._resolve(job, result=result, error=error)
+
+    def _resolve(self, job: WriteJob, result: Any = None, error: Optional[Exception] = None):
+        if error is not None:
+            with self._cond:
+                self._failed += 1
+            # Waiting callers re-raise it; fire-and-forget jobs would otherwise fail silently
+            if job.background:
+                logger.error(f"Background database write {job.fn.__name__} failed: {error}")
+        for future in job.futures:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
@@ -0,0 +1,184 @@
+import math
+import subprocess
+import threading
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class GitObjectStore:
+    """
+    Reads blobs of one repository through a long-lived `git cat-file --batch` process.
+
+    All objects of a request are written to the process in one go and the answers
+    read back in order, so reading every file a session wrote at some commit costs
+    no process spawn per file. The process is started on first use and restarted if
+    it exits.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        # First-parent history as (commit time, oid), oldest first, for _history_head
+        self._history: List[Tuple[int, str]] = []
+        self._history_head: Optional[str] = None
+
+    def _batch_process(self) -> subprocess.Popen:
+        if self._process is None or self._process.poll() is not None:
+            self._process = subprocess.Popen(
+                ["git", "cat-file", "--batch"],
+                cwd=self.root,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL
+            )
+        return self._process
+
+    @staticmethod
+    def _feed(stdin, requests: bytes):
+        try:
+            stdin.write(requests)
+            stdin.flush()
+        except (BrokenPipeError, ValueError):
+            # The process died; the reader sees end of output
+            pass
+
+    @staticmethod
+    def _read_object(stdout) -> Optional[bytes]:
+        header = stdout.readline()
+        if not header:
+            raise OSError("git cat-file exited")
+        if header.rstrip().endswith((b" missing", b" ambiguous")):
+            return None
+        _, kind, size = header.split()
+        data = stdout.read(int(size))
+        stdout.read(1)  # Newline after the contents
+        return data if kind == b"blob" else None
+
+    def read_blobs(self, commit: str, paths: Sequence[str]) -> List[Optional[bytes]]:
+        """
+        Contents of files at a commit.
+
+        Args:
+            commit: Commit id (or any revision git accepts)
+            paths: Paths relative to the repository root, with forward slashes
+
+        Returns:
+            Blob contents in the order of paths, None for paths that do not exist
+            (or are not files) at that commit
+        """
+        # A newline would end the request early; such paths cannot be asked for
+        wanted = [i for i, path in enumerate(paths) if "\n" not in path]
+        results: List[Optional[bytes]] = [None] * len(paths)
+        if not wanted:
+            return results
+        requests = b"".join(f"{commit}:{paths[i]}\n".encode("utf-8", "surrogateescape") for i in wanted)
+
+        with self._lock:
+            process = self._batch_process()
+            # Write from a thread: git stops reading requests while its answers are not consumed
+            feeder = threading.Thread(target=self._feed, args=(process.stdin, requests), daemon=True)
+            feeder.start()
+            try:
+                for i in wanted:
+                    results[i] = self._read_object(process.stdout)
+            except (OSError, ValueError):
+                # Out of step with the process; start a fresh one next time
+                self._stop()
+                raise
+            finally:
+                feeder.join()
+        return results
+
+    def head(self) -> Optional[str]:
+        """Commit id of HEAD, or None for a repository without commits."""
+        result = subprocess.run(
+            ["git", "rev-parse", "--verify", "-q", "HEAD"],
+            cwd=self.root, capture_output=True, text=True, timeout=5
+        )
+        return result.stdout.strip() or None
+
+    def history(self, head: str) -> List[Tuple[int, str]]:
+        """(commit time, commit id) of the first-parent history of head, oldest first."""
+        with self._lock:
+            if self._history_head != head:
+                result = subprocess.run(
+                    ["git", "log", "--first-parent", "--format=%ct %H", head],
+                    cwd=self.root, capture_output=True, text=True, timeout=30
+                )
+                history = []
+                for line in result.stdout.splitlines():
+                    timestamp, _, oid = line.partition(" ")
+                    history.append((int(timestamp), oid))
+                self._history = sorted(history)
+                self._history_head = head
+            return self._history
+
+    def commits_since(self, head: str, timestamp: float) -> List[Tuple[int, str]]:
+        """Commits of head's first-parent history made at or after timestamp, oldest first."""
+        history = self.history(head)
+        return history[bisect_left(history, (math.ceil(timestamp), "")):]
+
+    def _stop(self):
+        if self._process is not None:
+            self._process.kill()
+            self._process.wait()
+            self._process = None
+
+    def close(self):
+        with self._lock:
+            if self._process is not None and self._process.poll() is None:
+                self._process.stdin.close()
+                try:
+                    self._process.wait(timeout=5)
+                except subprocess.TimeoutExpired:
+                    self._process.kill()
+            self._process = None
+
+
+# One store (and cat-file process) per repository root
+_stores: Dict[Path, GitObjectStore] = {}
+_roots: Dict[Path, Path] = {}
+_stores_lock = threading.Lock()
+
+
+def repository_root(path: Path) -> Optional[Path]:
+    """Top-level directory of the git work tree containing path, or None."""
+    root = _roots.get(path)
+    if root is not None:
+        return root
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--show-toplevel"],
+            cwd=path, capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return None
+    if result.returncode != 0 or not result.stdout.strip():
+        return None
+    root = Path(result.stdout.strip())
+    # Only hits are remembered: a directory may become a repository later
+    _roots[path] = root
+    return root
+
+
+def object_store(path: Path) -> Optional[GitObjectStore]:
+    """The shared GitObjectStore of the repository containing path, or None if it is not in one."""
+    root = repository_root(path)
+    if root is None:
+        return None
+    with _stores_lock:
+        store = _stores.get(root)
+        if store is None:
+            store = _stores[root] = GitObjectStore(root)
+        return store
+
+
+def close_all():
+    """Stop every cat-file process (on server shutdown)."""
+    with _stores_lock:
+        stores = list(_stores.values())
+        _stores.clear()
+    for store in stores:
+        store.close()
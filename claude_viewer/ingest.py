@@ -0,0 +1,124 @@
+import logging
+import os
+import threading
+from typing import Dict, Any, Iterable, Optional
+
+from claude_viewer.parser import LogParser, SessionAccumulator, file_signature
+from claude_viewer.storage import Storage
+
+logger = logging.getLogger(__name__)
+
+
+class LiveIngester:
+    """
+    Ingests live session files incrementally.
+
+    For every file it has seen, the ingester keeps the parse state (byte offset of
+    the last committed line plus the running metadata). On a change only the newly
+    appended complete lines are parsed, their messages are appended and the session
+    row is updated in place. Files that were truncated or rewritten fall back to a
+    full parse.
+
+    Writes are queued on the storage writer without waiting, so bursts of changes
+    to one file coalesce into a single write. If a queued write fails, the parse
+    state is dropped and the next change re-ingests the file from scratch.
+    """
+
+    def __init__(self, parser: LogParser, storage: Storage):
+        self.parser = parser
+        self.storage = storage
+        self._states: Dict[str, SessionAccumulator] = {}
+        self._lock = threading.Lock()
+
+    def ingest(self, session_info: Dict[str, Any]) -> int:
+        """
+        Ingest the current state of a session file.
+
+        Returns the number of messages queued for writing.
+        """
+        file_path = session_info['file_path']
+
+        with self._lock:
+            signature = file_signature(file_path)
+            state = self._states.get(file_path)
+            resume = state is not None and state.can_resume(file_path)
+            if not resume:
+                state = SessionAccumulator()
+
+            messages = self.parser.parse_session_tail(file_path, state)
+
+            manifest_entry = {
+                "file_path": file_path,
+                "session_id": session_info['session_id'],
+                "status": "ok",
+                **signature
+            }
+            if not messages and not resume:
+                # Nothing ingested yet (e.g. metadata only), parse from scratch next time
+                self._states.pop(file_path, None)
+                return 0
+
+            # The manifest entry commits with the session, so a file is only recorded
+            # as up to date once its messages are stored
+            write = self.storage.append_session_messages if resume else self.storage.save_session
+            written = write(
+                session_info['project'],
+                session_info,
+                messages,
+                state.metadata(),
+                project_path=session_info.get('project_path'),
+                manifest_entry=manifest_entry,
+                wait=False
+            )
+            self._states[file_path] = state
+
+        # Outside the lock: the callback runs right away if the write has already finished
+        written.add_done_callback(lambda f: self._forget_on_error(f, file_path, state))
+        return len(messages)
+
+    def _forget_on_error(self, written, file_path: str, state: SessionAccumulator):
+        """Done-callback of a queued write: on failure the parse state no longer matches the database."""
+        if written.exception() is None:
+            return
+        with self._lock:
+            if self._states.get(file_path) is state:
+                del self._states[file_path]
+
+    def forget(self, file_path: str):
+        """Drop the parse state of a file, e.g. after the background scan re-ingested it."""
+        with self._lock:
+            self._states.pop(file_path, None)
+
+
+class SessionIndex:
+    """
+    In-memory index from absolute session file path to its session info
+    (project, project_path, file_path, session_id), so watcher events can be
+    resolved without walking the log directory.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return os.path.abspath(file_path)
+
+    def rebuild(self, session_list: Iterable[Dict[str, Any]]):
+        """Replace the index with the sessions found by a full scan."""
+        entries = {self._key(info['file_path']): info for info in session_list}
+        with self._lock:
+            self._entries = entries
+
+    def get(self, file_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.get(self._key(file_path))
+
+    def add(self, session_info: Dict[str, Any]):
+        with self._lock:
+            self._entries[self._key(session_info['file_path'])] = session_info
+
+    def remove(self, file_path: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._entries.pop(self._key(file_path), None)
@@ -10,12 +10,48 @@ def cli():
 @cli.command()
 @click.option("--host", default="127.0.0.1", help="Host to bind authentication server to.")
 @click.option("--port", default=8000, help="Port to bind authentication server to.")
-def serve(host, port):
+@click.option("--parse-mode", type=click.Choice(["thread", "process"]), default="thread",
+              help="Parse logs in a thread pool or a process pool (one worker per core) during scans.")
+@click.option("--workers", type=int, default=None, help="Number of scan parse workers.")
+@click.option("--recent-batch-size", type=click.IntRange(min=0), default=None,
+              help="Newest sessions parsed and committed first, before the rest of the scan (default 50).")
+@click.option("--queue-depth", type=click.IntRange(min=1), default=None,
+              help="Parsed sessions that may wait for the database writer during scans (default 64).")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=None,
+              help="Sessions committed per write transaction during scans (default 100).")
+def serve(host, port, parse_mode, workers, recent_batch_size, queue_depth, chunk_size):
     """Start the Claude Code Viewer server."""
     print(f"Starting server at http://{host}:{port}")
-    from claude_viewer.server import app 
+    from claude_viewer.server import app, scan_config
+    scan_config.parse_mode = parse_mode
+    scan_config.workers = workers
+    # Unset options keep the ScanConfig defaults
+    if recent_batch_size is not None:
+        scan_config.recent_batch_size = recent_batch_size
+    if queue_depth is not None:
+        scan_config.queue_depth = queue_depth
+    if chunk_size is not None:
+        scan_config.chunk_size = chunk_size
     uvicorn.run(app, host=host, port=port)
     print(f"Scanning logs from: {CLAUDE_LOG_PATH}")
 
+@cli.command()
+def compact():
+    """Compress large message bodies in the database and reclaim free space."""
+    import logging
+    from claude_viewer.config import DB_PATH
+    from claude_viewer.storage import Storage
+    # Also clears compaction left pending by schema migrations (see Storage.compaction_pending)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    storage = Storage(DB_PATH)
+    try:
+        report = storage.compact()
+    finally:
+        storage.close()
+    mb = 1024 * 1024
+    print(f"Compressed {report['compressed_blocks']} message blocks")
+    print(f"Database size: {report['size_before'] / mb:.1f} MB -> {report['size_after'] / mb:.1f} MB")
+
 if __name__ == "__main__":
     cli()
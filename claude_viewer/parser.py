@@ -1,15 +1,110 @@
 import json
 import logging
+import os
+import hashlib
 from pathlib import Path
-from typing import List, Dict, Any, Generator
+from typing import List, Dict, Any, Generator, Optional
 from datetime import datetime
 import urllib.parse
 
+from claude_viewer.storage import serialize_session
+from claude_viewer.tool_calls import tool_call_rows
+
 logger = logging.getLogger(__name__)
 
+# Number of leading bytes hashed to detect a log file that was rewritten in place
+HEAD_HASH_BYTES = 64 * 1024
+
+# Records that start with these bytes never contribute messages or metadata
+_SKIPPED_RECORD_PREFIXES = (
+    b'{"type":"summary"',
+    b'{"type":"file-history-snapshot"',
+    b'{"type":"queue-operation"',
+)
+
+# Trailing payloads smaller than this are not worth a separate decode attempt
+_LAZY_PAYLOAD_BYTES = 1024
+
+# Parse result status
+PARSE_OK = "ok"
+PARSE_SKIPPED = "skipped"  # Empty file or no messages (metadata only)
+PARSE_FAILED = "failed"    # Actual error
+
+
+def _can_skip_line(line: bytes) -> bool:
+    """
+    Cheap bytes-level check for records the parser would decode and then discard.
+
+    Only records with a top-level "message" or "role" key produce messages or
+    metadata. Inside JSON strings quotes are escaped, so if neither quoted key
+    occurs anywhere in the raw line it cannot have those keys (summary,
+    file-history-snapshot, system, queue records...).
+    """
+    if line.startswith(_SKIPPED_RECORD_PREFIXES):
+        return True
+    return b'"message"' not in line and b'"role"' not in line
+
+
+def _decode_record(line: bytes) -> Any:
+    """
+    Decode a JSONL record, skipping a trailing "toolUseResult" payload when possible.
+
+    User records carry a copy of each tool result under a top-level toolUseResult
+    key, usually the last one, which the parser never reads. When the record
+    minus that key still decodes and has the keys the parser needs, the payload
+    is never decoded. Otherwise the whole line is decoded as usual.
+    """
+    cut = line.rfind(b',"toolUseResult":')
+    if cut > 0 and len(line) - cut > _LAZY_PAYLOAD_BYTES:
+        try:
+            data = json.loads(line[:cut] + b'}')
+        except ValueError:
+            data = None
+        # A cut inside a nested object cannot decode, a cut at the top level keeps every earlier key
+        if isinstance(data, dict) and "message" in data and "type" in data and "timestamp" in data:
+            return data
+    return json.loads(line)
+
+
+def file_stat_signature(file_path: str) -> Dict[str, Any]:
+    """Cheap signature of a log file from a single stat call."""
+    st = os.stat(file_path)
+    return {
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "inode": st.st_ino
+    }
+
+
+def file_head_hash(file_path: str, length: int = HEAD_HASH_BYTES) -> str:
+    """Hash of the first `length` bytes of a log file."""
+    with open(file_path, 'rb') as f:
+        return hashlib.sha1(f.read(length)).hexdigest()
+
+
+def file_signature(file_path: str) -> Dict[str, Any]:
+    """Full signature of a log file: size, mtime_ns, inode and head hash."""
+    signature = file_stat_signature(file_path)
+    signature["head_hash"] = file_head_hash(file_path)
+    return signature
+
+
 class LogParser:
     def __init__(self, log_dir: Path):
         self.log_dir = log_dir
+        # Encoded project dir name -> (project_name, project_path) of reconstructed paths
+        self.path_cache: Dict[str, tuple] = {}
+        # Entries resolved since the last pop_resolved_paths(), to be persisted
+        self._resolved_paths: Dict[str, tuple] = {}
+
+    def load_path_cache(self, cache: Dict[str, tuple]):
+        """Seed the reconstructed path cache (e.g. from the DB)."""
+        self.path_cache.update(cache)
+
+    def pop_resolved_paths(self) -> Dict[str, tuple]:
+        """Return and clear the paths reconstructed since the last call."""
+        resolved, self._resolved_paths = self._resolved_paths, {}
+        return resolved
 
     def scan_projects(self) -> Generator[Dict[str, Any], None, None]:
         """Scans the log directory for projects and sessions."""
@@ -19,21 +114,7 @@ class LogParser:
 
         for project_dir in self.log_dir.iterdir():
             if project_dir.is_dir():
-                raw_project_name = project_dir.name
-                # Try to use existence check to reconstruct path
-                # Standard replacement (often wrong if names have hyphens)
-                decoded = raw_project_name.replace('-', '/')
-                
-                project_path = decoded
-                if decoded.startswith('/Users') or decoded.startswith('/home'):
-                    reconstructed = self._reconstruct_path(decoded)
-                    if reconstructed:
-                        project_path = str(reconstructed)
-                        project_name = reconstructed.name
-                    else:
-                         project_name = Path(decoded).name
-                else:
-                    project_name = raw_project_name
+                project_name, project_path = self._resolve_project(project_dir.name)
 
                 for log_file in project_dir.glob("*.jsonl"):
                     yield {
@@ -42,7 +123,52 @@ class LogParser:
                         "file_path": str(log_file),
                         "session_id": log_file.stem
                     }
-    
+
+    def session_info_for_file(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """
+        Build the session info of a single log file without walking the log directory.
+        Returns None if the file is not a session log (<log_dir>/<project>/<session>.jsonl).
+        """
+        log_file = Path(file_path)
+        if log_file.suffix != '.jsonl' or Path(os.path.abspath(log_file.parent.parent)) != Path(os.path.abspath(self.log_dir)):
+            return None
+
+        project_name, project_path = self._resolve_project(log_file.parent.name)
+        return {
+            "project": project_name,
+            "project_path": project_path,
+            "file_path": str(log_file),
+            "session_id": log_file.stem
+        }
+
+    def _resolve_project(self, raw_project_name: str) -> tuple:
+        """Returns (project_name, project_path) for an encoded project directory name."""
+        # Known project: reuse the cached path, only re-probe once it stops existing
+        cached = self.path_cache.get(raw_project_name)
+        if cached:
+            if os.path.exists(cached[1]):
+                return cached
+            del self.path_cache[raw_project_name]
+
+        # Try to use existence check to reconstruct path
+        # Standard replacement (often wrong if names have hyphens)
+        decoded = raw_project_name.replace('-', '/')
+
+        project_path = decoded
+        if decoded.startswith('/Users') or decoded.startswith('/home'):
+            reconstructed = self._reconstruct_path(decoded)
+            if reconstructed:
+                project_path = str(reconstructed)
+                project_name = reconstructed.name
+                self.path_cache[raw_project_name] = (project_name, project_path)
+                self._resolved_paths[raw_project_name] = (project_name, project_path)
+            else:
+                project_name = Path(decoded).name
+        else:
+            project_name = raw_project_name
+
+        return project_name, project_path
+
     def _reconstruct_path(self, decoded_path: str) -> Path | None:
         """
         Attempts to reconstruct the real path from a decoded path (where / became -).
@@ -92,266 +218,440 @@ class LogParser:
 
     def parse_session(self, file_path: str) -> Dict[str, Any]:
         """Parses a single JSONL session file."""
-        messages = []
-        metadata = {
-            "model": None,
-            "total_tokens": 0,
-            "input_tokens": 0,
-            "output_tokens": 0,
-            "turns": 0,
-            "total_messages": 0,
-            "branch": None,
-            "token_usage_history": [],
-            "tool_stats": {},
-            "modified_files": set(),
-            # Analytics Counters
-            "read_count": 0,
-            "write_count": 0,
-            "nav_miss_count": 0,
-            "nav_total_count": 0,
-            "user_chars": 0
+        accumulator = SessionAccumulator()
+        messages = self.parse_session_tail(file_path, accumulator)
+        return {
+            "messages": messages,
+            "metadata": accumulator.metadata()
         }
-        
+
+    def parse_session_tail(self, file_path: str, accumulator: "SessionAccumulator") -> List[Dict[str, Any]]:
+        """
+        Parses the lines appended to a session file since accumulator.offset.
+
+        Only complete lines are consumed. A trailing line without a newline is
+        consumed only if it already decodes (the writer may still be appending it),
+        so accumulator.offset always points at the start of the next unread record.
+
+        Returns the new messages; running metadata is kept in the accumulator.
+        """
+        messages = []
+
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
+            with open(file_path, 'rb') as f:
+                f.seek(accumulator.offset)
                 for line in f:
-                    if not line.strip():
+                    if not line.endswith(b'\n'):
+                        try:
+                            data = json.loads(line)
+                        except ValueError:
+                            break  # Partial record, retry on next change
+                        accumulator.offset += len(line)
+                        message = accumulator.feed(data)
+                        if message:
+                            messages.append(message)
+                        break
+
+                    accumulator.offset += len(line)
+                    if not line.strip() or _can_skip_line(line):
                         continue
                     try:
-                        data = json.loads(line)
-                        
-                        # Determine role and content based on schema
-                        role = None
-                        content = ""
-                        timestamp = data.get("timestamp")
-
-                        # Extract metadata from assistant messages
-                        if "message" in data:
-                            msg_obj = data["message"]
-                            if msg_obj.get("model"):
-                                metadata["model"] = msg_obj["model"]
-                            if msg_obj.get("usage"):
-                                usage = msg_obj["usage"]
-                                i_tokens = usage.get("input_tokens", 0)
-                                o_tokens = usage.get("output_tokens", 0)
-                                metadata["input_tokens"] += i_tokens
-                                metadata["output_tokens"] += o_tokens
-                                metadata["total_tokens"] += (i_tokens + o_tokens)
-                                
-                                # Record history point
-                                metadata["token_usage_history"].append({
-                                    "timestamp": timestamp or datetime.now().isoformat(),
-                                    "input": metadata["input_tokens"],  # Cumulative
-                                    "output": metadata["output_tokens"], # Cumulative
-                                    "total": metadata["total_tokens"]
-                                })
-
-                        # Case 1: Legacy/Simple format {"role": "...", "content": "..."}
-                        if "role" in data:
-                            role = data["role"]
-                            content = data.get("content", "")
-                        
-                        # Case 2: New format {"type": "user", "message": {...}}
-                        elif "type" in data and data["type"] in ["user", "assistant"]:
-                            msg_obj = data.get("message", {})
-                            role = msg_obj.get("role")
-                            
-                            if role == "user":
-                                metadata["turns"] += 1
-
-                            raw_content = msg_obj.get("content")
-                            
-                            if isinstance(raw_content, list):
-                                # Extract text from blocks
-                                text_parts = []
-                                for block in raw_content:
-                                    if block.get("type") == "text":
-                                        txt = block.get("text", "")
-                                        text_parts.append(txt)
-                                        if role == "user":
-                                            metadata["user_chars"] += len(txt)
-                                    elif block.get("type") == "tool_use":
-                                        # Track Tool Stats
-                                        t_name = block.get('name')
-                                        if t_name:
-                                            metadata["tool_stats"][t_name] = metadata["tool_stats"].get(t_name, 0) + 1
-                                            
-                                        # Format as custom tag for frontend rendering
-                                        input_block = block.get('input', {})
-                                        input_json = json.dumps(input_block, indent=2)
-                                        text_parts.append(f"\n<tool-use name=\"{block.get('name')}\">\n{input_json}\n</tool-use>\n")
-
-                                        # Analytics: Read vs Write
-                                        tn_lower = t_name.lower()
-                                        if any(x in tn_lower for x in ['view', 'read', 'list', 'search', 'glob', 'find']):
-                                            metadata["read_count"] += 1
-                                        elif any(x in tn_lower for x in ['write', 'edit', 'replace', 'create', 'append', 'run']):
-                                            metadata["write_count"] += 1
-                                        
-                                        # Analytics: Navigation Total (view/list)
-                                        if any(x in tn_lower for x in ['view_file', 'list_dir']):
-                                            metadata["nav_total_count"] += 1
-                                        
-                                        # Track modified files
-                                        tool_name = block.get('name', '')
-                                        # Heuristic: Check common file manipulation tool names
-                                        # Covers: write_to_file, replace_file_content, edit_file, create_file, etc.
-                                        if any(x in tool_name.lower() for x in ['write', 'edit', 'replace', 'create', 'append']):
-                                            # Try all common path keys
-                                            path = (
-                                                input_block.get('path') or 
-                                                input_block.get('file_path') or 
-                                                input_block.get('TargetFile') or
-                                                input_block.get('filename') or
-                                                input_block.get('target_file') or
-                                                input_block.get('file')
-                                            )
-                                            if path:
-                                                metadata["modified_files"].add(path)
-                                                metadata["modified_files"].add(path)
-                                        
-                                        # Heuristic: Detect Git Branch from command
-                                        if tool_name == "run_command":
-                                            cmd = input_block.get('command', '')
-                                            # Look for simple git branch checks
-                                            # e.g. git branch --show-current
-                                            if "git branch" in cmd or "git status" in cmd:
-                                                pass # Ideally we look at tool_result next, but that's hard to correlate in this single pass easily without state.
-                                                # Actually, sometimes agents output the branch in the thought process or finding it is hard.
-                                                # But we can try to look at 'tool_result' blocks if we had state.
-                                                # Simplified: Just check if we see tool_result later? 
-                                                # For now, let's leave branch as None unless we find a very obvious indicator.
-                                                pass
-                                    elif block.get("type") == "tool_result":
-                                        content_str = block.get('content', '')
-                                        # Truncate very long results for display if needed, but for now keep full
-                                        # Check if it's a list (some results are lists of blocks)
-                                        if isinstance(content_str, list):
-                                            # specific logic for list content in tool result?
-                                            # often it's text w/ embedded images or just text
-                                            # simple serialization for now
-                                            content_str = json.dumps(content_str)
-                                            
-                                        # Analytics: Navigation Miss
-                                        # Check if this result indicates a file system error
-                                        # We accept false positives/negatives as heuristic
-                                        low_res = content_str.lower()
-                                        if "no such file" in low_res or "file not found" in low_res or "cannot access" in low_res:
-                                             metadata["nav_miss_count"] += 1
-
-                                        text_parts.append(f"\n<tool-result>\n{content_str}\n</tool-result>\n")
-                                        
-                                content = "".join(text_parts)
-                                
-                                # Heuristic: If the message originates from 'user' but contains 'tool_result' and NO 'text' blocks that are just user input,
-                                # it is likely a tool output message.
-                                # Check the blocks again to be sure:
-                                if role == "user":
-                                    has_tool_result = any(b.get("type") == "tool_result" for b in raw_content)
-                                    has_user_text = any(b.get("type") == "text" for b in raw_content)
-                                    
-                                    if has_tool_result and not has_user_text:
-                                        role = "tool"
-                                        # Decrement turns since this isn't a user turn
-                                        metadata["turns"] -= 1
-
-                            elif isinstance(raw_content, str):
-                                content = raw_content
-                        
-                        if role and content:
-                            metadata["total_messages"] += 1
-                            messages.append({
-                                "role": role,
-                                "content": content,
-                                "timestamp": timestamp or datetime.now().isoformat()
-                            })
-
-                    except json.JSONDecodeError:
+                        data = _decode_record(line)
+                    except ValueError:
                         logger.error(f"Failed to parse line in {file_path}")
+                        continue
+
+                    message = accumulator.feed(data)
+                    if message:
+                        messages.append(message)
         except Exception as e:
             logger.error(f"Error reading {file_path}: {e}")
-        
-        # Convert set to count
-        # Convert set to count
-        metadata["file_change_count"] = len(metadata["modified_files"])
-        del metadata["modified_files"]
+
+        accumulator.update_head(file_path)
+        return messages
+
+
+class SessionAccumulator:
+    """
+    Running parse state of a session file: the byte offset of the next unread
+    line plus the metadata counters, so appended lines can be parsed without
+    re-reading the whole file.
+    """
+
+    def __init__(self):
+        self.offset = 0
+        # Hash of the first head_length bytes, to detect files rewritten in place
+        self.head_length = 0
+        self.head_hash = None
+        self.inode = None
+
+        self.model = None
+        self.total_tokens = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cache_creation_tokens = 0
+        self.cache_read_tokens = 0
+        self.turns = 0
+        self.total_messages = 0
+        self.branch = None
+        self.token_usage_history = []
+        self.tool_stats = {}
+        self.modified_files = set()
+        # Analytics Counters
+        self.read_count = 0
+        self.write_count = 0
+        self.nav_miss_count = 0
+        self.nav_total_count = 0
+        self.user_chars = 0
+        # Timing Counters (messages are attributed in timestamp order)
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.last_time = None
+        self.user_duration = 0
+        self.model_duration = 0
+        self.timing_error = None
+        self.timeline = []  # (timestamp, role), only re-sorted if timestamps go backwards
+        self.timeline_sorted = True
+
+    def update_head(self, file_path: str):
+        """Remember the hash of the consumed head of the file (up to HEAD_HASH_BYTES)."""
+        if self.head_length >= HEAD_HASH_BYTES and self.head_hash is not None:
+            return
+        try:
+            self.inode = os.stat(file_path).st_ino
+            self.head_length = min(self.offset, HEAD_HASH_BYTES)
+            self.head_hash = file_head_hash(file_path, self.head_length)
+        except OSError:
+            self.head_hash = None
+
+    def can_resume(self, file_path: str) -> bool:
+        """Check that the file is the one this state was built from and has only been appended to."""
+        if self.head_hash is None:
+            return False
+        try:
+            st = os.stat(file_path)
+            if st.st_ino != self.inode or st.st_size < self.offset:
+                return False
+            return file_head_hash(file_path, self.head_length) == self.head_hash
+        except OSError:
+            return False
+
+    def feed(self, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Process one decoded JSONL record. Returns the message it produces, if any.
+
+        Message content is returned as structured blocks, (block_type, tool_name,
+        tool_use_id, input, text) tuples: "text" blocks carry text, "tool_use"
+        blocks the tool name, id and compact input JSON, "tool_result" blocks the
+        tool use id and result text. See storage.render_blocks for the display format.
+        Assistant messages also carry "tool_calls", the normalized file changes of
+        their tool_use blocks (see tool_calls.tool_call_rows).
+        """
+        # Determine role and content based on schema
+        role = None
+        blocks = []
+        tool_uses = []  # (block ordinal, tool name, decoded input)
+        timestamp = data.get("timestamp")
+
+        # Extract metadata from assistant messages
+        if "message" in data:
+            msg_obj = data["message"]
+            if msg_obj.get("model"):
+                self.model = msg_obj["model"]
+            if msg_obj.get("usage"):
+                usage = msg_obj["usage"]
+                i_tokens = usage.get("input_tokens", 0)
+                o_tokens = usage.get("output_tokens", 0)
+                self.input_tokens += i_tokens
+                self.output_tokens += o_tokens
+                self.total_tokens += (i_tokens + o_tokens)
+                self.cache_creation_tokens += usage.get("cache_creation_input_tokens") or 0
+                self.cache_read_tokens += usage.get("cache_read_input_tokens") or 0
+
+                # Record history point
+                self.token_usage_history.append({
+                    "timestamp": timestamp or datetime.now().isoformat(),
+                    "input": self.input_tokens,  # Cumulative
+                    "output": self.output_tokens, # Cumulative
+                    "total": self.total_tokens,
+                    "cache_creation": self.cache_creation_tokens,
+                    "cache_read": self.cache_read_tokens
+                })
+
+        # Case 1: Legacy/Simple format {"role": "...", "content": "..."}
+        if "role" in data:
+            role = data["role"]
+            content = data.get("content", "")
+            if content:
+                blocks.append(("text", None, None, None, content))
+
+        # Case 2: New format {"type": "user", "message": {...}}
+        elif "type" in data and data["type"] in ["user", "assistant"]:
+            msg_obj = data.get("message", {})
+            role = msg_obj.get("role")
+
+            if role == "user":
+                self.turns += 1
+
+            raw_content = msg_obj.get("content")
+
+            if isinstance(raw_content, list):
+                # Extract text from blocks
+                for block in raw_content:
+                    if block.get("type") == "text":
+                        txt = block.get("text", "")
+                        if txt:
+                            blocks.append(("text", None, None, None, txt))
+                        if role == "user":
+                            self.user_chars += len(txt)
+                    elif block.get("type") == "tool_use":
+                        # Track Tool Stats
+                        t_name = block.get('name')
+                        if t_name:
+                            self.tool_stats[t_name] = self.tool_stats.get(t_name, 0) + 1
+
+                        # Keep the input as compact JSON, it is only pretty-printed for display
+                        input_block = block.get('input', {})
+                        input_json = json.dumps(input_block, ensure_ascii=False, separators=(',', ':'))
+                        tool_uses.append((len(blocks), t_name, input_block))
+                        blocks.append(("tool_use", t_name, block.get('id'), input_json, None))
+
+                        # Analytics: Read vs Write
+                        tn_lower = t_name.lower()
+                        if any(x in tn_lower for x in ['view', 'read', 'list', 'search', 'glob', 'find']):
+                            self.read_count += 1
+                        elif any(x in tn_lower for x in ['write', 'edit', 'replace', 'create', 'append', 'run']):
+                            self.write_count += 1
+
+                        # Analytics: Navigation Total (view/list)
+                        if any(x in tn_lower for x in ['view_file', 'list_dir']):
+                            self.nav_total_count += 1
+
+                        # Track modified files
+                        tool_name = block.get('name', '')
+                        # Heuristic: Check common file manipulation tool names
+                        # Covers: write_to_file, replace_file_content, edit_file, create_file, etc.
+                        if any(x in tool_name.lower() for x in ['write', 'edit', 'replace', 'create', 'append']):
+                            # Try all common path keys
+                            path = (
+                                input_block.get('path') or 
+                                input_block.get('file_path') or 
+                                input_block.get('TargetFile') or
+                                input_block.get('filename') or
+                                input_block.get('target_file') or
+                                input_block.get('file')
+                            )
+                            if path:
+                                self.modified_files.add(path)
+                                self.modified_files.add(path)
+
+                        # Heuristic: Detect Git Branch from command
+                        if tool_name == "run_command":
+                            cmd = input_block.get('command', '')
+                            # Look for simple git branch checks
+                            # e.g. git branch --show-current
+                            if "git branch" in cmd or "git status" in cmd:
+                                pass # Ideally we look at tool_result next, but that's hard to correlate in this single pass easily without state.
+                                # Actually, sometimes agents output the branch in the thought process or finding it is hard.
+                                # But we can try to look at 'tool_result' blocks if we had state.
+                                # Simplified: Just check if we see tool_result later? 
+                                # For now, let's leave branch as None unless we find a very obvious indicator.
+                                pass
+                    elif block.get("type") == "tool_result":
+                        content_str = block.get('content', '')
+                        # Truncate very long results for display if needed, but for now keep full
+                        # Check if it's a list (some results are lists of blocks)
+                        if isinstance(content_str, list):
+                            # specific logic for list content in tool result?
+                            # often it's text w/ embedded images or just text
+                            # simple serialization for now
+                            content_str = json.dumps(content_str)
+
+                        # Analytics: Navigation Miss
+                        # Check if this result indicates a file system error
+                        # We accept false positives/negatives as heuristic
+                        low_res = content_str.lower()
+                        if "no such file" in low_res or "file not found" in low_res or "cannot access" in low_res:
+                             self.nav_miss_count += 1
+
+                        blocks.append(("tool_result", None, block.get('tool_use_id'), None, content_str))
+
+                # Heuristic: If the message originates from 'user' but contains 'tool_result' and NO 'text' blocks that are just user input,
+                # it is likely a tool output message.
+                # Check the blocks again to be sure:
+                if role == "user":
+                    has_tool_result = any(b.get("type") == "tool_result" for b in raw_content)
+                    has_user_text = any(b.get("type") == "text" for b in raw_content)
+
+                    if has_tool_result and not has_user_text:
+                        role = "tool"
+                        # Decrement turns since this isn't a user turn
+                        self.turns -= 1
+
+            elif isinstance(raw_content, str) and raw_content:
+                blocks.append(("text", None, None, None, raw_content))
+
+        if not (role and blocks):
+            return None
+
+        self.total_messages += 1
+        message = {
+            "role": role,
+            "blocks": blocks,
+            "timestamp": timestamp or datetime.now().isoformat()
+        }
+        if role == "assistant":
+            # File changes are persisted per tool call (see tool_calls.tool_call_rows)
+            message["tool_calls"] = tool_call_rows(tool_uses)
+        self._track_timing(message)
+        return message
+
+    def _track_timing(self, message: Dict[str, Any]):
+        """Attribute the gap before a message to its responder (see metadata())."""
+        ts = message["timestamp"]
+        self.timeline.append((ts, message["role"]))
+        if self.first_timestamp is None or ts < self.first_timestamp:
+            self.first_timestamp = ts
+        if self.last_timestamp is not None and ts < self.last_timestamp:
+            # Out of order, metadata() re-sorts the timeline
+            self.timeline_sorted = False
+            return
+        self.last_timestamp = ts
+        if not self.timeline_sorted or self.timing_error:
+            return
+
+        try:
+            t_curr = datetime.fromisoformat(ts)
+        except Exception as e:
+            self.timing_error = e
+            return
+        if self.last_time is not None:
+            diff = (t_curr - self.last_time).total_seconds()
+            if message["role"] == "user":
+                self.user_duration += diff
+            else:
+                self.model_duration += diff
+        self.last_time = t_curr
+
+
+    def metadata(self) -> Dict[str, Any]:
+        """Session metadata for everything fed so far. Does not modify the running state."""
+        metadata = {
+            "model": self.model,
+            "total_tokens": self.total_tokens,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "turns": self.turns,
+            "total_messages": self.total_messages,
+            "branch": self.branch,
+            "token_usage_history": list(self.token_usage_history),
+            "tool_stats": dict(self.tool_stats),
+            "write_count": self.write_count,
+            "file_change_count": len(self.modified_files)
+        }
 
         # Final Analytics Calculations
         # 1. Read/Write Ratio
-        if metadata["write_count"] > 0:
-            metadata["read_write_ratio"] = round(metadata["read_count"] / metadata["write_count"], 2)
+        if self.write_count > 0:
+            metadata["read_write_ratio"] = round(self.read_count / self.write_count, 2)
+        elif self.read_count > 0:
+            # If no writes, ratio is just the read count (treated as "ratio to 1")
+            metadata["read_write_ratio"] = float(self.read_count)
         else:
-            metadata["read_write_ratio"] = metadata["read_count"] # If no writes, ratio is just read count (infinity proxy) or just raw count.
-            # actually better to store as float. If write=0, maybe set to read_count * 1.0 or 999.0?
-            # Let's just set it to read_count if write is 0, treating it as "ratio to 1" conceptually if we consider base work.
-            # Or simplified: just store them as raw or calculated. Let's store ratio.
-            if metadata["read_count"] > 0:
-                metadata["read_write_ratio"] = float(metadata["read_count"])
-            else:
-                metadata["read_write_ratio"] = 0.0
+            metadata["read_write_ratio"] = 0.0
 
         # 2. Nav Miss Rate
-        if metadata["nav_total_count"] > 0:
-            metadata["nav_miss_rate"] = round((metadata["nav_miss_count"] / metadata["nav_total_count"]) * 100, 1)
+        if self.nav_total_count > 0:
+            metadata["nav_miss_rate"] = round((self.nav_miss_count / self.nav_total_count) * 100, 1)
         else:
             metadata["nav_miss_rate"] = 0.0
 
         # 3. Avg Prompt Length
         # Use Turns count (which we decremented for tool outputs, so it represents User Turns)
-        user_turns = max(1, metadata["turns"])
-        metadata["avg_prompt_len"] = round(metadata["user_chars"] / user_turns, 1)
-
-        # Cleanup temp counters
-        del metadata["read_count"]
-        # del metadata["write_count"] # Keep raw counts if useful? No, schema will just store metadata fields if we map them.
-        # Actually storage.py maps specific keys. I should ensure these keys exist in metadata.
-        # I will leave them in metadata for now, but explicit keys are 'read_write_ratio', 'nav_miss_rate', 'avg_prompt_len'.
-        del metadata["nav_miss_count"]
-        del metadata["nav_total_count"]
-        del metadata["user_chars"]
+        user_turns = max(1, self.turns)
+        metadata["avg_prompt_len"] = round(self.user_chars / user_turns, 1)
 
         # Calculate Timing Analysis
-        if messages:
-             # Sort by timestamp just in case
-            try:
-                sorted_msgs = sorted(messages, key=lambda m: m["timestamp"])
-                start_time = datetime.fromisoformat(sorted_msgs[0]["timestamp"])
-                end_time = datetime.fromisoformat(sorted_msgs[-1]["timestamp"])
-                
-                total_duration = (end_time - start_time).total_seconds()
-                metadata["total_duration_seconds"] = total_duration
-                
+        if self.timeline:
+            metadata.update(self._timing())
+
+        return metadata
+
+    def _timing(self) -> Dict[str, Any]:
+        """
+        Iterate and attribute time to the *responder*
+        (Time gap comes BEFORE the message, so gap = prev_msg to curr_msg)
+        If curr_msg is user, gap is "User Think Time" -> user_duration
+        If curr_msg is bot/tool, gap is "Processing Time" -> model_duration
+        """
+        try:
+            if self.timing_error:
+                raise self.timing_error
+
+            user_duration = self.user_duration
+            model_duration = self.model_duration
+            if not self.timeline_sorted:
+                # Timestamps went backwards, recompute over the sorted timeline
                 user_duration = 0
                 model_duration = 0
-                
-                # Iterate and attribute time to the *responder* 
-                # (Time gap comes BEFORE the message, so gap = prev_msg to curr_msg)
-                # If curr_msg is user, gap is "User Think Time" -> user_duration
-                # If curr_msg is bot/tool, gap is "Processing Time" -> model_duration
-                
-                for i in range(1, len(sorted_msgs)):
-                    curr = sorted_msgs[i]
-                    prev = sorted_msgs[i-1]
-                    
-                    t_curr = datetime.fromisoformat(curr["timestamp"])
-                    t_prev = datetime.fromisoformat(prev["timestamp"])
+                sorted_timeline = sorted(self.timeline, key=lambda m: m[0])
+                for i in range(1, len(sorted_timeline)):
+                    t_curr = datetime.fromisoformat(sorted_timeline[i][0])
+                    t_prev = datetime.fromisoformat(sorted_timeline[i - 1][0])
                     diff = (t_curr - t_prev).total_seconds()
-                    
-                    if curr["role"] == "user":
+                    if sorted_timeline[i][1] == "user":
                         user_duration += diff
                     else:
                         model_duration += diff
-                        
-                metadata["user_duration_seconds"] = user_duration
-                metadata["model_duration_seconds"] = model_duration
-                
-            except Exception as e:
-                logger.warning(f"Failed to calc timing for {file_path}: {e}")
-                metadata["total_duration_seconds"] = 0
-                metadata["user_duration_seconds"] = 0
-                metadata["model_duration_seconds"] = 0
-        
-        return {
-            "messages": messages,
-            "metadata": metadata
-        }
+
+            start_time = datetime.fromisoformat(self.first_timestamp)
+            end_time = datetime.fromisoformat(self.last_timestamp)
+            return {
+                "total_duration_seconds": (end_time - start_time).total_seconds(),
+                "user_duration_seconds": user_duration,
+                "model_duration_seconds": model_duration
+            }
+        except Exception as e:
+            logger.warning(f"Failed to calc timing: {e}")
+            return {
+                "total_duration_seconds": 0,
+                "user_duration_seconds": 0,
+                "model_duration_seconds": 0
+            }
+
+
+def parse_session_file(session_info: Dict[str, Any]) -> tuple:
+    """
+    Parse a single session file for the background scan.
+
+    Safe to run in a worker process: the result is compact and pre-serialized
+    (see storage.serialize_session), so it pickles cheaply and the writer inserts
+    it without re-encoding.
+
+    Returns (session_info, record, status) where status is PARSE_OK/PARSE_SKIPPED/PARSE_FAILED
+    and record is (project_name, project_path, session_row, message_rows, usage_rows) for PARSE_OK.
+    The file signature taken before parsing is stored in session_info['signature'].
+    """
+    file_path = session_info['file_path']
+    try:
+        session_info['signature'] = file_signature(file_path)
+
+        # Check if file is empty
+        if session_info['signature']['size'] == 0:
+            return (session_info, None, PARSE_SKIPPED)
+
+        result = LogParser(Path(file_path).parent).parse_session(file_path)
+        if not result['messages']:
+            # File has content but no valid messages (metadata only)
+            return (session_info, None, PARSE_SKIPPED)
+
+        project_name = session_info['project']
+        record = (
+            project_name,
+            session_info.get('project_path'),
+            *serialize_session(project_name, session_info, result['messages'], result['metadata'])
+        )
+        return (session_info, record, PARSE_OK)
+    except Exception as e:
+        logger.error(f"Error parsing {file_path}: {e}")
+        return (session_info, None, PARSE_FAILED)
@@ -6,16 +6,24 @@ from typing import List, Optional
 import os
 from pathlib import Path
 import logging
+import sqlite3
 import threading
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import multiprocessing
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from dataclasses import dataclass, field
-from time import time
+from time import sleep, time
 
 from claude_viewer.config import CLAUDE_LOG_PATH, DB_PATH
-from claude_viewer.parser import LogParser
-from claude_viewer.storage import Storage
+from claude_viewer.parser import (
+    LogParser, parse_session_file, file_stat_signature, file_head_hash,
+    PARSE_OK, PARSE_SKIPPED
+)
+from claude_viewer.storage import Storage, BATCH_CHUNK_BYTES
 from claude_viewer.config_manager import ConfigManager
 from claude_viewer.watcher import LogWatcher
+from claude_viewer.ingest import LiveIngester, SessionIndex
+from claude_viewer import git_objects
 
 logger = logging.getLogger(__name__)
 
@@ -26,16 +34,22 @@ class ScanProgress:
     total: int = 0
     completed: int = 0
     skipped: int = 0      # Empty files or metadata-only files (no conversation)
+    unchanged: int = 0    # Files matching the manifest (not re-parsed)
     failed: int = 0       # Actual parse errors
+    write_errors: int = 0  # Failed database writes (sessions or manifest)
     is_scanning: bool = False
+    recent_ready: bool = False  # Most recently modified sessions are committed
     start_time: float = 0
+    recent_ready_time: float = 0
     end_time: float = 0
 
     @property
     def percent(self) -> float:
         if self.total == 0:
             return 0
-        return round((self.completed / self.total) * 100, 1)
+        # Skipped and failed files are done too, or a scan with any of them never reaches 100%
+        processed = self.completed + self.unchanged + self.skipped + self.failed
+        return round((processed / self.total) * 100, 1)
 
     @property
     def elapsed_seconds(self) -> float:
@@ -44,20 +58,60 @@ class ScanProgress:
         end = self.end_time if self.end_time > 0 else time()
         return round(end - self.start_time, 2)
 
+    @property
+    def recent_ready_seconds(self) -> Optional[float]:
+        if self.recent_ready_time == 0:
+            return None
+        return round(self.recent_ready_time - self.start_time, 2)
+
     def to_dict(self) -> dict:
         return {
             "total": self.total,
             "completed": self.completed,
             "skipped": self.skipped,
+            "unchanged": self.unchanged,
             "failed": self.failed,
+            "write_errors": self.write_errors,
             "percent": self.percent,
             "is_scanning": self.is_scanning,
+            "recent_ready": self.recent_ready,
+            "recent_ready_seconds": self.recent_ready_seconds,
             "elapsed_seconds": self.elapsed_seconds
         }
 
 
+@dataclass
+class ScanConfig:
+    """Background scan settings (set from the `serve` command line)."""
+    parse_mode: str = "thread"    # "thread" or "process"
+    workers: Optional[int] = None  # Defaults depend on parse_mode
+    queue_depth: int = 64         # Parsed sessions waiting for the writer (bounds peak memory)
+    chunk_size: int = 100         # Sessions committed per write transaction
+    chunk_bytes: int = BATCH_CHUNK_BYTES  # ...or fewer, once their message text reaches this size
+    recent_batch_size: int = 50   # Newest sessions committed first, before the rest
+
+    @property
+    def max_workers(self) -> int:
+        if self.workers:
+            return self.workers
+        if self.parse_mode == "process":
+            # JSON decoding is CPU-bound, one worker per core
+            return os.cpu_count() or 4
+        return min(32, (os.cpu_count() or 2) * 4)
+
+    def create_executor(self):
+        if self.parse_mode == "process":
+            # spawn: never fork the server with its watcher/uvicorn threads running
+            return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return ThreadPoolExecutor(max_workers=self.max_workers)
+
+
 # Global scan progress tracker
 scan_progress = ScanProgress()
+scan_config = ScanConfig()
+
+# Seconds between full merges of the search index while the server runs
+SEARCH_OPTIMIZE_INTERVAL = 6 * 60 * 60
 
 app = FastAPI(title="Claude Code Viewer")
 
@@ -77,100 +131,230 @@ if not DB_PATH.parent.exists():
 storage = Storage(DB_PATH)
 parser = LogParser(CLAUDE_LOG_PATH)
 config_manager = ConfigManager()
+ingester = LiveIngester(parser, storage)
+session_index = SessionIndex()
 
 
-# Parse result status
-PARSE_OK = "ok"
-PARSE_SKIPPED = "skipped"  # Empty file or no messages (metadata only)
-PARSE_FAILED = "failed"    # Actual error
+def _is_unchanged(session_info: dict, manifest: dict) -> bool:
+    """Check whether a session file matches its manifest entry (size, mtime, inode and head hash)."""
+    entry = manifest.get(session_info['file_path'])
+    if not entry or entry['session_id'] != session_info['session_id']:
+        return False
+    try:
+        signature = file_stat_signature(session_info['file_path'])
+        if (signature['size'], signature['mtime_ns'], signature['inode']) != (entry['size'], entry['mtime_ns'], entry['inode']):
+            return False
+        # Only hash the head once the cheap stat comparison matched
+        return file_head_hash(session_info['file_path']) == entry['head_hash']
+    except OSError:
+        return False
+
+
+def _manifest_entry(session_info: dict, status: str) -> dict:
+    """Build a manifest entry from a parsed session's signature."""
+    return {
+        "file_path": session_info['file_path'],
+        "session_id": session_info['session_id'],
+        "status": status,
+        **session_info['signature']
+    }
+
+
+# Queue marker: everything before it belongs to the recent batch
+_RECENT_BATCH_DONE = "recent_batch_done"
+
+
+def _file_mtime(session_info: dict) -> float:
+    try:
+        return os.stat(session_info['file_path']).st_mtime
+    except OSError:
+        return 0
+
 
+# Seconds a put on the full results queue waits before checking the writer is alive
+_RESULTS_PUT_TIMEOUT = 1.0
 
-def _parse_single_session(session_info: dict) -> tuple:
+
+def _put_result(results: queue.Queue, item, writer: threading.Thread):
+    """Put an item for the writer, raising instead of blocking forever if the writer thread died."""
+    while True:
+        try:
+            results.put(item, timeout=_RESULTS_PUT_TIMEOUT)
+            return
+        except queue.Full:
+            if not writer.is_alive():
+                raise RuntimeError("Scan writer stopped, abandoning the scan")
+
+
+def _scan_producer(changed_list: list, results: queue.Queue, writer: threading.Thread):
     """
-    Parse a single session file.
-    Returns (session_info, result, status) where status is PARSE_OK/PARSE_SKIPPED/PARSE_FAILED.
+    Parse sessions in the worker pool and hand the results to the writer.
+
+    changed_list is ordered newest first. The first recent_batch_size sessions are
+    parsed completely before the rest, followed by a _RECENT_BATCH_DONE marker so
+    the writer commits them early.
     """
-    file_path = session_info['file_path']
-    try:
-        # Check if file is empty
-        if os.path.getsize(file_path) == 0:
-            return (session_info, None, PARSE_SKIPPED)
-
-        result = parser.parse_session(file_path)
-        if result['messages']:
-            return (session_info, result, PARSE_OK)
-        # File has content but no valid messages (metadata only)
-        return (session_info, None, PARSE_SKIPPED)
-    except Exception as e:
-        logger.error(f"Error parsing {file_path}: {e}")
-        return (session_info, None, PARSE_FAILED)
+    recent_count = scan_config.recent_batch_size
+
+    with scan_config.create_executor() as executor:
+        _parse_batch(executor, changed_list[:recent_count], results, writer)
+        _put_result(results, _RECENT_BATCH_DONE, writer)
+        _parse_batch(executor, changed_list[recent_count:], results, writer)
+
+
+def _parse_batch(executor, batch: list, results: queue.Queue, writer: threading.Thread):
+    """
+    Parse a batch of sessions and put each result on the queue as it completes.
+
+    At most max_workers * 2 parses are in flight, and putting into the bounded
+    queue blocks while the writer is behind, so parsed data never piles up.
+    """
+    max_in_flight = scan_config.max_workers * 2
+    pending = set()
+    todo = iter(batch)
+
+    while True:
+        for info in todo:
+            pending.add(executor.submit(parse_session_file, info))
+            if len(pending) >= max_in_flight:
+                break
+
+        if not pending:
+            break
+
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            _put_result(results, future.result(), writer)
+
+
+def _scan_writer(results: queue.Queue):
+    """Consume parse results and commit them in chunks until the None sentinel arrives."""
+    chunk = []
+    manifest_entries = []
+
+    def flush():
+        committed = 0
+
+        def on_commit(count):
+            nonlocal committed
+            committed = count
+
+        # A failed write must not end this thread: the producer would wait on the full queue
+        if chunk:
+            try:
+                # Workers return pre-serialized records, insert them as-is
+                storage.save_serialized_batch(
+                    [record for _, record in chunk], progress_callback=on_commit,
+                    chunk_sessions=scan_config.chunk_size, chunk_bytes=scan_config.chunk_bytes
+                )
+            except Exception as e:
+                logger.error(f"Error in batch save: {e}")
+                scan_progress.write_errors += 1
+                scan_progress.failed += len(chunk) - committed
+
+            # Sub-chunks committed before a failure are kept
+            scan_progress.completed += committed
+            manifest_entries.extend(_manifest_entry(session_info, PARSE_OK) for session_info, _ in chunk[:committed])
+            # Live parse states are stale once a file has been re-ingested from scratch
+            for session_info, _ in chunk[:committed]:
+                ingester.forget(session_info['file_path'])
+            chunk.clear()
+
+        # Record signatures so committed files are skipped on the next scan
+        try:
+            storage.update_manifest(manifest_entries)
+        except Exception as e:
+            # The files are simply parsed again by the next scan
+            logger.error(f"Error updating scan manifest: {e}")
+            scan_progress.write_errors += 1
+        manifest_entries.clear()
+
+    while True:
+        item = results.get()
+        if item is None:
+            break
+
+        if item == _RECENT_BATCH_DONE:
+            flush()
+            if not scan_progress.recent_ready:
+                scan_progress.recent_ready = True
+                scan_progress.recent_ready_time = time()
+                logger.info(f"Most recent sessions ready after {scan_progress.recent_ready_seconds}s")
+            continue
+
+        session_info, record, status = item
+        if status == PARSE_OK:
+            chunk.append((session_info, record))
+            if len(chunk) >= scan_config.chunk_size:
+                flush()
+        elif status == PARSE_SKIPPED:
+            scan_progress.skipped += 1
+            manifest_entries.append(_manifest_entry(session_info, PARSE_SKIPPED))
+        else:  # PARSE_FAILED
+            scan_progress.failed += 1
+
+    flush()
 
 
 def _background_scan():
-    """Background task to scan and parse all sessions in parallel."""
+    """Background task to scan and parse all changed sessions in parallel."""
     global scan_progress
 
     scan_progress.is_scanning = True
     scan_progress.start_time = time()
     scan_progress.completed = 0
     scan_progress.skipped = 0
+    scan_progress.unchanged = 0
     scan_progress.failed = 0
+    scan_progress.write_errors = 0
+    scan_progress.recent_ready = False
+    scan_progress.recent_ready_time = 0
     scan_progress.end_time = 0
 
-    # Collect all session info first
+    # Collect all session info first (known projects skip the path reconstruction probes)
+    parser.load_path_cache(storage.get_project_paths())
     session_list = list(parser.scan_projects())
+    storage.save_project_paths(parser.pop_resolved_paths())
     scan_progress.total = len(session_list)
+    session_index.rebuild(session_list)
 
     if scan_progress.total == 0:
         scan_progress.is_scanning = False
+        scan_progress.recent_ready = True
         scan_progress.end_time = time()
         logger.info("No sessions found to scan.")
         return
 
-    logger.info(f"Starting parallel scan of {scan_progress.total} sessions...")
-
-    # Use ThreadPoolExecutor for parallel I/O-bound parsing
-    max_workers = min(32, os.cpu_count() * 4 or 8)
-
-    # Collect parsed results first, then batch save
-    parsed_results = []
-
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = {
-            executor.submit(_parse_single_session, info): info
-            for info in session_list
-        }
-
-        for future in as_completed(futures):
-            session_info, result, status = future.result()
-            if status == PARSE_OK:
-                parsed_results.append((session_info, result))
-            elif status == PARSE_SKIPPED:
-                scan_progress.skipped += 1
-            else:  # PARSE_FAILED
-                scan_progress.failed += 1
+    # Skip files whose size, mtime, inode and head hash match the manifest
+    manifest = storage.get_manifest()
+    changed_list = [info for info in session_list if not _is_unchanged(info, manifest)]
+    scan_progress.unchanged = len(session_list) - len(changed_list)
 
-    # Batch save to database (single transaction, much faster)
-    logger.info(f"Parsing complete, saving {len(parsed_results)} sessions to database...")
+    # Most recently modified sessions first, so the UI fills up early
+    changed_list.sort(key=_file_mtime, reverse=True)
 
-    def update_progress(count):
-        scan_progress.completed = count
+    logger.info(
+        f"Starting parallel scan of {len(changed_list)} changed sessions "
+        f"({scan_progress.unchanged} unchanged, {scan_config.parse_mode} mode, "
+        f"{scan_config.max_workers} workers)..."
+    )
 
+    # Parser workers feed a bounded queue, a single writer commits in chunks meanwhile
+    results = queue.Queue(maxsize=scan_config.queue_depth)
+    writer = threading.Thread(target=_scan_writer, args=(results,), daemon=True)
+    writer.start()
     try:
-        batch_data = [
-            (
-                session_info['project'],
-                session_info,
-                result['messages'],
-                result['metadata'],
-                session_info.get('project_path')
-            )
-            for session_info, result in parsed_results
-        ]
-        storage.save_sessions_batch(batch_data, progress_callback=update_progress)
+        _scan_producer(changed_list, results, writer)
     except Exception as e:
-        logger.error(f"Error in batch save: {e}")
-        scan_progress.failed += len(parsed_results) - scan_progress.completed
+        logger.error(f"Error in scan pipeline: {e}")
+    finally:
+        try:
+            _put_result(results, None, writer)
+        except RuntimeError:
+            pass
+        writer.join()
+
+    storage.prune_manifest(set(s['file_path'] for s in session_list))
 
     # Cleanup orphaned sessions (files deleted but records remain in DB)
     all_file_session_ids = set(s['session_id'] for s in session_list)
@@ -178,15 +362,40 @@ def _background_scan():
     if orphaned_count > 0:
         logger.info(f"Removed {orphaned_count} orphaned session(s) from database")
 
+    if scan_progress.completed or orphaned_count:
+        storage.optimize_search_index()
+
     scan_progress.is_scanning = False
     scan_progress.end_time = time()
     logger.info(
         f"Scan complete: {scan_progress.completed} sessions loaded, "
+        f"{scan_progress.unchanged} unchanged, "
         f"{scan_progress.skipped} skipped, {scan_progress.failed} failed, "
         f"took {scan_progress.elapsed_seconds}s"
     )
 
 
+def _search_index_maintenance():
+    """Periodically merge the search index so live appends do not fragment it."""
+    while True:
+        sleep(SEARCH_OPTIMIZE_INTERVAL)
+        try:
+            storage.optimize_search_index()
+        except Exception as e:
+            logger.error(f"Error optimizing search index: {e}")
+
+
+def _pending_compaction(scan_thread: threading.Thread):
+    """Run compaction left pending by schema migrations, once the initial scan is done."""
+    scan_thread.join()
+    try:
+        if storage.compaction_pending():
+            logger.info("Compacting database...")
+            storage.compact()
+    except Exception as e:
+        logger.error(f"Error compacting database: {e}")
+
+
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting up...")
@@ -196,26 +405,39 @@ async def startup_event():
     scan_thread.start()
     logger.info("Background scan started, server is ready to accept requests.")
 
+    threading.Thread(target=_search_index_maintenance, daemon=True).start()
+    threading.Thread(target=_pending_compaction, args=(scan_thread,), daemon=True).start()
+
     # Start watcher for live updates
     def on_log_change(file_path):
         try:
-            for session_info in parser.scan_projects():
-                if os.path.abspath(session_info['file_path']) == os.path.abspath(file_path):
-                    result = parser.parse_session(file_path)
-                    if result['messages']:
-                        storage.save_session(
-                            session_info['project'],
-                            session_info,
-                            result['messages'],
-                            result['metadata'],
-                            project_path=session_info.get('project_path')
-                        )
-                    logger.info(f"Updated session from {file_path}")
-                    break
+            session_info = session_index.get(file_path)
+            if session_info is None:
+                # New file (or initial scan still running): resolve just this file
+                session_info = parser.session_info_for_file(file_path)
+                if session_info is None:
+                    return
+                session_index.add(session_info)
+                storage.save_project_paths(parser.pop_resolved_paths())
+
+            # Only the lines appended since the last update are parsed
+            count = ingester.ingest(session_info)
+            logger.info(f"Updated session from {file_path} ({count} new messages)")
         except Exception as e:
             logger.error(f"Error processing update: {e}")
 
-    watcher = LogWatcher(CLAUDE_LOG_PATH, on_log_change)
+    def on_log_delete(file_path):
+        try:
+            session_info = session_index.remove(file_path)
+            if session_info is None:
+                return
+            ingester.forget(session_info['file_path'])
+            storage.delete_sessions([session_info['session_id']])
+            logger.info(f"Removed session {session_info['session_id']} ({file_path} deleted)")
+        except Exception as e:
+            logger.error(f"Error processing removal: {e}")
+
+    watcher = LogWatcher(CLAUDE_LOG_PATH, on_log_change, on_log_delete)
     watcher.start()
 
     # Store watcher in app state to prevent GC
@@ -225,6 +447,9 @@ async def startup_event():
 def shutdown_event():
     if hasattr(app.state, "watcher"):
         app.state.watcher.stop()
+    # Commit the writes still queued (e.g. coalescing watcher updates) and release the connections
+    storage.close(timeout=30)
+    git_objects.close_all()
 
 
 @app.get("/api/scan/progress")
@@ -233,13 +458,22 @@ def get_scan_progress():
     return scan_progress.to_dict()
 
 
+@app.get("/api/db/writer")
+def get_writer_metrics():
+    """Write queue depth, coalescing and commit latency of the database writer."""
+    return storage.writer.metrics()
+
+
 @app.post("/api/scan/rescan")
-def trigger_rescan():
-    """Trigger a manual rescan of all sessions."""
+def trigger_rescan(force: bool = False):
+    """Trigger a manual rescan of all sessions. With force, unchanged files are re-parsed too."""
     global scan_progress
     if scan_progress.is_scanning:
         return {"status": "already_scanning", "progress": scan_progress.to_dict()}
 
+    if force:
+        storage.prune_manifest()
+
     scan_thread = threading.Thread(target=_background_scan, daemon=True)
     scan_thread.start()
     return {"status": "started"}
@@ -264,18 +498,106 @@ def get_sessions(project_name: str):
 def get_session_changes(session_id: str):
     return analytics.get_session_changes(session_id)
 
+@app.get("/api/sessions/{session_id}/changes/{change_id}")
+def get_session_change_diff(session_id: str, change_id: int):
+    """Contents and unified diff of one entry of the changes index."""
+    change = analytics.get_change_diff(session_id, change_id)
+    if change is None:
+        raise HTTPException(status_code=404, detail="File change not found")
+    return change
+
 @app.get("/api/sessions/{session_id}")
 def get_session(session_id: str):
     return storage.get_messages(session_id)
 
+@app.get("/api/sessions/{session_id}/messages")
+def get_session_messages(
+    session_id: str,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    direction: str = Query("asc", pattern="^(asc|desc)$"),
+    max_bytes: Optional[int] = Query(None, ge=1),
+):
+    """
+    Keyset-paginated messages; pass next_cursor back as cursor for the next page.
+    With max_bytes, long bodies are truncated and such messages carry a content_url
+    to fetch the full text.
+    """
+    try:
+        page = storage.get_messages_page(session_id, limit=limit, cursor=cursor, direction=direction, max_bytes=max_bytes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    for msg in page["messages"]:
+        if msg.get("truncated"):
+            msg["content_url"] = f"/api/messages/{msg['id']}"
+    return page
+
+@app.get("/api/messages/{message_id}")
+def get_message(message_id: int):
+    message = storage.get_message(message_id)
+    if message is None:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return message
+
 @app.get("/api/sessions/{session_id}/oneshot")
-def get_session_oneshot(session_id: str, exclude: Optional[str] = None):
+def get_session_oneshot(
+    session_id: str,
+    exclude: Optional[str] = None,
+    source: str = Query("worktree", pattern="^(worktree|head|session_end)$")
+):
+    exclude_list = exclude.split(',') if exclude else None
+    return analytics.calculate_oneshot_stats(session_id, exclude_list, source=source)
+
+@app.get("/api/sessions/{session_id}/survival/history")
+def get_session_survival_history(
+    session_id: str,
+    exclude: Optional[str] = None,
+    points: int = Query(20, ge=2, le=200)
+):
+    """Survival of the session's code at the commits made since it ended (git projects only)."""
     exclude_list = exclude.split(',') if exclude else None
-    return analytics.calculate_oneshot_stats(session_id, exclude_list)
+    try:
+        return analytics.calculate_survival_history(session_id, exclude_list, points)
+    except GitReadError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+@app.get("/api/sessions/{session_id}/oneshot/file")
+def get_session_oneshot_file(session_id: str, path: str):
+    """Session and current content of one file of the One-Shot stats."""
+    contents = analytics.get_oneshot_file(session_id, path)
+    if contents is None:
+        raise HTTPException(status_code=404, detail="File change not found")
+    return contents
+
+@app.get("/api/projects/{project_name}/survival")
+def get_project_survival(project_name: str, exclude: Optional[str] = None):
+    """Code survival of all sessions of a project, with per-session and per-file breakdowns."""
+    exclude_list = exclude.split(',') if exclude else None
+    survival = analytics.calculate_project_survival(project_name, exclude_list)
+    if survival is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return survival
 
 @app.get("/api/search")
-def search(q: str = Query(..., min_length=1)):
-    return storage.search_messages(q)
+def search(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    project: Optional[str] = None,
+    role: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+):
+    """Ranked full-text search; pass next_cursor back as cursor for the next page."""
+    try:
+        return storage.search_messages(
+            q, limit=limit, cursor=cursor,
+            project=project, role=role, model=model, since=since, until=until
+        )
+    except (sqlite3.OperationalError, ValueError) as e:
+        # Malformed FTS query or cursor
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/api/tags")
 def get_tags():
@@ -343,9 +665,29 @@ def delete_config(path: str):
 
 
 
-from claude_viewer.analytics import Analytics
+from claude_viewer.analytics import Analytics, DEFAULT_SERIES_POINTS, GitReadError
+
+analytics = Analytics(DB_PATH, storage=storage)
+
+@app.get("/api/sessions/{session_id}/token-usage")
+def get_session_token_usage(
+    session_id: str,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: int = Query(DEFAULT_SERIES_POINTS, ge=3, le=5000),
+):
+    """Cumulative token usage of a session within [start, end], downsampled to at most `points` points."""
+    return analytics.get_session_token_usage(session_id, start=start, end=end, points=points)
 
-analytics = Analytics(DB_PATH)
+@app.get("/api/token-usage")
+def get_token_timeline(
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    points: int = Query(DEFAULT_SERIES_POINTS, ge=1, le=5000),
+    project: Optional[str] = None,
+):
+    """Token usage across sessions within [start, end], summed into at most `points` time buckets."""
+    return analytics.get_token_timeline(start=start, end=end, points=points, project_name=project)
 
 @app.get("/api/analytics")
 def get_analytics():
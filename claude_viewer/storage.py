@@ -1,186 +1,1097 @@
 import sqlite3
+import html
 import json
+import os
+import zlib
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import logging
 import threading
+from itertools import groupby
+
+from claude_viewer.db_writer import DBWriter
+from claude_viewer.tool_calls import change_stats, tool_call_rows, tool_call_rows_from_blocks
 
 logger = logging.getLogger(__name__)
 
+# Column order of session_row()
+SESSION_COLUMNS = (
+    "id", "project_name", "file_path", "start_time", "model",
+    "total_tokens", "input_tokens", "output_tokens", "turns", "branch",
+    "file_change_count", "total_duration_seconds", "user_duration_seconds", "model_duration_seconds",
+    "total_messages", "tool_stats", "read_write_ratio", "nav_miss_rate", "avg_prompt_len"
+)
+
+
+def session_row(project_name: str, session_data: Dict[str, Any], messages: List[Dict[str, Any]], metadata: Dict[str, Any]) -> tuple:
+    """Build the sessions table row (in SESSION_COLUMNS order) for a parsed session."""
+    return (
+        session_data['session_id'],
+        project_name,
+        session_data['file_path'],
+        messages[0]['timestamp'] if messages else None,
+        metadata.get('model'),
+        metadata.get('total_tokens', 0),
+        metadata.get('input_tokens', 0),
+        metadata.get('output_tokens', 0),
+        metadata.get('turns', 0),
+        metadata.get('branch'),
+        metadata.get('file_change_count', 0),
+        metadata.get('total_duration_seconds', 0),
+        metadata.get('user_duration_seconds', 0),
+        metadata.get('model_duration_seconds', 0),
+        metadata.get('total_messages', 0),
+        json.dumps(metadata.get('tool_stats', {})),
+        metadata.get('read_write_ratio', 0.0),
+        metadata.get('nav_miss_rate', 0.0),
+        metadata.get('avg_prompt_len', 0.0)
+    )
+
+
+# Cumulative counters of a token_usage_history point, in token_usage column order
+TOKEN_USAGE_KEYS = ("input", "output", "cache_creation", "cache_read")
+
+
+def token_usage_rows(history: List[Dict[str, Any]], start: int = 0) -> List[tuple]:
+    """
+    Build token_usage rows (seq, timestamp, input, output, cache_creation, cache_read)
+    from a cumulative token_usage_history, one row per point with the tokens it added.
+
+    Args:
+        start: Index of the first point to return (earlier points are already stored)
+    """
+    rows = []
+    previous = history[start - 1] if 0 < start <= len(history) else {}
+    for seq in range(start, len(history)):
+        point = history[seq]
+        rows.append((seq, point.get('timestamp'), *(
+            (point.get(key) or 0) - (previous.get(key) or 0) for key in TOKEN_USAGE_KEYS
+        )))
+        previous = point
+    return rows
+
+
+# Search snippets: highlight markers (control characters, so they cannot clash with
+# text that is HTML-escaped afterwards) and snippet length in tokens
+_MARK_START = "\x02"
+_MARK_END = "\x03"
+SNIPPET_TOKENS = 32
+
+# Matches ranked together per search window (see Storage.search_messages); bounds
+# the bm25 work of very common terms
+SEARCH_RANK_WINDOW = 10000
+
+
+def _decode_message_cursor(cursor: str) -> tuple:
+    """Split a message page cursor ("id" or "id:timestamp") into (timestamp, message_id)."""
+    message_id, sep, timestamp = cursor.partition(":")
+    try:
+        return (timestamp if sep else None), int(message_id)
+    except ValueError:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+
+
+def _encode_message_cursor(message: Dict[str, Any]) -> str:
+    if message['timestamp'] is None:
+        return str(message['id'])
+    return f"{message['id']}:{message['timestamp']}"
+
+
+def _decode_search_cursor(cursor: str) -> tuple:
+    """Split a search next_cursor into (window_end, rank, message_id); window_end is None for the newest window."""
+    try:
+        window_end, rank, message_id = cursor.split(":")
+        return (int(window_end) if window_end else None), float(rank), int(message_id)
+    except ValueError:
+        raise ValueError(f"Invalid search cursor: {cursor}")
+
+
+# Pragmas applied to every pooled connection (see Storage.reader); query_only is
+# dropped for the writer. There is one reader per request thread, so the private page
+# cache stays small: pages read through mmap live in the OS file cache, which all
+# connections share.
+READ_PRAGMAS = {
+    "cache_size": -8192,  # negative means KiB: 8 MiB page cache per connection
+    "mmap_size": 268435456,  # read up to 256 MiB of the file through mmap (shared pages)
+    "temp_store": "MEMORY",
+    "query_only": 1,
+}
+
+# Prepared statements kept per connection (sqlite3's per-connection statement cache)
+STATEMENT_CACHE_SIZE = 256
+
+# Block input/text larger than this (UTF-8 bytes) is stored zlib-compressed as a BLOB
+COMPRESS_MIN_BYTES = 1024
+
+# save_serialized_batch commits after this many sessions or this many bytes of message
+# text, whichever comes first, releasing the write lock in between
+BATCH_CHUNK_SESSIONS = 100
+BATCH_CHUNK_BYTES = 32 * 1024 * 1024
+
+# Appended to block bodies cut by the lightweight message mode (see Storage.get_messages_page)
+TRUNCATION_MARKER = "\n[... truncated]"
+
+
+def pack_text(value: Optional[str]):
+    """Compress a block body for storage if it is above COMPRESS_MIN_BYTES."""
+    if value is None:
+        return None
+    data = value.encode('utf-8')
+    if len(data) <= COMPRESS_MIN_BYTES:
+        return value
+    return zlib.compress(data)
+
+
+def unpack_text(value) -> Optional[str]:
+    """Inverse of pack_text: BLOBs are compressed text, anything else is returned as is."""
+    if isinstance(value, bytes):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+
+def truncate_text(text: str, max_bytes: int) -> Tuple[str, bool]:
+    """Cut text to at most max_bytes of UTF-8 (on a character boundary); returns (text, was_truncated)."""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text, False
+    return encoded[:max_bytes].decode("utf-8", errors="ignore") + TRUNCATION_MARKER, True
+
+
+def render_blocks(blocks: List[tuple], max_bytes: Optional[int] = None) -> Tuple[str, bool]:
+    """
+    Assemble the message content format the frontend renders from stored blocks.
+
+    Args:
+        blocks: (block_type, tool_name, input, text) tuples in ordinal order, bodies uncompressed
+        max_bytes: Optional budget per block body; longer bodies are cut so the block tags stay intact
+
+    Returns:
+        (content, whether any block body was truncated)
+    """
+    parts = []
+    truncated = False
+    for block_type, tool_name, input_json, text in blocks:
+        if block_type == "tool_use":
+            body = json.dumps(json.loads(input_json), indent=2)
+        else:
+            body = text or ""
+        if max_bytes is not None:
+            body, cut = truncate_text(body, max_bytes)
+            truncated = truncated or cut
+        if block_type == "tool_use":
+            parts.append(f"\n<tool-use name=\"{tool_name}\">\n{body}\n</tool-use>\n")
+        elif block_type == "tool_result":
+            parts.append(f"\n<tool-result>\n{body}\n</tool-result>\n")
+        else:
+            parts.append(body)
+    return "".join(parts), truncated
+
+
+def message_search_text(blocks: List[tuple]) -> str:
+    """Text indexed for full-text search: block text plus tool names and inputs."""
+    parts = []
+    for block_type, tool_name, tool_use_id, input_json, text in blocks:
+        if block_type == "tool_use":
+            parts.append(f"{tool_name} {input_json}")
+        elif text:
+            parts.append(text)
+    return "\n".join(parts)
+
+
+def message_row(msg: Dict[str, Any]) -> tuple:
+    """
+    Build the (role, timestamp, search_text, blocks, tool_calls) insert row of a parsed message.
+
+    Large block bodies and tool call contents are compressed here (see pack_text),
+    the search text stays plain. File changes get their size and line counts here
+    too, so listing them never has to read the contents (see change_stats).
+    """
+    blocks = msg.get('blocks')
+    if blocks is None:
+        # Messages built outside the parser may still carry plain content
+        content = msg.get('content', '')
+        blocks = [("text", None, None, None, content)] if content else []
+    packed = [
+        (block_type, tool_name, tool_use_id, pack_text(input_json), pack_text(text))
+        for block_type, tool_name, tool_use_id, input_json, text in blocks
+    ]
+    tool_calls = msg.get('tool_calls')
+    if tool_calls is None:
+        tool_calls = tool_call_rows_from_blocks(msg['role'], blocks)
+    packed_calls = [
+        (ordinal, tool_name, change_type, path, pack_text(new_content), pack_text(old_content),
+         *(change_stats(new_content, old_content) if change_type is not None else (None, None, None)))
+        for ordinal, tool_name, change_type, path, new_content, old_content in tool_calls
+    ]
+    return (msg['role'], msg['timestamp'], message_search_text(blocks), packed, packed_calls)
+
+
+def serialize_session(project_name: str, session_data: Dict[str, Any], messages: List[Dict[str, Any]], metadata: Dict[str, Any]) -> tuple:
+    """
+    Pre-serialize a parsed session into (session_row, message_rows, usage_rows) ready for insert.
+
+    Used by scan workers so the writer does not have to re-encode anything.
+    message_rows are (role, timestamp, search_text, blocks, tool_calls) tuples, see
+    message_row; usage_rows are token_usage rows, see token_usage_rows.
+    """
+    return (
+        session_row(project_name, session_data, messages, metadata),
+        [message_row(msg) for msg in messages],
+        token_usage_rows(metadata.get('token_usage_history', []))
+    )
+
+
+def _record_size(record: tuple) -> int:
+    """Approximate size of a serialized session's message text (characters or compressed bytes)."""
+    size = 0
+    for _, _, search_text, blocks, _ in record[3]:
+        size += len(search_text or "")
+        for block in blocks:
+            size += len(block[3] or "") + len(block[4] or "")
+    return size
+
+
+def _chunk_records(records: List[tuple], max_sessions: int, max_bytes: int):
+    """Split serialized session records into chunks of at most max_sessions / about max_bytes."""
+    chunk = []
+    size = 0
+    for record in records:
+        record_size = _record_size(record)
+        if chunk and (len(chunk) >= max_sessions or size + record_size > max_bytes):
+            yield chunk
+            chunk = []
+            size = 0
+        chunk.append(record)
+        size += record_size
+    if chunk:
+        yield chunk
+
+
+def _merge_session_writes(queued: tuple, new: tuple) -> tuple:
+    """
+    Coalesce two queued writes of one session (arguments of Storage._write_session).
+
+    A save replaces the whole session, so it supersedes whatever was queued; an
+    append extends the queued write with its messages and the newer metadata and
+    manifest entry.
+    """
+    if new[0] == "save":
+        return new
+    mode, _, _, queued_messages, _, _, queued_manifest = queued
+    _, project_name, session_data, messages, metadata, project_path, manifest_entry = new
+    return (mode, project_name, session_data, queued_messages + messages, metadata, project_path,
+            manifest_entry or queued_manifest)
+
+
+_INSERT_TOKEN_USAGE_SQL = (
+    "INSERT INTO token_usage (session_id, seq, timestamp, input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+
+_INSERT_SESSION_SQL = "INSERT OR REPLACE INTO sessions ({}) VALUES ({})".format(
+    ", ".join(SESSION_COLUMNS), ", ".join("?" * len(SESSION_COLUMNS))
+)
+
+# Update the session row in place; start_time stays at the first message ever ingested
+_UPSERT_SESSION_SQL = "INSERT INTO sessions ({}) VALUES ({}) ON CONFLICT(id) DO UPDATE SET {}".format(
+    ", ".join(SESSION_COLUMNS),
+    ", ".join("?" * len(SESSION_COLUMNS)),
+    ", ".join(
+        "start_time = COALESCE(sessions.start_time, excluded.start_time)" if col == "start_time" else f"{col} = excluded.{col}"
+        for col in SESSION_COLUMNS if col != "id"
+    )
+)
+
+
+def _migrate_base_schema(c: sqlite3.Cursor):
+    """Schema as of before versioned migrations; tolerates databases that already have parts of it."""
+    # Projects table
+    c.execute('''CREATE TABLE IF NOT EXISTS projects (
+        name TEXT PRIMARY KEY,
+        path TEXT,
+        last_updated TIMESTAMP
+    )''')
+
+    # Sessions table
+    c.execute('''CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        project_name TEXT,
+        file_path TEXT,
+        start_time TIMESTAMP,
+        model TEXT,
+        total_tokens INTEGER,
+        FOREIGN KEY(project_name) REFERENCES projects(name)
+    )''')
+
+    # Columns added over time; unversioned databases may have any subset of them
+    for table, col, type_ in [
+        ("sessions", "model", "TEXT"),
+        ("sessions", "total_tokens", "INTEGER"),
+        ("sessions", "file_change_count", "INTEGER DEFAULT 0"),
+        ("projects", "path", "TEXT"),
+        ("sessions", "input_tokens", "INTEGER DEFAULT 0"),
+        ("sessions", "output_tokens", "INTEGER DEFAULT 0"),
+        ("sessions", "turns", "INTEGER DEFAULT 0"),
+        ("sessions", "branch", "TEXT"),
+        ("sessions", "token_usage_history", "TEXT"),
+        ("sessions", "total_duration_seconds", "INTEGER DEFAULT 0"),
+        ("sessions", "user_duration_seconds", "INTEGER DEFAULT 0"),
+        ("sessions", "model_duration_seconds", "INTEGER DEFAULT 0"),
+        ("sessions", "total_messages", "INTEGER DEFAULT 0"),
+        ("sessions", "tool_stats", "TEXT"),
+        ("sessions", "read_write_ratio", "REAL DEFAULT 0"),
+        ("sessions", "nav_miss_rate", "REAL DEFAULT 0"),
+        ("sessions", "avg_prompt_len", "REAL DEFAULT 0")
+    ]:
+        try:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {col} {type_}")
+        except sqlite3.OperationalError:
+            pass  # Column exists
+
+    # Messages table with FTS
+    c.execute('''CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT,
+        role TEXT,
+        content TEXT,
+        timestamp TIMESTAMP,
+        FOREIGN KEY(session_id) REFERENCES sessions(id)
+    )''')
+
+    # FTS table for full-text search on content
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+        content,
+        content_rowid UNINDEXED
+    )''')
+
+    # File manifest: last ingested signature of each session log file,
+    # used by the background scan to skip files that have not changed
+    c.execute('''CREATE TABLE IF NOT EXISTS file_manifest (
+        file_path TEXT PRIMARY KEY,
+        session_id TEXT,
+        size INTEGER,
+        mtime_ns INTEGER,
+        inode INTEGER,
+        head_hash TEXT,
+        status TEXT,
+        updated_at TIMESTAMP
+    )''')
+
+    # Reconstructed real paths of encoded project directory names
+    c.execute('''CREATE TABLE IF NOT EXISTS project_paths (
+        encoded_name TEXT PRIMARY KEY,
+        project_name TEXT,
+        path TEXT,
+        updated_at TIMESTAMP
+    )''')
+
+    # Tags table
+    c.execute('''CREATE TABLE IF NOT EXISTS tags (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT UNIQUE,
+        color TEXT
+    )''')
+
+    # Session Tags mapping
+    c.execute('''CREATE TABLE IF NOT EXISTS session_tags (
+        session_id TEXT,
+        tag_id INTEGER,
+        PRIMARY KEY (session_id, tag_id),
+        FOREIGN KEY(session_id) REFERENCES sessions(id),
+        FOREIGN KEY(tag_id) REFERENCES tags(id)
+    )''')
+
+
+def _migrate_message_blocks(c: sqlite3.Cursor):
+    """Structured message content: one row per text, tool_use or tool_result block (see render_blocks)."""
+    c.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'message_blocks'")
+    had_blocks = c.fetchone() is not None
+    c.execute('''CREATE TABLE IF NOT EXISTS message_blocks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        message_id INTEGER,
+        ordinal INTEGER,
+        block_type TEXT,
+        tool_name TEXT,
+        tool_use_id TEXT,
+        input TEXT,
+        text TEXT,
+        FOREIGN KEY(message_id) REFERENCES messages(id)
+    )''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_message_blocks_message ON message_blocks(message_id, ordinal)")
+
+    if not had_blocks:
+        c.execute("SELECT 1 FROM messages LIMIT 1")
+        if c.fetchone() is not None:
+            # Messages stored before blocks existed: re-ingest every session on the next scan
+            c.execute("DELETE FROM file_manifest")
+            logger.info("Message blocks table created, existing sessions will be re-ingested")
+
+
+def _migrate_compressed_blocks(c: sqlite3.Cursor) -> bool:
+    """Block bodies stored before compression existed are compressed by Storage.compact."""
+    c.execute(
+        "SELECT 1 FROM message_blocks WHERE (typeof(input) = 'text' AND length(CAST(input AS BLOB)) > ?) "
+        "OR (typeof(text) = 'text' AND length(CAST(text AS BLOB)) > ?) LIMIT 1",
+        (COMPRESS_MIN_BYTES, COMPRESS_MIN_BYTES)
+    )
+    return c.fetchone() is not None
+
+
+def _migrate_indexes(c: sqlite3.Cursor):
+    """Indexes for the per-session and per-project lookups (see tests/test_query_plans.py)."""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_messages_session_time ON messages(session_id, timestamp)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_sessions_project_time ON sessions(project_name, start_time)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_file_manifest_session ON file_manifest(session_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_session_tags_tag ON session_tags(tag_id)")
+    c.execute("ANALYZE")
+
+
+def _migrate_external_content_fts(c: sqlite3.Cursor):
+    """
+    Rebuild messages_fts as an external-content index over messages.content, kept in
+    sync by triggers. messages.content holds the plain search text (message_search_text);
+    the display content is still rendered from message_blocks.
+    """
+    # The old standalone index stored its own copy of the text and leaked rows on re-ingest
+    c.execute("DROP TABLE IF EXISTS messages_fts")
+
+    writer = c.connection.cursor()
+    c.execute("""
+        SELECT message_id, block_type, tool_name, tool_use_id, input, text
+        FROM message_blocks ORDER BY message_id, ordinal
+    """)
+    updates = []
+    for message_id, rows in groupby(c, key=lambda row: row[0]):
+        blocks = [(block_type, tool_name, tool_use_id, unpack_text(input_json), unpack_text(text))
+                  for _, block_type, tool_name, tool_use_id, input_json, text in rows]
+        updates.append((message_search_text(blocks), message_id))
+        if len(updates) >= 1000:
+            writer.executemany("UPDATE messages SET content = ? WHERE id = ?", updates)
+            updates = []
+    writer.executemany("UPDATE messages SET content = ? WHERE id = ?", updates)
+
+    c.execute('''CREATE VIRTUAL TABLE messages_fts USING fts5(
+        content,
+        content='messages',
+        content_rowid='id'
+    )''')
+    c.execute('''CREATE TRIGGER messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END''')
+    c.execute('''CREATE TRIGGER messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+    END''')
+    c.execute('''CREATE TRIGGER messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+        INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+    END''')
+    c.execute("INSERT INTO messages_fts (messages_fts) VALUES ('rebuild')")
+
+
+def _migrate_rollups(c: sqlite3.Cursor):
+    """
+    Create the dashboard rollup tables and backfill them from the existing rows.
+    From here on they are kept up to date with deltas by every write path.
+    """
+    c.execute('''CREATE TABLE rollup_projects (
+        project_name TEXT PRIMARY KEY,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0,
+        tokens INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TABLE rollup_models (
+        model TEXT PRIMARY KEY,
+        sessions INTEGER NOT NULL DEFAULT 0
+    )''')
+    # Per (day, session) so distinct session and project counts per day stay exact
+    c.execute('''CREATE TABLE rollup_session_days (
+        day TEXT NOT NULL,
+        session_id TEXT NOT NULL,
+        project_name TEXT,
+        messages INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, session_id)
+    )''')
+    c.execute("CREATE INDEX idx_rollup_session_days_session ON rollup_session_days(session_id)")
+    c.execute('''CREATE TABLE rollup_hours (
+        hour INTEGER PRIMARY KEY,
+        messages INTEGER NOT NULL DEFAULT 0
+    )''')
+    c.execute('''CREATE TABLE rollup_tags (
+        tag_id INTEGER PRIMARY KEY,
+        sessions INTEGER NOT NULL DEFAULT 0,
+        messages INTEGER NOT NULL DEFAULT 0
+    )''')
+
+    c.execute('''
+        INSERT INTO rollup_projects (project_name, sessions, tokens)
+        SELECT project_name, count(*), SUM(COALESCE(total_tokens, 0)) FROM sessions GROUP BY project_name
+    ''')
+    c.execute('''
+        UPDATE rollup_projects SET messages = (
+            SELECT count(*) FROM messages m JOIN sessions s ON m.session_id = s.id
+            WHERE s.project_name = rollup_projects.project_name
+        )
+    ''')
+    c.execute('''
+        INSERT INTO rollup_models (model, sessions)
+        SELECT model, count(*) FROM sessions WHERE model IS NOT NULL GROUP BY model
+    ''')
+    c.execute('''
+        INSERT INTO rollup_session_days (day, session_id, project_name, messages)
+        SELECT date(m.timestamp), m.session_id, s.project_name, count(*)
+        FROM messages m JOIN sessions s ON m.session_id = s.id
+        WHERE date(m.timestamp) IS NOT NULL
+        GROUP BY date(m.timestamp), m.session_id
+    ''')
+    c.execute('''
+        INSERT INTO rollup_hours (hour, messages)
+        SELECT CAST(strftime('%H', m.timestamp) AS INTEGER), count(*)
+        FROM messages m JOIN sessions s ON m.session_id = s.id
+        WHERE strftime('%H', m.timestamp) IS NOT NULL
+        GROUP BY 1
+    ''')
+    c.execute('''
+        INSERT INTO rollup_tags (tag_id, sessions, messages)
+        SELECT st.tag_id, count(DISTINCT s.id), count(m.id)
+        FROM session_tags st
+        JOIN sessions s ON st.session_id = s.id
+        LEFT JOIN messages m ON m.session_id = s.id
+        GROUP BY st.tag_id
+    ''')
+
+
+def _migrate_bulk_fts_insert(c: sqlite3.Cursor):
+    """
+    Drop the per-row FTS insert trigger: Storage._insert_messages indexes each batch of
+    new messages with one INSERT ... SELECT, which is several times faster. Deletes
+    and content updates are still mirrored by triggers.
+    """
+    c.execute("DROP TRIGGER IF EXISTS messages_fts_insert")
+
+
+def _migrate_tool_calls(c: sqlite3.Cursor):
+    """
+    One row per assistant tool call with the file change it makes, if any (see
+    tool_calls.extract_file_change), so file changes are read by index instead of
+    re-parsing every tool input. Backfilled from the stored tool_use blocks.
+    """
+    c.execute('''CREATE TABLE tool_calls (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        message_id INTEGER NOT NULL,
+        ordinal INTEGER NOT NULL,
+        timestamp TIMESTAMP,
+        tool_name TEXT,
+        change_type TEXT,
+        path TEXT,
+        new_content TEXT,
+        old_content TEXT
+    )''')
+    c.execute("CREATE INDEX idx_tool_calls_session ON tool_calls(session_id, timestamp, message_id, ordinal)")
+
+    rows = c.execute('''
+        SELECT m.id, m.session_id, m.timestamp, b.ordinal, b.tool_name, b.input
+        FROM message_blocks b JOIN messages m ON m.id = b.message_id
+        WHERE m.role = 'assistant' AND b.block_type = 'tool_use'
+        ORDER BY m.id, b.ordinal
+    ''').fetchall()
+    backfill = []
+    for message_id, message_rows in groupby(rows, key=lambda row: row[0]):
+        message_rows = list(message_rows)
+        _, session_id, timestamp = message_rows[0][:3]
+        tool_uses = []
+        for _, _, _, ordinal, tool_name, input_json in message_rows:
+            try:
+                input_data = json.loads(unpack_text(input_json))
+            except (TypeError, json.JSONDecodeError):
+                input_data = None
+            tool_uses.append((ordinal, tool_name, input_data))
+        for ordinal, tool_name, change_type, path, new_content, old_content in tool_call_rows(tool_uses):
+            backfill.append((session_id, message_id, ordinal, timestamp, tool_name, change_type, path,
+                             pack_text(new_content), pack_text(old_content)))
+    c.executemany(
+        "INSERT INTO tool_calls (session_id, message_id, ordinal, timestamp, tool_name, change_type, path, new_content, old_content) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        backfill
+    )
+
+
+def _migrate_token_usage(c: sqlite3.Cursor) -> bool:
+    """
+    Move the per-session token_usage_history JSON out of the sessions rows into a
+    token_usage table, one row per usage point with the tokens it added, so usage
+    can be queried by time range across sessions. The emptied column is reclaimed
+    by Storage.compact.
+    """
+    c.execute('''CREATE TABLE token_usage (
+        session_id TEXT NOT NULL,
+        seq INTEGER NOT NULL,
+        timestamp TIMESTAMP,
+        input_tokens INTEGER NOT NULL DEFAULT 0,
+        output_tokens INTEGER NOT NULL DEFAULT 0,
+        cache_creation_tokens INTEGER NOT NULL DEFAULT 0,
+        cache_read_tokens INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (session_id, seq)
+    )''')
+    c.execute("CREATE INDEX idx_token_usage_time ON token_usage(timestamp)")
+
+    backfill = []
+    for session_id, history_json in c.execute(
+            "SELECT id, token_usage_history FROM sessions WHERE token_usage_history IS NOT NULL").fetchall():
+        try:
+            history = json.loads(history_json)
+        except json.JSONDecodeError:
+            continue
+        if isinstance(history, list):
+            backfill.extend((session_id, *row) for row in token_usage_rows(history))
+    c.executemany(_INSERT_TOKEN_USAGE_SQL, backfill)
+
+    c.execute("UPDATE sessions SET token_usage_history = NULL WHERE token_usage_history IS NOT NULL")
+    return c.rowcount > 0
+
+
+def _migrate_survival_cache(c: sqlite3.Cursor):
+    """
+    Per-(session, file) code survival results (see Analytics.calculate_oneshot_stats).
+
+    sessions.generation changes on every write of a session (see Storage._bump_generation),
+    so a cached result is valid while its generation and the file's mtime and size match.
+    """
+    c.execute("ALTER TABLE sessions ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+    c.execute("CREATE INDEX idx_sessions_generation ON sessions(generation)")
+    c.execute('''CREATE TABLE survival_cache (
+        session_id TEXT NOT NULL,
+        path TEXT NOT NULL,
+        generation INTEGER NOT NULL,
+        file_mtime_ns INTEGER,
+        file_size INTEGER,
+        status TEXT NOT NULL,
+        score REAL NOT NULL,
+        total_lines INTEGER,
+        retained_lines INTEGER,
+        PRIMARY KEY (session_id, path)
+    )''')
+
+
+def _migrate_change_stats(c: sqlite3.Cursor):
+    """
+    Size and added/removed line counts of each file change, computed at ingest (see
+    tool_calls.change_stats), so the changes index reads no contents. Backfilled.
+    """
+    c.execute("ALTER TABLE tool_calls ADD COLUMN size INTEGER")
+    c.execute("ALTER TABLE tool_calls ADD COLUMN added INTEGER")
+    c.execute("ALTER TABLE tool_calls ADD COLUMN removed INTEGER")
+    rows = c.execute("SELECT id, new_content, old_content FROM tool_calls WHERE change_type IS NOT NULL").fetchall()
+    c.executemany(
+        "UPDATE tool_calls SET size = ?, added = ?, removed = ? WHERE id = ?",
+        [(*change_stats(unpack_text(new_content), unpack_text(old_content)), call_id)
+         for call_id, new_content, old_content in rows]
+    )
+
+
+def _migrate_pending_maintenance(c: sqlite3.Cursor):
+    """
+    Maintenance tasks requested by migrations and run after startup rather than while
+    opening the database (see Storage.compaction_pending).
+    """
+    c.execute('''CREATE TABLE pending_maintenance (
+        task TEXT PRIMARY KEY,
+        requested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )''')
+
+
+# Schema migrations, applied in order; PRAGMA user_version is the number applied so far.
+# Append new migrations, never edit or reorder applied ones. A migration returning True
+# marks Storage.compact as pending once all migrations are applied; it then runs from
+# the compact command or in the background after server startup, never while opening.
+MIGRATIONS = [
+    _migrate_base_schema,
+    _migrate_message_blocks,
+    _migrate_compressed_blocks,
+    _migrate_indexes,
+    _migrate_external_content_fts,
+    _migrate_rollups,
+    _migrate_bulk_fts_insert,
+    _migrate_tool_calls,
+    _migrate_token_usage,
+    _migrate_survival_cache,
+    _migrate_pending_maintenance,
+    _migrate_change_stats,
+]
+
 
 class Storage:
-    def __init__(self, db_path: Path):
+    """
+    SQLite storage.
+
+    Reads go through one long-lived connection per thread (reader()), so connections
+    keep their page cache and prepared statements across calls. All writes are jobs
+    for a single writer thread (self.writer, see DBWriter), which owns the only
+    write connection, coalesces updates to the same session and groups commits.
+    close() commits the queued writes and closes every connection.
+    """
+
+    def __init__(self, db_path: Path, read_pragmas: Dict[str, Any] = None):
         self.db_path = db_path
-        self._lock = threading.Lock()  # Thread lock for write operations
+        self.read_pragmas = {**READ_PRAGMAS, **(read_pragmas or {})}
+        self._local = threading.local()
+        # Every open reader by owning thread, so readers of finished threads and close() can release them
+        self._readers: Dict[threading.Thread, sqlite3.Connection] = {}
+        self._readers_lock = threading.Lock()
+        self._closed = False
+        self.writer = DBWriter(self._connect_writer)
         self.init_db()
 
+    def _connect(self, pragmas: Dict[str, Any], **kwargs) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30.0, cached_statements=STATEMENT_CACHE_SIZE, **kwargs)
+        conn.row_factory = sqlite3.Row
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def reader(self) -> sqlite3.Connection:
+        """
+        The calling thread's read-only connection, opened on first use.
+
+        Raises:
+            RuntimeError: If the storage is closed
+        """
+        conn = getattr(self._local, "reader", None)
+        if conn is None:
+            with self._readers_lock:
+                if self._closed:
+                    raise RuntimeError("Storage is closed")
+                # Only the owning thread uses it; close() and the cleanup below close it from others
+                conn = self._connect(self.read_pragmas, check_same_thread=False)
+                self._local.reader = conn
+                self._readers[threading.current_thread()] = conn
+                finished = [thread for thread in self._readers if not thread.is_alive()]
+                for thread in finished:
+                    self._readers.pop(thread).close()
+        return conn
+
+    def close(self, timeout: Optional[float] = None):
+        """Commit the queued writes, stop the writer and close every reader connection."""
+        self.writer.close(timeout)
+        with self._readers_lock:
+            self._closed = True
+            readers = list(self._readers.values())
+            self._readers.clear()
+        for conn in readers:
+            conn.close()
+
+    def _connect_writer(self) -> sqlite3.Connection:
+        """The write connection, opened on the writer thread; DBWriter manages transactions."""
+        pragmas = {k: v for k, v in self.read_pragmas.items() if k != "query_only"}
+        return self._connect({**pragmas, "synchronous": "NORMAL"}, isolation_level=None)
+
     def init_db(self):
-        """Initialize the database schema."""
-        conn = sqlite3.connect(self.db_path)
+        """Initialize the database schema by applying pending migrations (see MIGRATIONS)."""
+        conn = sqlite3.connect(self.db_path, isolation_level=None)
         c = conn.cursor()
+        needs_compaction = False
 
-        # Enable WAL mode for better concurrent performance
-        c.execute("PRAGMA journal_mode=WAL")
-        c.execute("PRAGMA synchronous=NORMAL")
-        
-        # Projects table
-        c.execute('''CREATE TABLE IF NOT EXISTS projects (
-            name TEXT PRIMARY KEY,
-            path TEXT,
-            last_updated TIMESTAMP
-        )''')
-        
-        # Sessions table
-        c.execute('''CREATE TABLE IF NOT EXISTS sessions (
-            id TEXT PRIMARY KEY,
-            project_name TEXT,
-            file_path TEXT,
-            start_time TIMESTAMP,
-            model TEXT,
-            total_tokens INTEGER,
-            FOREIGN KEY(project_name) REFERENCES projects(name)
-        )''')
-        
-        # Check if columns exist (migration for existing DB)
         try:
-            c.execute("ALTER TABLE sessions ADD COLUMN model TEXT")
-        except sqlite3.OperationalError:
-            pass # Column exists
-            
-        try:
-            c.execute("ALTER TABLE sessions ADD COLUMN total_tokens INTEGER")
-        except sqlite3.OperationalError:
-            pass # Column exists
+            # Enable WAL mode for better concurrent performance
+            c.execute("PRAGMA journal_mode=WAL")
+            c.execute("PRAGMA synchronous=NORMAL")
+
+            version = c.execute("PRAGMA user_version").fetchone()[0]
+            for target, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                # Each migration and its version bump commit atomically
+                c.execute("BEGIN")
+                try:
+                    needs_compaction = migration(c) or needs_compaction
+                    c.execute(f"PRAGMA user_version = {target}")
+                    c.execute("COMMIT")
+                except Exception:
+                    c.execute("ROLLBACK")
+                    raise
+                logger.info(f"Migrated database schema to version {target} ({migration.__name__})")
 
+            if needs_compaction:
+                # Compacting rewrites the whole file, so it is not done while opening
+                c.execute("INSERT OR IGNORE INTO pending_maintenance (task) VALUES ('compact')")
+                logger.info("Database compaction pending")
+        finally:
+            conn.close()
+
+    def compaction_pending(self) -> bool:
+        """Whether a migration asked for compact() and it has not run since."""
+        c = self.reader().cursor()
+        c.execute("SELECT 1 FROM pending_maintenance WHERE task = 'compact'")
+        return c.fetchone() is not None
+
+    def database_size(self) -> int:
+        """Size in bytes of the database file (after checkpointing the WAL)."""
+        conn = sqlite3.connect(self.db_path, timeout=30.0)
         try:
-            c.execute("ALTER TABLE sessions ADD COLUMN file_change_count INTEGER DEFAULT 0")
-        except sqlite3.OperationalError:
-            pass # Column exists
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            conn.close()
+        return os.path.getsize(self.db_path)
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Compress uncompressed block bodies above COMPRESS_MIN_BYTES in place and VACUUM.
 
+        Returns:
+            Dict with compressed_blocks, size_before and size_after (bytes)
+        """
+        size_before = self.database_size()
+        # VACUUM cannot run inside a transaction, so this runs on its own on the writer
+        compressed = self.writer.submit(self._compact, transaction=False)
+        size_after = self.database_size()
+        logger.info(
+            f"Compressed {compressed} message blocks, database size "
+            f"{size_before / (1024 * 1024):.1f} MB -> {size_after / (1024 * 1024):.1f} MB"
+        )
+        return {"compressed_blocks": compressed, "size_before": size_before, "size_after": size_after}
+
+    def _compact(self, conn: sqlite3.Connection) -> int:
+        c = conn.cursor()
+        c.execute("BEGIN")
         try:
-            c.execute("ALTER TABLE projects ADD COLUMN path TEXT")
-        except sqlite3.OperationalError:
-            pass # Column exists
-
-        # New columns for Session details
-        for col, type_ in [
-            ("input_tokens", "INTEGER DEFAULT 0"),
-            ("output_tokens", "INTEGER DEFAULT 0"),
-            ("turns", "INTEGER DEFAULT 0"),
-            ("branch", "TEXT"),
-            ("token_usage_history", "TEXT"),
-            ("total_duration_seconds", "INTEGER DEFAULT 0"),
-            ("user_duration_seconds", "INTEGER DEFAULT 0"),
-            ("model_duration_seconds", "INTEGER DEFAULT 0"),
-            ("total_messages", "INTEGER DEFAULT 0"),
-            ("tool_stats", "TEXT"),
-            ("read_write_ratio", "REAL DEFAULT 0"),
-            ("nav_miss_rate", "REAL DEFAULT 0"),
-            ("avg_prompt_len", "REAL DEFAULT 0")
-        ]:
-            try:
-                c.execute(f"ALTER TABLE sessions ADD COLUMN {col} {type_}")
-            except sqlite3.OperationalError:
-                pass
-        
-        # Messages table with FTS
-        c.execute('''CREATE TABLE IF NOT EXISTS messages (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT,
-            role TEXT,
-            content TEXT,
-            timestamp TIMESTAMP,
-            FOREIGN KEY(session_id) REFERENCES sessions(id)
-        )''')
-        
-        # FTS table for full-text search on content
-        c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
-            content,
-            content_rowid UNINDEXED
-        )''')
-        
-        # Tags table
-        c.execute('''CREATE TABLE IF NOT EXISTS tags (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT UNIQUE,
-            color TEXT
-        )''')
-
-        # Session Tags mapping
-        c.execute('''CREATE TABLE IF NOT EXISTS session_tags (
-            session_id TEXT,
-            tag_id INTEGER,
-            PRIMARY KEY (session_id, tag_id),
-            FOREIGN KEY(session_id) REFERENCES sessions(id),
-            FOREIGN KEY(tag_id) REFERENCES tags(id)
-        )''')
-        
-        conn.commit()
-        conn.close()
+            c.execute("""
+                SELECT id, input, text FROM message_blocks
+                WHERE (typeof(input) = 'text' AND length(CAST(input AS BLOB)) > ?)
+                   OR (typeof(text) = 'text' AND length(CAST(text AS BLOB)) > ?)
+            """, (COMPRESS_MIN_BYTES, COMPRESS_MIN_BYTES))
+            updates = [(pack_text(input_json), pack_text(text), block_id) for block_id, input_json, text in c.fetchall()]
+            c.executemany("UPDATE message_blocks SET input = ?, text = ? WHERE id = ?", updates)
+            c.execute("COMMIT")
+        except Exception:
+            c.execute("ROLLBACK")
+            raise
 
-    def save_session(self, project_name: str, session_data: Dict[str, Any], messages: List[Dict[str, Any]], metadata: Dict[str, Any] = None, project_path: str = None):
-        """Save a session and its messages to the DB. Thread-safe."""
-        if metadata is None:
-            metadata = {}
+        # Return the freed pages to the file system
+        c.execute("VACUUM")
+        c.execute("DELETE FROM pending_maintenance WHERE task = 'compact'")
+        return len(updates)
 
-        with self._lock:  # Ensure thread-safe database access
-            conn = sqlite3.connect(self.db_path, timeout=30.0)
-            c = conn.cursor()
+    def optimize_search_index(self):
+        """Merge the full-text index into a single b-tree (FTS5 'optimize')."""
+        self.writer.submit(self._optimize_search_index)
 
-            try:
-                # Insert/Update Project
-                c.execute("INSERT OR IGNORE INTO projects (name, path, last_updated) VALUES (?, ?, datetime('now'))", (project_name, project_path))
-                if project_path:
-                    c.execute("UPDATE projects SET path = ?, last_updated = datetime('now') WHERE name = ?", (project_path, project_name))
-                else:
-                    c.execute("UPDATE projects SET last_updated = datetime('now') WHERE name = ?", (project_name,))
-
-                # Insert/Update Session
-                c.execute("""
-                    INSERT OR REPLACE INTO sessions (
-                        id, project_name, file_path, start_time, model,
-                        total_tokens, input_tokens, output_tokens, turns, branch, token_usage_history,
-                        file_change_count, total_duration_seconds, user_duration_seconds, model_duration_seconds,
-                        total_messages, tool_stats, read_write_ratio, nav_miss_rate, avg_prompt_len
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    session_data['session_id'],
-                    project_name,
-                    session_data['file_path'],
-                    messages[0]['timestamp'] if messages else None,
-                    metadata.get('model'),
-                    metadata.get('total_tokens', 0),
-                    metadata.get('input_tokens', 0),
-                    metadata.get('output_tokens', 0),
-                    metadata.get('turns', 0),
-                    metadata.get('branch'),
-                    json.dumps(metadata.get('token_usage_history', [])),
-                    metadata.get('file_change_count', 0),
-                    metadata.get('total_duration_seconds', 0),
-                    metadata.get('user_duration_seconds', 0),
-                    metadata.get('model_duration_seconds', 0),
-                    metadata.get('total_messages', 0),
-                    json.dumps(metadata.get('tool_stats', {})),
-                    metadata.get('read_write_ratio', 0.0),
-                    metadata.get('nav_miss_rate', 0.0),
-                    metadata.get('avg_prompt_len', 0.0)
-                ))
-
-                # Insert Messages
-                c.execute("DELETE FROM messages WHERE session_id = ?", (session_data['session_id'],))
-                c.execute("DELETE FROM messages_fts WHERE content_rowid IN (SELECT id FROM messages WHERE session_id = ?)", (session_data['session_id'],))
-
-                for msg in messages:
-                    c.execute("INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-                              (session_data['session_id'], msg['role'], msg.get('content', ''), msg['timestamp']))
-
-                    # Index for search
-                    row_id = c.lastrowid
-                    c.execute("INSERT INTO messages_fts (content_rowid, content) VALUES (?, ?)", (row_id, msg.get('content', '')))
-
-                conn.commit()
-            finally:
-                conn.close()
+    def _optimize_search_index(self, c: sqlite3.Cursor):
+        c.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
+
+    def save_session(self, project_name: str, session_data: Dict[str, Any], messages: List[Dict[str, Any]], metadata: Dict[str, Any] = None, project_path: str = None,
+                     manifest_entry: Dict[str, Any] = None, wait: bool = True):
+        """
+        Save a session and its messages to the DB. Thread-safe.
+
+        Args:
+            manifest_entry: Optional manifest entry (see update_manifest) committed with the session
+            wait: False queues the write and returns a Future; queued writes of the same
+                session are coalesced into one
+        """
+        return self.writer.submit(
+            self._write_session, "save", project_name, session_data, messages, metadata or {}, project_path, manifest_entry,
+            key=session_data['session_id'], merge=_merge_session_writes, wait=wait
+        )
+
+    def append_session_messages(self, project_name: str, session_data: Dict[str, Any], messages: List[Dict[str, Any]], metadata: Dict[str, Any] = None, project_path: str = None,
+                                manifest_entry: Dict[str, Any] = None, wait: bool = True):
+        """
+        Append newly parsed messages to a session and update its row in place. Thread-safe.
+
+        Unlike save_session, existing messages are left untouched, so the cost is
+        proportional to the appended lines rather than to the whole session.
+        manifest_entry and wait work as for save_session.
+        """
+        return self.writer.submit(
+            self._write_session, "append", project_name, session_data, messages, metadata or {}, project_path, manifest_entry,
+            key=session_data['session_id'], merge=_merge_session_writes, wait=wait
+        )
+
+    def _write_session(self, c: sqlite3.Cursor, mode: str, project_name: str, session_data: Dict[str, Any],
+                       messages: List[Dict[str, Any]], metadata: Dict[str, Any], project_path: Optional[str],
+                       manifest_entry: Optional[Dict[str, Any]]):
+        """Replace ("save") a session or append to it ("append"), see save_session and append_session_messages."""
+        if manifest_entry is not None:
+            self._update_manifest(c, [manifest_entry])
+
+        # Insert/Update Project
+        c.execute("INSERT OR IGNORE INTO projects (name, path, last_updated) VALUES (?, ?, datetime('now'))", (project_name, project_path))
+        if project_path:
+            c.execute("UPDATE projects SET path = ?, last_updated = datetime('now') WHERE name = ?", (project_path, project_name))
+        else:
+            c.execute("UPDATE projects SET last_updated = datetime('now') WHERE name = ?", (project_name,))
+
+        session_id = session_data['session_id']
+        row = session_row(project_name, session_data, messages, metadata)
+        message_rows = [message_row(msg) for msg in messages]
+        history = metadata.get('token_usage_history', [])
+
+        if mode == "append":
+            # Update Session in place
+            self._rollup_session_row(c, session_id, -1)
+            c.execute(_UPSERT_SESSION_SQL, row)
+            self._rollup_session_row(c, session_id, 1)
+            self._bump_generation(c, [(session_id,)])
+
+            # The metadata carries the whole usage history, only add the points not stored yet
+            stored = c.execute("SELECT COALESCE(MAX(seq) + 1, 0) FROM token_usage WHERE session_id = ?", (session_id,)).fetchone()[0]
+            c.executemany(_INSERT_TOKEN_USAGE_SQL, [(session_id, *usage) for usage in token_usage_rows(history, start=stored)])
+
+            # Append Messages; only the new rows are added to the message rollups
+            first_new_id = self._insert_messages(c, [(session_id, message_rows)])
+            self._rollup_messages(c, session_id, 1, min_message_id=first_new_id)
+            return
+
+        # Take the old session out of the rollups before replacing it
+        self._rollup_messages(c, session_id, -1)
+        self._rollup_session_row(c, session_id, -1)
+
+        # Insert/Update Session
+        c.execute(_INSERT_SESSION_SQL, row)
+        self._bump_generation(c, [(session_id,)])
+        c.execute("DELETE FROM survival_cache WHERE session_id = ?", (session_id,))
+
+        # Insert Messages
+        c.execute("DELETE FROM message_blocks WHERE message_id IN (SELECT id FROM messages WHERE session_id = ?)", (session_id,))
+        c.execute("DELETE FROM tool_calls WHERE session_id = ?", (session_id,))
+        c.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+
+        self._insert_messages(c, [(session_id, message_rows)])
+
+        c.execute("DELETE FROM token_usage WHERE session_id = ?", (session_id,))
+        c.executemany(_INSERT_TOKEN_USAGE_SQL, [(session_id, *usage) for usage in token_usage_rows(history)])
+
+        self._rollup_session_row(c, session_id, 1)
+        self._rollup_messages(c, session_id, 1)
+
+    def _insert_messages(self, c: sqlite3.Cursor, session_messages: List[tuple]) -> int:
+        """
+        Insert message rows (see message_row) with their blocks and tool calls using one
+        executemany per table, then add all of them to the search index with a single statement.
+
+        Message ids are allocated up front (the caller holds the write lock) so blocks can
+        reference them without a round trip per message.
+
+        Args:
+            session_messages: (session_id, message_rows) tuples
+
+        Returns:
+            Id of the first inserted message
+        """
+        # Continue after the AUTOINCREMENT high-water mark so ids are never reused
+        c.execute("""
+            SELECT MAX(COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'messages'), 0),
+                       COALESCE((SELECT MAX(id) FROM messages), 0))
+        """)
+        first_id = next_id = c.fetchone()[0] + 1
+        messages = []
+        blocks = []
+        tool_calls = []
+        for session_id, message_rows in session_messages:
+            for role, timestamp, search_text, message_blocks, message_tool_calls in message_rows:
+                messages.append((next_id, session_id, role, search_text, timestamp))
+                blocks.extend((next_id, ordinal, *block) for ordinal, block in enumerate(message_blocks))
+                tool_calls.extend((session_id, next_id, timestamp, *call) for call in message_tool_calls)
+                next_id += 1
+        c.executemany("INSERT INTO messages (id, session_id, role, content, timestamp) VALUES (?, ?, ?, ?, ?)", messages)
+        c.executemany(
+            "INSERT INTO message_blocks (message_id, ordinal, block_type, tool_name, tool_use_id, input, text) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            blocks
+        )
+        c.executemany(
+            "INSERT INTO tool_calls (session_id, message_id, timestamp, ordinal, tool_name, change_type, path, new_content, old_content, "
+            "size, added, removed) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            tool_calls
+        )
+        c.execute("INSERT INTO messages_fts (rowid, content) SELECT id, content FROM messages WHERE id >= ?", (first_id,))
+        return first_id
+
+    def _bump_generation(self, c: sqlite3.Cursor, session_ids: List[tuple]):
+        """Give each written session a new generation, higher than any other (invalidates survival_cache)."""
+        c.executemany("UPDATE sessions SET generation = (SELECT MAX(generation) FROM sessions) + 1 WHERE id = ?", session_ids)
+
+    def _rollup_session_row(self, c: sqlite3.Cursor, session_id: str, sign: int):
+        """Add (sign=1) or remove (sign=-1) a session row's share of the project, model and tag rollups."""
+        c.execute("SELECT project_name, model, total_tokens FROM sessions WHERE id = ?", (session_id,))
+        row = c.fetchone()
+        if row is None:
+            return
+        project_name, model, tokens = row
+        c.execute('''
+            INSERT INTO rollup_projects (project_name, sessions, tokens) VALUES (?, ?, ?)
+            ON CONFLICT(project_name) DO UPDATE SET
+                sessions = sessions + excluded.sessions,
+                tokens = tokens + excluded.tokens
+        ''', (project_name, sign, sign * (tokens or 0)))
+        if model is not None:
+            c.execute('''
+                INSERT INTO rollup_models (model, sessions) VALUES (?, ?)
+                ON CONFLICT(model) DO UPDATE SET sessions = sessions + excluded.sessions
+            ''', (model, sign))
+        c.execute('''
+            INSERT INTO rollup_tags (tag_id, sessions)
+            SELECT tag_id, ? FROM session_tags WHERE session_id = ?
+            ON CONFLICT(tag_id) DO UPDATE SET sessions = sessions + excluded.sessions
+        ''', (sign, session_id))
+
+    def _rollup_messages(self, c: sqlite3.Cursor, session_id: str, sign: int, min_message_id: int = 0):
+        """
+        Add (sign=1) or remove (sign=-1) a session's messages from the daily, hourly,
+        project and tag rollups. Costs one index range scan over the session's messages.
+
+        Args:
+            min_message_id: Only count messages with id >= this (freshly appended rows)
+        """
+        c.execute("SELECT project_name FROM sessions WHERE id = ?", (session_id,))
+        row = c.fetchone()
+        if row is None:
+            return
+        project_name = row[0]
+
+        c.execute('''
+            SELECT date(timestamp), CAST(strftime('%H', timestamp) AS INTEGER), count(*)
+            FROM messages WHERE session_id = ? AND id >= ?
+            GROUP BY 1, 2
+        ''', (session_id, min_message_id))
+        total = 0
+        days: Dict[str, int] = {}
+        hours: Dict[int, int] = {}
+        for day, hour, count in c.fetchall():
+            total += count
+            if day is not None:
+                days[day] = days.get(day, 0) + count
+            if hour is not None:
+                hours[hour] = hours.get(hour, 0) + count
+        if not total:
+            return
+
+        c.executemany('''
+            INSERT INTO rollup_session_days (day, session_id, project_name, messages) VALUES (?, ?, ?, ?)
+            ON CONFLICT(day, session_id) DO UPDATE SET messages = messages + excluded.messages
+        ''', [(day, session_id, project_name, sign * count) for day, count in days.items()])
+        if sign < 0:
+            c.execute("DELETE FROM rollup_session_days WHERE session_id = ? AND messages <= 0", (session_id,))
+        c.executemany('''
+            INSERT INTO rollup_hours (hour, messages) VALUES (?, ?)
+            ON CONFLICT(hour) DO UPDATE SET messages = messages + excluded.messages
+        ''', [(hour, sign * count) for hour, count in hours.items()])
+        c.execute('''
+            INSERT INTO rollup_projects (project_name, messages) VALUES (?, ?)
+            ON CONFLICT(project_name) DO UPDATE SET messages = messages + excluded.messages
+        ''', (project_name, sign * total))
+        c.execute(
+            "UPDATE rollup_tags SET messages = messages + ? WHERE tag_id IN (SELECT tag_id FROM session_tags WHERE session_id = ?)",
+            (sign * total, session_id)
+        )
+
+    def _rollup_tag(self, c: sqlite3.Cursor, session_id: str, tag_id: int, sign: int):
+        """Add (sign=1) or remove (sign=-1) one session from a tag's rollup."""
+        c.execute("SELECT count(*) FROM messages WHERE session_id = ?", (session_id,))
+        messages = c.fetchone()[0]
+        c.execute('''
+            INSERT INTO rollup_tags (tag_id, sessions, messages) VALUES (?, ?, ?)
+            ON CONFLICT(tag_id) DO UPDATE SET
+                sessions = sessions + excluded.sessions,
+                messages = messages + excluded.messages
+        ''', (tag_id, sign, sign * messages))
 
     def save_sessions_batch(self, sessions_data: List[tuple], progress_callback=None):
         """
@@ -190,82 +1101,80 @@ class Storage:
             sessions_data: List of (project_name, session_data, messages, metadata, project_path) tuples
             progress_callback: Optional callback(completed_count) to report progress
         """
-        if not sessions_data:
-            return
+        self.save_serialized_batch([
+            (project_name, project_path, *serialize_session(project_name, session_data, messages, metadata or {}))
+            for project_name, session_data, messages, metadata, project_path in sessions_data
+        ], progress_callback=progress_callback)
 
-        with self._lock:
-            conn = sqlite3.connect(self.db_path, timeout=60.0)
-            c = conn.cursor()
+    def save_serialized_batch(self, records: List[tuple], progress_callback=None,
+                              chunk_sessions: Optional[int] = None, chunk_bytes: Optional[int] = None) -> int:
+        """
+        Batch save pre-serialized sessions (see serialize_session), committing in chunks.
 
-            try:
-                # Use a single transaction for all inserts
-                c.execute("BEGIN TRANSACTION")
-
-                for i, (project_name, session_data, messages, metadata, project_path) in enumerate(sessions_data):
-                    if metadata is None:
-                        metadata = {}
-
-                    # Insert/Update Project
-                    c.execute("INSERT OR IGNORE INTO projects (name, path, last_updated) VALUES (?, ?, datetime('now'))", (project_name, project_path))
-                    if project_path:
-                        c.execute("UPDATE projects SET path = ?, last_updated = datetime('now') WHERE name = ?", (project_path, project_name))
-                    else:
-                        c.execute("UPDATE projects SET last_updated = datetime('now') WHERE name = ?", (project_name,))
-
-                    # Insert/Update Session
-                    c.execute("""
-                        INSERT OR REPLACE INTO sessions (
-                            id, project_name, file_path, start_time, model,
-                            total_tokens, input_tokens, output_tokens, turns, branch, token_usage_history,
-                            file_change_count, total_duration_seconds, user_duration_seconds, model_duration_seconds,
-                            total_messages, tool_stats, read_write_ratio, nav_miss_rate, avg_prompt_len
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        session_data['session_id'],
-                        project_name,
-                        session_data['file_path'],
-                        messages[0]['timestamp'] if messages else None,
-                        metadata.get('model'),
-                        metadata.get('total_tokens', 0),
-                        metadata.get('input_tokens', 0),
-                        metadata.get('output_tokens', 0),
-                        metadata.get('turns', 0),
-                        metadata.get('branch'),
-                        json.dumps(metadata.get('token_usage_history', [])),
-                        metadata.get('file_change_count', 0),
-                        metadata.get('total_duration_seconds', 0),
-                        metadata.get('user_duration_seconds', 0),
-                        metadata.get('model_duration_seconds', 0),
-                        metadata.get('total_messages', 0),
-                        json.dumps(metadata.get('tool_stats', {})),
-                        metadata.get('read_write_ratio', 0.0),
-                        metadata.get('nav_miss_rate', 0.0),
-                        metadata.get('avg_prompt_len', 0.0)
-                    ))
-
-                    # Delete old messages
-                    c.execute("DELETE FROM messages WHERE session_id = ?", (session_data['session_id'],))
-
-                    # Insert Messages
-                    for msg in messages:
-                        c.execute("INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-                                  (session_data['session_id'], msg['role'], msg.get('content', ''), msg['timestamp']))
-                        row_id = c.lastrowid
-                        c.execute("INSERT INTO messages_fts (content_rowid, content) VALUES (?, ?)", (row_id, msg.get('content', '')))
-
-                    if progress_callback and (i + 1) % 50 == 0:
-                        progress_callback(i + 1)
-
-                conn.commit()
-
-                if progress_callback:
-                    progress_callback(len(sessions_data))
-
-            except Exception as e:
-                conn.rollback()
-                raise e
-            finally:
-                conn.close()
+        Each chunk is its own transaction and the write lock is released in between, so
+        watcher and tag writes interleave with long scans. Chunks that committed stay
+        committed if a later one fails; the error is re-raised.
+
+        Args:
+            records: List of (project_name, project_path, session_row, message_rows, usage_rows) tuples
+            progress_callback: Optional callback(completed_count), called after each commit
+            chunk_sessions: Sessions per transaction (default BATCH_CHUNK_SESSIONS)
+            chunk_bytes: Approximate message text per transaction (default BATCH_CHUNK_BYTES)
+
+        Returns:
+            Number of sessions saved
+        """
+        completed = 0
+        for chunk in _chunk_records(records, chunk_sessions or BATCH_CHUNK_SESSIONS, chunk_bytes or BATCH_CHUNK_BYTES):
+            # A barrier: queued watcher writes of these sessions are not merged past the re-ingest
+            self.writer.submit(self._save_chunk, chunk, barrier=True)
+            completed += len(chunk)
+            if progress_callback:
+                progress_callback(completed)
+        return completed
+
+    def _save_chunk(self, c: sqlite3.Cursor, records: List[tuple]):
+        """Replace the sessions in records and their messages."""
+        # Insert/Update Projects
+        c.executemany(
+            "INSERT OR IGNORE INTO projects (name, path, last_updated) VALUES (?, ?, datetime('now'))",
+            [(project_name, project_path) for project_name, project_path, *_ in records]
+        )
+        c.executemany(
+            "UPDATE projects SET path = ?, last_updated = datetime('now') WHERE name = ?",
+            [(project_path, project_name) for project_name, project_path, *_ in records if project_path]
+        )
+        c.executemany(
+            "UPDATE projects SET last_updated = datetime('now') WHERE name = ?",
+            [(project_name,) for project_name, project_path, *_ in records if not project_path]
+        )
+
+        # A session listed twice is saved once, the last record wins as if saved in order
+        sessions = list({row[0]: (row, message_rows, usage_rows) for _, _, row, message_rows, usage_rows in records}.values())
+        session_ids = [(row[0],) for row, _, _ in sessions]
+
+        # Take the old sessions out of the rollups before replacing them
+        for (session_id,) in session_ids:
+            self._rollup_messages(c, session_id, -1)
+            self._rollup_session_row(c, session_id, -1)
+
+        # Insert/Update Sessions
+        c.executemany(_INSERT_SESSION_SQL, [row for row, _, _ in sessions])
+        self._bump_generation(c, session_ids)
+        c.executemany("DELETE FROM survival_cache WHERE session_id = ?", session_ids)
+
+        # Replace Messages
+        c.executemany("DELETE FROM message_blocks WHERE message_id IN (SELECT id FROM messages WHERE session_id = ?)", session_ids)
+        c.executemany("DELETE FROM tool_calls WHERE session_id = ?", session_ids)
+        c.executemany("DELETE FROM messages WHERE session_id = ?", session_ids)
+        self._insert_messages(c, [(row[0], message_rows) for row, message_rows, _ in sessions])
+
+        c.executemany("DELETE FROM token_usage WHERE session_id = ?", session_ids)
+        c.executemany(_INSERT_TOKEN_USAGE_SQL, [(row[0], *usage) for row, _, usage_rows in sessions for usage in usage_rows])
+
+        for (session_id,) in session_ids:
+            self._rollup_session_row(c, session_id, 1)
+            self._rollup_messages(c, session_id, 1)
 
     def cleanup_orphaned_sessions(self, valid_session_ids: set) -> int:
         """
@@ -277,39 +1186,123 @@ class Storage:
         Returns:
             Number of orphaned sessions removed
         """
-        with self._lock:
-            conn = sqlite3.connect(self.db_path, timeout=30.0)
-            c = conn.cursor()
+        return self.writer.submit(self._cleanup_orphaned_sessions, valid_session_ids, barrier=True)
 
-            try:
-                # Get all session IDs in database
-                c.execute("SELECT id FROM sessions")
-                db_session_ids = set(row[0] for row in c.fetchall())
+    def _cleanup_orphaned_sessions(self, c: sqlite3.Cursor, valid_session_ids: set) -> int:
+        # Get all session IDs in database
+        c.execute("SELECT id FROM sessions")
+        db_session_ids = set(row[0] for row in c.fetchall())
 
-                # Find orphaned sessions
-                orphaned_ids = db_session_ids - valid_session_ids
+        # Find orphaned sessions
+        orphaned_ids = db_session_ids - valid_session_ids
 
-                if orphaned_ids:
-                    # Delete orphaned sessions and their messages
-                    placeholders = ','.join('?' * len(orphaned_ids))
-                    orphaned_list = list(orphaned_ids)
+        if orphaned_ids:
+            # Delete orphaned sessions and their messages
+            self._delete_sessions(c, list(orphaned_ids))
 
-                    c.execute(f"DELETE FROM messages WHERE session_id IN ({placeholders})", orphaned_list)
-                    c.execute(f"DELETE FROM messages_fts WHERE content_rowid IN (SELECT id FROM messages WHERE session_id IN ({placeholders}))", orphaned_list)
-                    c.execute(f"DELETE FROM session_tags WHERE session_id IN ({placeholders})", orphaned_list)
-                    c.execute(f"DELETE FROM sessions WHERE id IN ({placeholders})", orphaned_list)
+            logger.info(f"Cleaned up {len(orphaned_ids)} orphaned sessions")
 
-                    conn.commit()
-                    logger.info(f"Cleaned up {len(orphaned_ids)} orphaned sessions")
+        return len(orphaned_ids)
 
-                return len(orphaned_ids)
-            finally:
-                conn.close()
+    def delete_sessions(self, session_ids: List[str]):
+        """Delete sessions with their messages, tags and manifest entries. Thread-safe."""
+        if not session_ids:
+            return
+
+        self.writer.submit(self._delete_sessions, session_ids, barrier=True)
+
+    def _delete_sessions(self, c: sqlite3.Cursor, session_ids: List[str]):
+        for session_id in session_ids:
+            self._rollup_messages(c, session_id, -1)
+            self._rollup_session_row(c, session_id, -1)
+
+        placeholders = ','.join('?' * len(session_ids))
+
+        c.execute(f"DELETE FROM message_blocks WHERE message_id IN (SELECT id FROM messages WHERE session_id IN ({placeholders}))", session_ids)
+        c.execute(f"DELETE FROM tool_calls WHERE session_id IN ({placeholders})", session_ids)
+        c.execute(f"DELETE FROM token_usage WHERE session_id IN ({placeholders})", session_ids)
+        c.execute(f"DELETE FROM survival_cache WHERE session_id IN ({placeholders})", session_ids)
+        c.execute(f"DELETE FROM messages WHERE session_id IN ({placeholders})", session_ids)
+        c.execute(f"DELETE FROM session_tags WHERE session_id IN ({placeholders})", session_ids)
+        c.execute(f"DELETE FROM sessions WHERE id IN ({placeholders})", session_ids)
+        c.execute(f"DELETE FROM file_manifest WHERE session_id IN ({placeholders})", session_ids)
+
+    def get_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Return the file manifest keyed by file path."""
+        c = self.reader().cursor()
+        c.execute("SELECT * FROM file_manifest")
+        manifest = {row['file_path']: dict(row) for row in c.fetchall()}
+        return manifest
+
+    def update_manifest(self, entries: List[Dict[str, Any]], wait: bool = True):
+        """
+        Insert or update manifest entries.
+
+        Args:
+            entries: Dicts with file_path, session_id, size, mtime_ns, inode, head_hash and status
+            wait: False queues the write and returns without waiting for the commit
+        """
+        if not entries:
+            return
+
+        self.writer.submit(self._update_manifest, entries, wait=wait)
+
+    def _update_manifest(self, c: sqlite3.Cursor, entries: List[Dict[str, Any]]):
+        c.executemany("""
+            INSERT OR REPLACE INTO file_manifest (
+                file_path, session_id, size, mtime_ns, inode, head_hash, status, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, datetime('now'))
+        """, [
+            (e['file_path'], e['session_id'], e['size'], e['mtime_ns'], e['inode'], e['head_hash'], e['status'])
+            for e in entries
+        ])
+
+    def prune_manifest(self, valid_file_paths: set = None) -> int:
+        """
+        Remove manifest entries for files that no longer exist.
+
+        Args:
+            valid_file_paths: Set of file paths that exist in file system.
+                              If None, the whole manifest is cleared (forces a full rescan).
+
+        Returns:
+            Number of manifest entries removed
+        """
+        return self.writer.submit(self._prune_manifest, valid_file_paths)
+
+    def _prune_manifest(self, c: sqlite3.Cursor, valid_file_paths: Optional[set]) -> int:
+        if valid_file_paths is None:
+            c.execute("DELETE FROM file_manifest")
+            removed = c.rowcount
+        else:
+            c.execute("SELECT file_path FROM file_manifest")
+            stale = [row[0] for row in c.fetchall() if row[0] not in valid_file_paths]
+            c.executemany("DELETE FROM file_manifest WHERE file_path = ?", [(p,) for p in stale])
+            removed = len(stale)
+        return removed
+
+    def get_project_paths(self) -> Dict[str, tuple]:
+        """Return cached project paths as {encoded_name: (project_name, path)}."""
+        c = self.reader().cursor()
+        c.execute("SELECT encoded_name, project_name, path FROM project_paths")
+        paths = {row[0]: (row[1], row[2]) for row in c.fetchall()}
+        return paths
+
+    def save_project_paths(self, paths: Dict[str, tuple]):
+        """Insert or update cached project paths ({encoded_name: (project_name, path)})."""
+        if not paths:
+            return
+
+        self.writer.submit(self._save_project_paths, paths)
+
+    def _save_project_paths(self, c: sqlite3.Cursor, paths: Dict[str, tuple]):
+        c.executemany(
+            "INSERT OR REPLACE INTO project_paths (encoded_name, project_name, path, updated_at) VALUES (?, ?, ?, datetime('now'))",
+            [(encoded, name, path) for encoded, (name, path) in paths.items()]
+        )
 
     def get_projects(self) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        c = self.reader().cursor()
         
         sql = '''
             SELECT 
@@ -328,17 +1321,14 @@ class Storage:
         '''
         c.execute(sql)
         projects = [dict(row) for row in c.fetchall()]
-        conn.close()
         return projects
 
     def get_sessions(self, project_name: str) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        c = self.reader().cursor()
         
-        # Get sessions with tags
+        # Get sessions with tags; token usage is served separately (see Analytics.get_session_token_usage)
         sql = '''
-            SELECT s.*, 
+            SELECT {},
                    group_concat(t.name) as tag_names,
                    group_concat(t.color) as tag_colors
             FROM sessions s
@@ -347,7 +1337,7 @@ class Storage:
             WHERE s.project_name = ?
             GROUP BY s.id
             ORDER BY s.start_time DESC
-        '''
+        '''.format(", ".join(f"s.{col}" for col in SESSION_COLUMNS))
         c.execute(sql, (project_name,))
         
         results = []
@@ -361,70 +1351,300 @@ class Storage:
                 d['tags'] = []
             results.append(d)
             
-        conn.close()
         return results
 
     def get_messages(self, session_id: str) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        c = self.reader().cursor()
         c.execute("SELECT * FROM messages WHERE session_id = ? ORDER BY timestamp ASC", (session_id,))
         messages = [dict(row) for row in c.fetchall()]
-        conn.close()
+        c.execute("""
+            SELECT b.message_id, b.block_type, b.tool_name, b.input, b.text
+            FROM message_blocks b
+            JOIN messages m ON m.id = b.message_id
+            WHERE m.session_id = ?
+            ORDER BY b.message_id, b.ordinal
+        """, (session_id,))
+        self._render_content(messages, c.fetchall())
         return messages
 
-    def search_messages(self, query: str) -> List[Dict[str, Any]]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
-        # Join with sessions and projects to give context
-        sql = '''
-            SELECT m.*, s.project_name, s.id as session_id
-            FROM messages m
-            JOIN messages_fts fts ON m.id = fts.content_rowid
+    def get_messages_page(self, session_id: str, limit: int = 100, cursor: Optional[str] = None,
+                          direction: str = "asc", max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """
+        One page of a session's messages, ordered by (timestamp, id), using keyset pagination.
+
+        Args:
+            limit: Maximum number of messages to return
+            cursor: next_cursor of the previous page; the page starts right after it
+            direction: "asc" for oldest first, "desc" for newest first (messages come back in that order)
+            max_bytes: Lightweight mode: cut block bodies longer than this many bytes and flag the
+                message 'truncated'; the full content is available from get_message(id)
+
+        Returns:
+            {"messages": [...], "next_cursor": cursor of the last message, or None on the last page}
+        """
+        if direction not in ("asc", "desc"):
+            raise ValueError(f"Invalid direction: {direction!r}")
+        descending = direction == "desc"
+        order = "DESC" if descending else "ASC"
+
+        # Keyset ranges to read in order; NULL timestamps sort first and get their own range
+        # so that every range stays a single index seek
+        ranges: List[Tuple[str, list]] = [("", [])]
+        if cursor:
+            timestamp, message_id = _decode_message_cursor(cursor)
+            if timestamp is None and descending:
+                ranges = [("AND m.timestamp IS NULL AND m.id < ?", [message_id])]
+            elif timestamp is None:
+                ranges = [("AND m.timestamp IS NULL AND m.id > ?", [message_id]),
+                          ("AND m.timestamp IS NOT NULL", [])]
+            elif descending:
+                ranges = [("AND (m.timestamp, m.id) < (?, ?)", [timestamp, message_id]),
+                          ("AND m.timestamp IS NULL", [])]
+            else:
+                ranges = [("AND (m.timestamp, m.id) > (?, ?)", [timestamp, message_id])]
+
+        c = self.reader().cursor()
+        messages = []
+        for condition, params in ranges:
+            # messages.content is only needed for legacy rows without blocks; skip reading it otherwise
+            c.execute(f"""
+                SELECT m.id, m.session_id, m.role, m.timestamp,
+                       CASE WHEN EXISTS (SELECT 1 FROM message_blocks b WHERE b.message_id = m.id)
+                            THEN NULL ELSE m.content END AS content
+                FROM messages m
+                WHERE m.session_id = ? {condition}
+                ORDER BY m.timestamp {order}, m.id {order}
+                LIMIT ?
+            """, (session_id, *params, limit + 1 - len(messages)))
+            messages.extend(dict(row) for row in c.fetchall())
+            if len(messages) > limit:
+                break
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+
+        if messages:
+            ids = [msg['id'] for msg in messages]
+            c.execute(f"""
+                SELECT message_id, block_type, tool_name, input, text
+                FROM message_blocks
+                WHERE message_id IN ({','.join('?' * len(ids))})
+                ORDER BY message_id, ordinal
+            """, ids)
+            self._render_content(messages, c.fetchall(), max_bytes)
+
+        return {
+            "messages": messages,
+            "next_cursor": _encode_message_cursor(messages[-1]) if has_more else None,
+        }
+
+    def get_message(self, message_id: int) -> Optional[Dict[str, Any]]:
+        """A single message with its full content, or None if it does not exist."""
+        c = self.reader().cursor()
+        c.execute("SELECT * FROM messages WHERE id = ?", (message_id,))
+        row = c.fetchone()
+        if row is None:
+            return None
+        message = dict(row)
+        c.execute("""
+            SELECT message_id, block_type, tool_name, input, text
+            FROM message_blocks WHERE message_id = ? ORDER BY ordinal
+        """, (message_id,))
+        self._render_content([message], c.fetchall())
+        return message
+
+    @staticmethod
+    def _render_content(messages: List[Dict[str, Any]], block_rows: List[tuple], max_bytes: Optional[int] = None):
+        """
+        Fill each message's content from its blocks (rows of message_id, block_type, tool_name, input, text).
+        With max_bytes, block bodies are truncated and each message gets a 'truncated' flag.
+        """
+        blocks_by_message: Dict[int, List[tuple]] = {}
+        for row in block_rows:
+            message_id, block_type, tool_name, input_json, text = row
+            blocks_by_message.setdefault(message_id, []).append(
+                (block_type, tool_name, unpack_text(input_json), unpack_text(text))
+            )
+        for msg in messages:
+            blocks = blocks_by_message.get(msg['id'])
+            if blocks is not None:
+                msg['content'], truncated = render_blocks(blocks, max_bytes)
+            else:
+                msg['content'] = unpack_text(msg.get('content')) or ''
+                truncated = False
+                if max_bytes is not None:
+                    msg['content'], truncated = truncate_text(msg['content'], max_bytes)
+            if max_bytes is not None:
+                msg['truncated'] = truncated
+
+    def search_messages(self, query: str, limit: int = 50, cursor: Optional[str] = None,
+                        project: Optional[str] = None, role: Optional[str] = None, model: Optional[str] = None,
+                        since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Full-text search ranked by bm25, best matches first.
+
+        bm25 has to be computed for every matching row, so matches are ranked in
+        windows of the SEARCH_RANK_WINDOW most recent ones, newest window first.
+        Queries with fewer matches than that get one exact global ranking.
+
+        Args:
+            query: FTS5 query
+            limit: Maximum number of results
+            cursor: next_cursor of the previous page
+            project, role, model: Exact-match filters
+            since, until: Message timestamp range (ISO strings, until is exclusive)
+
+        Returns:
+            Dict with results (message metadata, score and an HTML snippet with <mark>
+            highlights, no full content) and next_cursor (None on the last page)
+        """
+        filters = []
+        filter_params: List[Any] = []
+        for clause, value in (
+            ("s.project_name = ?", project),
+            ("m.role = ?", role),
+            ("s.model = ?", model),
+            ("m.timestamp >= ?", since),
+            ("m.timestamp < ?", until),
+        ):
+            if value is not None:
+                filters.append(clause)
+                filter_params.append(value)
+
+        # Window upper bound (exclusive rowid) and keyset position inside it
+        window_end, after = None, None
+        if cursor:
+            window_end, rank, message_id = _decode_search_cursor(cursor)
+            after = (rank, message_id)
+
+        # Joins are only needed to rank when a filter references messages or sessions
+        joins = "JOIN messages m ON m.id = fts.rowid JOIN sessions s ON m.session_id = s.id" if filters else ""
+
+        c = self.reader().cursor()
+        ranked = []  # (rowid, rank, window_end)
+        while len(ranked) <= limit:
+            # Lowest rowid of this window: the SEARCH_RANK_WINDOW-th match counting down from window_end
+            c.execute(f"""
+                SELECT rowid FROM messages_fts
+                WHERE messages_fts MATCH ?{" AND rowid < ?" if window_end is not None else ""}
+                ORDER BY rowid DESC LIMIT 1 OFFSET {SEARCH_RANK_WINDOW - 1}
+            """, [query] + ([window_end] if window_end is not None else []))
+            found = c.fetchone()
+            window_start = found[0] if found else None
+
+            conditions = ["messages_fts MATCH ?", *filters]
+            params = [query, *filter_params]
+            if window_start is not None:
+                conditions.append("fts.rowid >= ?")
+                params.append(window_start)
+            if window_end is not None:
+                conditions.append("fts.rowid < ?")
+                params.append(window_end)
+            if after:
+                # Keyset pagination on (rank, rowid)
+                conditions.append("(fts.rank > ? OR (fts.rank = ? AND fts.rowid > ?))")
+                params.extend([after[0], after[0], after[1]])
+
+            c.execute(f"""
+                SELECT fts.rowid, fts.rank FROM messages_fts fts {joins}
+                WHERE {" AND ".join(conditions)}
+                ORDER BY fts.rank, fts.rowid
+                LIMIT ?
+            """, [*params, limit + 1 - len(ranked)])
+            ranked.extend((rowid, rank, window_end) for rowid, rank in c.fetchall())
+
+            if window_start is None:
+                break  # Oldest window searched
+            window_end, after = window_start, None
+
+        next_cursor = None
+        if len(ranked) > limit:
+            ranked = ranked[:limit]
+            rowid, rank, end = ranked[-1]
+            next_cursor = f"{'' if end is None else end}:{rank!r}:{rowid}"
+
+        # Metadata and snippets only for the returned page
+        placeholders = ','.join('?' * len(ranked))
+        c.execute(f'''
+            SELECT m.id, m.session_id, m.role, m.timestamp, s.project_name, s.model,
+                   snippet(messages_fts, 0, ?, ?, '…', {SNIPPET_TOKENS}) AS snippet
+            FROM messages_fts fts
+            JOIN messages m ON m.id = fts.rowid
             JOIN sessions s ON m.session_id = s.id
-            WHERE fts.content MATCH ?
-            ORDER BY m.timestamp DESC
-            LIMIT 50
-        '''
-        c.execute(sql, (query,))
-        results = [dict(row) for row in c.fetchall()]
-        conn.close()
-        return results
+            WHERE messages_fts MATCH ? AND fts.rowid IN ({placeholders})
+        ''', [_MARK_START, _MARK_END, query, *[rowid for rowid, _, _ in ranked]])
+        by_id = {row['id']: dict(row) for row in c.fetchall()}
+
+        rows = []
+        for rowid, rank, _ in ranked:
+            row = by_id.get(rowid)
+            if row is None:
+                continue  # Deleted since it was ranked
+            row['score'] = rank
+            row['snippet'] = (
+                html.escape(row['snippet'] or '', quote=False).replace(_MARK_START, "<mark>").replace(_MARK_END, "</mark>")
+            )
+            rows.append(row)
+        return {"results": rows, "next_cursor": next_cursor}
+
+    def save_survival_results(self, session_id: str, generation: int, results: List[tuple], wait: bool = False):
+        """
+        Cache per-file survival results of a session computed at `generation`.
+
+        Args:
+            results: (path, file_mtime_ns, file_size, status, score, total_lines, retained_lines) tuples
+            wait: Block until written; by default the write is queued in the background
+        """
+        if results:
+            return self.writer.submit(self._save_survival_results, session_id, generation, results, wait=wait)
+
+    def _save_survival_results(self, c: sqlite3.Cursor, session_id: str, generation: int, results: List[tuple]):
+        # Results computed before the session was re-ingested are dropped
+        row = c.execute("SELECT generation FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        if row is None or row[0] != generation:
+            return
+        c.executemany(
+            "INSERT OR REPLACE INTO survival_cache (session_id, path, generation, file_mtime_ns, file_size, status, score, total_lines, retained_lines) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(session_id, path, generation, *result) for path, *result in results]
+        )
 
     def get_all_tags(self) -> List[Dict[str, str]]:
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        c = conn.cursor()
+        c = self.reader().cursor()
         c.execute("SELECT * FROM tags ORDER BY name")
         tags = [dict(row) for row in c.fetchall()]
-        conn.close()
         return tags
 
     def add_tag(self, name: str, color: str = "blue") -> int:
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        return self.writer.submit(self._add_tag, name, color)
+
+    def _add_tag(self, c: sqlite3.Cursor, name: str, color: str) -> int:
         c.execute("INSERT OR IGNORE INTO tags (name, color) VALUES (?, ?)", (name, color))
         c.execute("SELECT id FROM tags WHERE name = ?", (name,))
-        tag_id = c.fetchone()[0]
-        conn.commit()
-        conn.close()
-        return tag_id
+        return c.fetchone()[0]
 
     def tag_session(self, session_id: str, tag_name: str, color: str = "blue"):
-        tag_id = self.add_tag(tag_name, color)
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        self.writer.submit(self._tag_session, session_id, tag_name, color)
+
+    def _tag_session(self, c: sqlite3.Cursor, session_id: str, tag_name: str, color: str):
+        tag_id = self._add_tag(c, tag_name, color)
         c.execute("INSERT OR IGNORE INTO session_tags (session_id, tag_id) VALUES (?, ?)", (session_id, tag_id))
-        conn.commit()
-        conn.close()
+        # Tags on sessions that are not stored (yet) are not counted, same as the dashboard join
+        if c.rowcount and c.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone():
+            self._rollup_tag(c, session_id, tag_id, 1)
 
     def untag_session(self, session_id: str, tag_name: str):
-        conn = sqlite3.connect(self.db_path)
-        c = conn.cursor()
+        self.writer.submit(self._untag_session, session_id, tag_name)
+
+    def _untag_session(self, c: sqlite3.Cursor, session_id: str, tag_name: str):
+        c.execute('''
+            SELECT st.tag_id FROM session_tags st JOIN tags t ON t.id = st.tag_id
+            WHERE st.session_id = ? AND t.name = ?
+        ''', (session_id, tag_name))
+        tag_ids = [row[0] for row in c.fetchall()]
         c.execute('''
             DELETE FROM session_tags 
             WHERE session_id = ? AND tag_id IN (SELECT id FROM tags WHERE name = ?)
         ''', (session_id, tag_name))
-        conn.commit()
-        conn.close()
+        if tag_ids and c.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone():
+            for tag_id in tag_ids:
+                self._rollup_tag(c, session_id, tag_id, -1)
@@ -0,0 +1,62 @@
+import difflib
+from typing import List, Optional, Sequence, Tuple
+
+
+def _matched(matcher: difflib.SequenceMatcher) -> int:
+    return sum(block.size for block in matcher.get_matching_blocks())
+
+
+def retained_lines(session_lines: Sequence[str], current_lines: Sequence[str]) -> int:
+    """
+    Number of session lines still present, in order, among the current lines.
+
+    This is the size of difflib's matching blocks, the count the One-Shot scores have
+    always been based on (longest block first, with difflib's autojunk heuristic), so
+    scores do not change with the implementation. Files left as the session wrote them
+    are counted without running the matcher.
+    """
+    if session_lines == current_lines:
+        # difflib matches identical sequences completely
+        return len(session_lines)
+    return _matched(difflib.SequenceMatcher(None, session_lines, current_lines))
+
+
+def survival(session_content: str, current_content: str) -> Tuple[int, int]:
+    """
+    Retained and total line counts of the content a session wrote.
+
+    Returns:
+        (retained_lines, total_lines) with total_lines the session content's line count
+    """
+    session_lines = session_content.splitlines()
+    return retained_lines(session_lines, current_content.splitlines()), len(session_lines)
+
+
+def survival_against_file(current_path: str, session_contents: List[str]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Survival of several sessions' writes to the same file against its current content.
+
+    The file is read and split once, and difflib's index of its lines (the matcher's
+    second sequence) is built once for all writes. Used by the project survival job,
+    in worker processes when there are enough files to spread out.
+
+    Returns:
+        (retained_lines, total_lines) per session content, or None if the file cannot be read
+    """
+    try:
+        with open(current_path, 'r', encoding='utf-8', errors='ignore') as f:
+            current_lines = f.read().splitlines()
+    except OSError:
+        return None
+    matcher = difflib.SequenceMatcher(None)
+    matcher.set_seq2(current_lines)
+    results = []
+    for content in session_contents:
+        session_lines = content.splitlines()
+        if session_lines == current_lines:
+            retained = len(session_lines)
+        else:
+            matcher.set_seq1(session_lines)
+            retained = _matched(matcher)
+        results.append((retained, len(session_lines)))
+    return results
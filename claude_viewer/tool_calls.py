@@ -0,0 +1,145 @@
+import difflib
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def _text(value: Any) -> Optional[str]:
+    """Content fields are normally strings; keep anything else as JSON so it can be stored."""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, ensure_ascii=False)
+
+
+def extract_file_change(tool_name: str, input_data: Any) -> Optional[Dict[str, Any]]:
+    """
+    Recognize a file-changing tool call from its name and input.
+
+    Returns:
+        Dict with type ("write" or "edit"), path, content (new text) and
+        target_content (replaced text), or None if the call does not change a file
+    """
+    tool_name = tool_name or ''
+    if not isinstance(input_data, dict):
+        return None
+    if not any(x in tool_name.lower() for x in ['write', 'edit', 'replace', 'create', 'append']):
+        return None
+
+    path = (
+        input_data.get('path') or
+        input_data.get('file_path') or
+        input_data.get('TargetFile') or
+        input_data.get('filename') or
+        input_data.get('target_file') or
+        input_data.get('file')
+    )
+    if not path:
+        return None
+
+    # Extract content or diff
+    file_content = (
+        input_data.get('content') or
+        input_data.get('code') or
+        input_data.get('file_content') or
+        input_data.get('CodeContent') or
+        input_data.get('ReplacementContent') or
+        input_data.get('new_string')
+    )
+
+    target_content = (
+        input_data.get('TargetContent') or
+        input_data.get('old_string')
+    )
+
+    # Handle chunks for multi-replace
+    if 'ReplacementChunks' in input_data:
+        chunks = input_data['ReplacementChunks']
+        if isinstance(chunks, list):
+            targets = []
+            replacements = []
+            for chunk in chunks:
+                targets.append(chunk.get('TargetContent', ''))
+                replacements.append(chunk.get('ReplacementContent', ''))
+
+            # Use aggregated contents
+            if not file_content:
+                file_content = "\n\n... [unchanged] ...\n\n".join(replacements)
+            if not target_content:
+                target_content = "\n\n... [unchanged] ...\n\n".join(targets)
+
+    # Handle 'edits' list (another format)
+    elif 'edits' in input_data:
+        edits = input_data['edits']
+        if isinstance(edits, list):
+            targets = []
+            replacements = []
+            for edit in edits:
+                targets.append(edit.get('old_string', ''))
+                replacements.append(edit.get('new_string', ''))
+
+            if not file_content:
+                file_content = "\n\n... [unchanged] ...\n\n".join(replacements)
+            if not target_content:
+                target_content = "\n\n... [unchanged] ...\n\n".join(targets)
+
+    change_type = 'write'
+    if 'replace' in tool_name.lower() or 'edit' in tool_name.lower():
+        change_type = 'edit'
+
+    return {
+        'type': change_type,
+        'path': path if isinstance(path, str) else _text(path),
+        'content': _text(file_content),
+        'target_content': _text(target_content),
+    }
+
+
+def tool_call_rows(tool_uses: List[Tuple[int, str, Any]]) -> List[tuple]:
+    """
+    Normalize the tool calls of one assistant message.
+
+    Args:
+        tool_uses: (ordinal, tool_name, input) tuples, input already decoded
+
+    Returns:
+        (ordinal, tool_name, change_type, path, new_content, old_content) tuples;
+        the change fields are None for calls that do not change a file
+    """
+    rows = []
+    for ordinal, tool_name, input_data in tool_uses:
+        change = extract_file_change(tool_name, input_data)
+        if change is None:
+            rows.append((ordinal, tool_name, None, None, None, None))
+        else:
+            rows.append((ordinal, tool_name, change['type'], change['path'], change['content'], change['target_content']))
+    return rows
+
+
+def change_stats(new_content: Optional[str], old_content: Optional[str]) -> Tuple[int, int, int]:
+    """
+    (size, added, removed) of a file change: the new content's length in bytes and
+    the lines added and removed by a line diff from the replaced to the new content
+    (the +/- lines of the unified diff shown for it).
+    """
+    new_lines = (new_content or '').splitlines()
+    old_lines = (old_content or '').splitlines()
+    added = removed = 0
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, old_lines, new_lines).get_opcodes():
+        if tag != 'equal':
+            removed += i2 - i1
+            added += j2 - j1
+    return len((new_content or '').encode('utf-8')), added, removed
+
+
+def tool_call_rows_from_blocks(role: str, blocks: List[tuple]) -> List[tuple]:
+    """tool_call_rows for a message given as stored blocks (input as JSON text); only assistant calls count."""
+    if role != 'assistant':
+        return []
+    tool_uses = []
+    for ordinal, (block_type, tool_name, _, input_json, _) in enumerate(blocks):
+        if block_type != 'tool_use':
+            continue
+        try:
+            tool_uses.append((ordinal, tool_name, json.loads(input_json)))
+        except (TypeError, json.JSONDecodeError):
+            tool_uses.append((ordinal, tool_name, None))
+    return tool_call_rows(tool_uses)
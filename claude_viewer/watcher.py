@@ -9,9 +9,10 @@ import os
 logger = logging.getLogger(__name__)
 
 class LogWatcher(FileSystemEventHandler):
-    def __init__(self, log_dir: Path, callback):
+    def __init__(self, log_dir: Path, callback, delete_callback=None):
         self.log_dir = log_dir
         self.callback = callback
+        self.delete_callback = delete_callback
         self.observer = Observer()
         self.debouncers = {}
         self.DEBOUNCE_SECONDS = 1.0
@@ -60,6 +61,34 @@ class LogWatcher(FileSystemEventHandler):
             # Immediate update for new files
             self._handle_change(event.src_path)
 
+    def on_deleted(self, event):
+        if event.is_directory:
+            return
+
+        filename = Path(event.src_path).name
+        if filename.endswith('.jsonl'):
+            logger.info(f"Log file removed: {filename}")
+            if filename in self.debouncers:
+                self.debouncers.pop(filename).cancel()
+            self._handle_delete(event.src_path)
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+
+        if Path(event.src_path).name.endswith('.jsonl'):
+            self._handle_delete(event.src_path)
+        if Path(event.dest_path).name.endswith('.jsonl'):
+            self._handle_change(event.dest_path)
+
+    def _handle_delete(self, file_path):
+        if not self.delete_callback:
+            return
+        try:
+            self.delete_callback(file_path)
+        except Exception as e:
+            logger.error(f"Error handling file removal: {e}")
+
     def _handle_change(self, file_path):
         try:
             logger.info(f"Processing change in {file_path}")
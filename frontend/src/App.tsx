@@ -5,12 +5,15 @@ import { ChatInterface } from './components/ChatInterface';
 import { Search } from './components/Search';
 import { Analytics } from './components/Analytics';
 import { api } from './api';
-import type { Session, Message, Project } from './types';
+import type { Session, Message, MessagePage, Project, ScanProgress } from './types';
 import { LayoutDashboard, Search as SearchIcon, Settings as SettingsIcon, Folder } from 'lucide-react';
 import { Dashboard } from './components/Dashboard';
 import { Settings } from './components/Settings';
 import { useTranslation } from 'react-i18next';
 
+const MESSAGE_PAGE_SIZE = 200;
+const MESSAGE_BODY_BYTES = 16 * 1024;
+
 function AppContent() {
   const { t } = useTranslation();
   const [projects, setProjects] = useState<Project[]>([]);
@@ -19,12 +22,40 @@ function AppContent() {
   const [selectedSessionId, setSelectedSessionId] = useState<string | null>(null);
   const [messages, setMessages] = useState<Message[]>([]);
   const [loading, setLoading] = useState(false);
+  // A page failed to load: the message list is missing that page and everything after it
+  const [messagesIncomplete, setMessagesIncomplete] = useState(false);
   const [view, setView] = useState<'dashboard' | 'chat' | 'search' | 'analytics' | 'settings'>('dashboard');
 
   useEffect(() => {
     api.getProjects().then(setProjects);
   }, []);
 
+  useEffect(() => {
+    // While the background scan runs, refresh projects once the most recent
+    // sessions are committed and again when the scan finishes
+    let cancelled = false;
+    let recentReady = false;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    const poll = async () => {
+      const progress: ScanProgress = await api.getScanProgress();
+      if (cancelled) return;
+      if (progress.is_scanning) {
+        if (progress.recent_ready && !recentReady) {
+          recentReady = true;
+          api.getProjects().then(setProjects);
+        }
+        timer = setTimeout(poll, 2000);
+      } else if (recentReady || progress.completed > 0) {
+        api.getProjects().then(setProjects);
+      }
+    };
+    poll();
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, []);
+
   useEffect(() => {
     if (selectedProject) {
       api.getSessions(selectedProject).then(setSessions);
@@ -38,10 +69,28 @@ function AppContent() {
     if (selectedSessionId) {
       // eslint-disable-next-line
       setLoading(true);
-      api.getSession(selectedSessionId).then(res => {
-        setMessages(res);
-        setLoading(false);
-      });
+      setMessagesIncomplete(false);
+      // Show the first page as soon as it arrives, then stream in the rest;
+      // bodies beyond MESSAGE_BODY_BYTES are fetched on demand by MessageItem
+      let cancelled = false;
+      const loadPage = (cursor: string | null, first: boolean) => {
+        api.getSessionMessages(selectedSessionId, cursor, MESSAGE_PAGE_SIZE, MESSAGE_BODY_BYTES)
+          .then((page: MessagePage) => {
+            if (cancelled) return;
+            setMessages(prev => first ? page.messages : [...prev, ...page.messages]);
+            setLoading(false);
+            if (page.next_cursor) loadPage(page.next_cursor, false);
+          })
+          .catch((e) => {
+            console.error("Failed to load messages", e);
+            if (cancelled) return;
+            if (first) setMessages([]);
+            setMessagesIncomplete(true);
+            setLoading(false);
+          });
+      };
+      loadPage(null, true);
+      return () => { cancelled = true; };
     } else {
       setMessages([]);
     }
@@ -150,6 +199,7 @@ function AppContent() {
             <ChatInterface
               messages={messages}
               loading={loading}
+              incomplete={messagesIncomplete}
               sessionId={selectedSessionId || undefined}
               initialTags={currentSession?.tags}
               onTagsChange={handleTagsChange}
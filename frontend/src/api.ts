@@ -1,3 +1,5 @@
+import type { OneShotSource } from './types';
+
 const API_BASE = "/api";
 
 export const api = {
@@ -13,17 +15,64 @@ export const api = {
         const res = await fetch(`${API_BASE}/sessions/${sessionId}`);
         return res.json();
     },
+    getSessionMessages: async (sessionId: string, cursor?: string | null, limit: number = 200, maxBytes?: number) => {
+        const params = new URLSearchParams({ limit: String(limit) });
+        if (cursor) params.set('cursor', cursor);
+        if (maxBytes) params.set('max_bytes', String(maxBytes));
+        const res = await fetch(`${API_BASE}/sessions/${sessionId}/messages?${params}`);
+        return res.json();
+    },
+    getMessage: async (messageId: number) => {
+        const res = await fetch(`${API_BASE}/messages/${messageId}`);
+        return res.json();
+    },
+    getSessionTokenUsage: async (sessionId: string, points: number = 300) => {
+        const res = await fetch(`${API_BASE}/sessions/${sessionId}/token-usage?points=${points}`);
+        return res.json();
+    },
     getSessionChanges: async (sessionId: string) => {
         const res = await fetch(`${API_BASE}/sessions/${sessionId}/changes`);
         return res.json();
     },
-    getOneShotStats: async (sessionId: string, exclude?: string[]) => {
-        const query = exclude ? `?exclude=${exclude.join(',')}` : '';
+    getSessionChangeDiff: async (sessionId: string, changeId: number) => {
+        const res = await fetch(`${API_BASE}/sessions/${sessionId}/changes/${changeId}`);
+        if (!res.ok) {
+            throw new Error('Failed to fetch file change');
+        }
+        return res.json();
+    },
+    getOneShotStats: async (sessionId: string, exclude?: string[], source?: OneShotSource) => {
+        const params = new URLSearchParams();
+        if (exclude) params.set('exclude', exclude.join(','));
+        if (source) params.set('source', source);
+        const query = params.toString() ? `?${params}` : '';
         const res = await fetch(`${API_BASE}/sessions/${sessionId}/oneshot${query}`);
         return res.json();
     },
-    search: async (query: string) => {
-        const res = await fetch(`${API_BASE}/search?q=${encodeURIComponent(query)}`);
+    getSurvivalHistory: async (sessionId: string, exclude?: string[], points?: number) => {
+        const params = new URLSearchParams();
+        if (exclude) params.set('exclude', exclude.join(','));
+        if (points) params.set('points', String(points));
+        const query = params.toString() ? `?${params}` : '';
+        const res = await fetch(`${API_BASE}/sessions/${sessionId}/survival/history${query}`);
+        return res.json();
+    },
+    getOneShotFile: async (sessionId: string, path: string) => {
+        const res = await fetch(`${API_BASE}/sessions/${sessionId}/oneshot/file?path=${encodeURIComponent(path)}`);
+        return res.json();
+    },
+    getProjectSurvival: async (projectName: string, exclude?: string[]) => {
+        const query = exclude ? `?exclude=${exclude.join(',')}` : '';
+        const res = await fetch(`${API_BASE}/projects/${encodeURIComponent(projectName)}/survival${query}`);
+        if (!res.ok) {
+            throw new Error('Failed to fetch project survival');
+        }
+        return res.json();
+    },
+    search: async (query: string, cursor?: string | null) => {
+        const params = new URLSearchParams({ q: query });
+        if (cursor) params.set('cursor', cursor);
+        const res = await fetch(`${API_BASE}/search?${params}`);
         return res.json();
     },
     getAnalytics: async () => {
@@ -48,6 +97,10 @@ export const api = {
         });
         return res.json();
     },
+    getScanProgress: async () => {
+        const res = await fetch(`${API_BASE}/scan/progress`);
+        return res.json();
+    },
     getDashboard: async () => {
         const res = await fetch(`${API_BASE}/dashboard`);
         return res.json();
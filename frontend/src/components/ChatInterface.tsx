@@ -14,6 +14,7 @@ interface ChatInterfaceProps {
     initialTags?: Tag[];
     messages: Message[];
     loading: boolean;
+    incomplete?: boolean; // loading stopped at a failed page
     onTagsChange?: () => void;
     model?: string;
     totalTokens?: number;
@@ -31,6 +32,7 @@ export const ChatInterface: React.FC<ChatInterfaceProps> = ({
     initialTags = [],
     messages,
     loading,
+    incomplete = false,
     onTagsChange,
     model,
     totalTokens,
@@ -99,6 +101,14 @@ export const ChatInterface: React.FC<ChatInterfaceProps> = ({
         );
     }
 
+    if (messages.length === 0 && incomplete) {
+        return (
+            <div className="flex-1 flex flex-col items-center justify-center bg-white">
+                <span className="text-lg font-bold font-mono uppercase tracking-widest text-red-600">{t('chat.load_failed')}</span>
+            </div>
+        );
+    }
+
     if (messages.length === 0) {
         if (selectedProject) {
             return <ProjectDetails projectName={selectedProject} />;
@@ -201,6 +211,11 @@ export const ChatInterface: React.FC<ChatInterfaceProps> = ({
                     {messages.map((msg, idx) => (
                         <MessageItem key={idx} msg={msg} />
                     ))}
+                    {incomplete && (
+                        <div className="border-4 border-black bg-red-100 p-4 font-bold text-sm text-red-800">
+                            {t('chat.load_incomplete', { count: messages.length })}
+                        </div>
+                    )}
                     <div ref={bottomRef} className="h-4" />
                 </div>
             </div>
@@ -1,7 +1,8 @@
-import React, { useMemo, useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { X, FileText, ChevronRight, ChevronDown, Folder, File, Plus, Pencil } from 'lucide-react';
 
-import type { FileChange } from '../types';
+import type { FileChange, FileChangeDiff } from '../types';
+import { api } from '../api';
 
 interface FileChangeModalProps {
     isOpen: boolean;
@@ -248,8 +249,43 @@ export const FileChangeModal: React.FC<FileChangeModalProps> = ({ isOpen, onClos
     }, [changes]);
 
 
+    // Diffs are fetched when a change is expanded and kept while the modal shows this session
+    const [expanded, setExpanded] = useState<Set<number>>(new Set());
+    const [diffs, setDiffs] = useState<Record<number, FileChangeDiff>>({});
+
+    useEffect(() => {
+        setExpanded(new Set());
+        setDiffs({});
+    }, [sessionId, changes]);
+
+    const loadDiff = (changeId: number) => {
+        if (diffs[changeId]) return;
+        api.getSessionChangeDiff(sessionId, changeId)
+            .then((diff: FileChangeDiff) => setDiffs(prev => ({ ...prev, [changeId]: diff })))
+            .catch(e => console.error("Failed to load diff", e));
+    };
+
+    const toggleChange = (changeId: number) => {
+        setExpanded(prev => {
+            const next = new Set(prev);
+            if (next.has(changeId)) {
+                next.delete(changeId);
+            } else {
+                next.add(changeId);
+            }
+            return next;
+        });
+        loadDiff(changeId);
+    };
+
     const scrollToChange = (path: string) => {
-        // Scroll to the file group instead of a specific change index
+        // Open the file's latest change and scroll to the file group
+        const fileChanges = groupedChanges[path];
+        if (fileChanges && fileChanges.length > 0) {
+            const latest = fileChanges[fileChanges.length - 1].id;
+            setExpanded(prev => new Set(prev).add(latest));
+            loadDiff(latest);
+        }
         const el = document.getElementById(`file-group-${path}`);
         if (el) {
             el.scrollIntoView({ behavior: 'smooth', block: 'start' });
@@ -337,62 +373,77 @@ export const FileChangeModal: React.FC<FileChangeModalProps> = ({ isOpen, onClos
 
                                     {/* List of Changes for this File */}
                                     <div className="space-y-6">
-                                        {fileChanges.map((change, idx) => (
-                                            <div key={idx} className="bg-white border-4 border-gray-200 shadow-sm">
-                                                {/* Change Meta Header */}
-                                                <div className="flex items-center justify-between p-2 bg-gray-50 border-b-2 border-gray-100 text-xs text-gray-500">
-                                                    <div className="flex items-center gap-2">
-                                                        <span className={`
-                                                            px-2 py-0.5 font-bold uppercase rounded-sm
-                                                            ${change.type === 'write' ? 'bg-green-100 text-green-800' : 'bg-blue-100 text-blue-800'}
-                                                        `}>
-                                                            {change.type}
+                                        {fileChanges.map((change) => {
+                                            const isExpanded = expanded.has(change.id);
+                                            const detail = diffs[change.id];
+                                            return (
+                                                <div key={change.id} className="bg-white border-4 border-gray-200 shadow-sm">
+                                                    {/* Change Meta Header */}
+                                                    <div
+                                                        className={`flex items-center justify-between p-2 bg-gray-50 text-xs text-gray-500 cursor-pointer hover:bg-yellow-50 select-none ${isExpanded ? 'border-b-2 border-gray-100' : ''}`}
+                                                        onClick={() => toggleChange(change.id)}
+                                                    >
+                                                        <div className="flex items-center gap-2">
+                                                            {isExpanded ? <ChevronDown size={14} /> : <ChevronRight size={14} />}
+                                                            <span className={`
+                                                                px-2 py-0.5 font-bold uppercase rounded-sm
+                                                                ${change.type === 'write' ? 'bg-green-100 text-green-800' : 'bg-blue-100 text-blue-800'}
+                                                            `}>
+                                                                {change.type}
+                                                            </span>
+                                                            <span className="font-mono">{change.tool}</span>
+                                                            <span className="font-mono font-bold text-green-700">+{change.added}</span>
+                                                            <span className="font-mono font-bold text-red-700">-{change.removed}</span>
+                                                            <span className="font-mono text-gray-400">{(change.size / 1024).toFixed(1)}k</span>
+                                                        </div>
+                                                        <span className="font-mono">
+                                                            {new Date(change.timestamp).toLocaleTimeString()}
                                                         </span>
-                                                        <span className="font-mono">{change.tool}</span>
                                                     </div>
-                                                    <span className="font-mono">
-                                                        {new Date(change.timestamp).toLocaleTimeString()}
-                                                    </span>
-                                                </div>
 
-                                                {/* Content View: Diff or Fallback Content */}
-                                                <div className="p-0 overflow-hidden text-xs font-mono bg-white">
-                                                    {change.diff ? (
-                                                        <DiffViewer diff={change.diff} className="p-4" />
-                                                    ) : (
-                                                        <div className="flex flex-col">
-                                                            {/* Fallback to old separate view if no diff */}
-                                                            {change.target_content && (
-                                                                <div className="bg-pink-50 border-b border-pink-100 p-0">
-                                                                    <div className="text-red-900 font-bold px-3 py-1 flex items-center gap-1 border-b border-pink-200 text-[10px] uppercase tracking-wider bg-pink-100/50">
-                                                                        Original Content
+                                                    {/* Content View: Diff or Fallback Content */}
+                                                    {isExpanded && (
+                                                    <div className="p-0 overflow-hidden text-xs font-mono bg-white">
+                                                        {!detail ? (
+                                                            <div className="p-4 text-gray-400 italic animate-pulse">Loading diff...</div>
+                                                        ) : detail.diff ? (
+                                                            <DiffViewer diff={detail.diff} className="p-4" />
+                                                        ) : (
+                                                            <div className="flex flex-col">
+                                                                {/* Fallback to old separate view if no diff */}
+                                                                {detail.target_content && (
+                                                                    <div className="bg-pink-50 border-b border-pink-100 p-0">
+                                                                        <div className="text-red-900 font-bold px-3 py-1 flex items-center gap-1 border-b border-pink-200 text-[10px] uppercase tracking-wider bg-pink-100/50">
+                                                                            Original Content
+                                                                        </div>
+                                                                        <ContentViewer
+                                                                            content={detail.target_content}
+                                                                            limit={500}
+                                                                            className="text-gray-700 max-h-[400px] overflow-y-auto"
+                                                                        />
                                                                     </div>
-                                                                    <ContentViewer
-                                                                        content={change.target_content}
-                                                                        limit={500}
-                                                                        className="text-gray-700 max-h-[400px] overflow-y-auto"
-                                                                    />
-                                                                </div>
-                                                            )}
-                                                            <div className="bg-emerald-50 p-0">
-                                                                <div className="text-emerald-900 font-bold px-3 py-1 flex items-center gap-1 border-b border-emerald-200 text-[10px] uppercase tracking-wider bg-emerald-100/50">
-                                                                    {change.target_content ? 'Replacement' : 'New Content'}
-                                                                </div>
-                                                                {change.content ? (
-                                                                    <ContentViewer
-                                                                        content={change.content}
-                                                                        limit={2000}
-                                                                        className="text-gray-900"
-                                                                    />
-                                                                ) : (
-                                                                    <div className="p-3 text-gray-400 italic">No content available</div>
                                                                 )}
+                                                                <div className="bg-emerald-50 p-0">
+                                                                    <div className="text-emerald-900 font-bold px-3 py-1 flex items-center gap-1 border-b border-emerald-200 text-[10px] uppercase tracking-wider bg-emerald-100/50">
+                                                                        {detail.target_content ? 'Replacement' : 'New Content'}
+                                                                    </div>
+                                                                    {detail.content ? (
+                                                                        <ContentViewer
+                                                                            content={detail.content}
+                                                                            limit={2000}
+                                                                            className="text-gray-900"
+                                                                        />
+                                                                    ) : (
+                                                                        <div className="p-3 text-gray-400 italic">No content available</div>
+                                                                    )}
+                                                                </div>
                                                             </div>
-                                                        </div>
+                                                        )}
+                                                    </div>
                                                     )}
                                                 </div>
-                                            </div>
-                                        ))}
+                                            );
+                                        })}
                                     </div>
                                 </div>
                             ))
@@ -2,6 +2,7 @@ import { useState } from 'react';
 import { User, Sparkles, ChevronDown, ChevronUp, Terminal } from 'lucide-react';
 import ReactMarkdown from 'react-markdown';
 import { formatMessageContent } from '../utils/formatMessage';
+import { api } from '../api';
 import type { Message } from '../types';
 
 interface MessageItemProps {
@@ -9,7 +10,9 @@ interface MessageItemProps {
 }
 
 export const MessageItem: React.FC<MessageItemProps> = ({ msg }) => {
-    const formattedContent = formatMessageContent(msg.content);
+    const [fullContent, setFullContent] = useState<string | null>(null);
+    const [loadingFull, setLoadingFull] = useState(false);
+    const formattedContent = formatMessageContent(fullContent ?? msg.content);
     const lineCount = formattedContent.split('\n').length;
     const isLong = lineCount > 30;
     const [isExpanded, setIsExpanded] = useState(!isLong);
@@ -72,6 +75,25 @@ export const MessageItem: React.FC<MessageItemProps> = ({ msg }) => {
                         )}
                     </div>
 
+                    {msg.truncated && fullContent === null && (
+                        <button
+                            onClick={() => {
+                                setLoadingFull(true);
+                                api.getMessage(msg.id)
+                                    .then(res => {
+                                        setFullContent(res.content);
+                                        setIsExpanded(true);
+                                    })
+                                    .catch((e) => console.error("Failed to load full message", e))
+                                    .finally(() => setLoadingFull(false));
+                            }}
+                            disabled={loadingFull}
+                            className="mt-4 text-xs font-black uppercase tracking-widest text-primary-blue hover:text-black hover:underline flex items-center gap-1 transition-colors"
+                        >
+                            <ChevronDown size={14} strokeWidth={3} /> {loadingFull ? '加载中 (Loading...)' : '显示完整内容 (Show full message)'}
+                        </button>
+                    )}
+
                     {isLong && (
                         <button
                             onClick={() => setIsExpanded(!isExpanded)}
@@ -1,8 +1,11 @@
 
 import React, { useState, useEffect, useMemo } from 'react';
+import { LineChart, Line, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
 import { X, FileText } from 'lucide-react';
 import { CodeSurvivalFileTree } from './CodeSurvivalFileTree';
 import { OneShotDiffViewer } from './OneShotDiffViewer';
+import { api } from '../api';
+import type { OneShotFileContents, OneShotSource, SurvivalHistory } from '../types';
 
 interface FileStat {
     path: string;
@@ -10,16 +13,24 @@ interface FileStat {
     status: 'perfect' | 'modified' | 'replaced' | 'deleted';
     total_lines?: number;
     retained_lines?: number;
-    session_content?: string;
-    current_content?: string;
+    source_path?: string; // path as returned by the API, before the common prefix is stripped
 }
 
 interface OneShotStats {
     overall_score: number;
     file_count: number;
     file_stats: FileStat[];
+    commit?: string;        // git sources: the commit scored against
+    source_error?: string;  // git source unreadable, scored against the working tree instead
+    error?: string;
 }
 
+const SOURCES: { value: OneShotSource; label: string }[] = [
+    { value: 'worktree', label: '工作区' },
+    { value: 'head', label: 'HEAD' },
+    { value: 'session_end', label: '会话结束' },
+];
+
 interface OneShotDetailsModalProps {
     isOpen: boolean;
     onClose: () => void;
@@ -35,10 +46,49 @@ export const OneShotDetailsModal: React.FC<OneShotDetailsModalProps> = ({
 }) => {
     const [selectedFile, setSelectedFile] = useState<FileStat | null>(null);
     const [showDiffViewer, setShowDiffViewer] = useState(false);
+    const [contents, setContents] = useState<OneShotFileContents | null>(null);
+    const [source, setSource] = useState<OneShotSource>('worktree');
+    const [sourceStats, setSourceStats] = useState<OneShotStats | null>(null);
+    const [history, setHistory] = useState<SurvivalHistory | null>(null);
+
+    // 按所选来源重新计算 (the working tree stats come from the parent, git sources are fetched)
+    useEffect(() => {
+        setSourceStats(null);
+        setSelectedFile(null);
+        if (!isOpen || source === 'worktree') return;
+        let cancelled = false;
+        api.getOneShotStats(sessionId, ['md', 'txt'], source)
+            .then((data: OneShotStats) => {
+                if (!cancelled) setSourceStats(data);
+            })
+            .catch((e) => console.error("Failed to load survival stats", e));
+        return () => { cancelled = true; };
+    }, [isOpen, source, sessionId]);
+
+    useEffect(() => {
+        setHistory(null);
+        if (!isOpen) return;
+        let cancelled = false;
+        api.getSurvivalHistory(sessionId, ['md', 'txt'])
+            .then((data: SurvivalHistory) => {
+                // Not a git project, or the repository could not be read: no chart
+                if (!cancelled && Array.isArray(data.points)) setHistory(data);
+            })
+            .catch((e) => console.error("Failed to load survival history", e));
+        return () => { cancelled = true; };
+    }, [isOpen, sessionId]);
+
+    const activeStats = source === 'worktree' ? stats : (sourceStats && !sourceStats.error ? sourceStats : null);
+
+    const historyData = useMemo(() => (history?.points || []).map(p => ({
+        name: `${new Date(p.commit_time).toLocaleDateString()} · ${p.commit.substring(0, 8)}`,
+        score: p.overall_score,
+    })), [history]);
 
     // 移除文件路径的公共前缀
     const processedStats = useMemo(() => {
-        if (!stats) return null;
+        if (!activeStats) return null;
+        const stats = activeStats;
 
         // 找到所有路径的公共前缀
         const paths = stats.file_stats.map(f => f.path);
@@ -75,21 +125,41 @@ export const OneShotDetailsModal: React.FC<OneShotDetailsModalProps> = ({
             ...stats,
             file_stats: stats.file_stats.map(f => ({
                 ...f,
+                source_path: f.path,
                 path: commonPrefix ? f.path.replace(commonPrefix, '') : f.path
             }))
         };
-    }, [stats]);
+    }, [activeStats]);
 
     // 关闭弹窗时重置选中状态
     useEffect(() => {
         if (!isOpen) {
             setSelectedFile(null);
             setShowDiffViewer(false);
+            setSource('worktree');
         }
     }, [isOpen]);
 
+    // 文件内容按需加载 (contents are fetched per file on demand)
+    useEffect(() => {
+        setContents(null);
+        if (!selectedFile || selectedFile.status === 'deleted') return;
+        let cancelled = false;
+        api.getOneShotFile(sessionId, selectedFile.source_path || selectedFile.path)
+            .then((data: OneShotFileContents) => {
+                if (!cancelled) setContents(data);
+            })
+            .catch((e) => console.error("Failed to load file contents", e));
+        return () => { cancelled = true; };
+    }, [selectedFile, sessionId]);
+
     if (!isOpen || !stats) return null;
 
+    const sourceMessage = source === 'worktree' ? null
+        : !sourceStats ? 'Loading...'
+        : sourceStats.error || sourceStats.source_error
+        || (sourceStats.commit ? `Commit ${sourceStats.commit.substring(0, 8)}` : null);
+
     const handleFileSelect = (file: FileStat) => {
         setSelectedFile(file);
     };
@@ -110,19 +180,39 @@ export const OneShotDetailsModal: React.FC<OneShotDetailsModalProps> = ({
                     {/* Header */}
                     <div className="p-4 border-b-4 border-black flex items-center justify-between bg-white shrink-0">
                         <div className="flex items-center gap-3">
-                            <div className={`
-                                w-12 h-12 flex items-center justify-center border-2 border-black font-black text-xl
-                                ${processedStats!.overall_score >= 80 ? 'bg-green-400' : processedStats!.overall_score > 50 ? 'bg-yellow-400' : 'bg-red-400'}
-                            `}>
-                                {Math.round(processedStats!.overall_score)}%
-                            </div>
+                            {processedStats && (
+                                <div className={`
+                                    w-12 h-12 flex items-center justify-center border-2 border-black font-black text-xl
+                                    ${processedStats.overall_score >= 80 ? 'bg-green-400' : processedStats.overall_score > 50 ? 'bg-yellow-400' : 'bg-red-400'}
+                                `}>
+                                    {Math.round(processedStats.overall_score)}%
+                                </div>
+                            )}
                             <div>
                                 <h2 className="text-xl font-bold uppercase tracking-tight">Code Survival Report</h2>
                                 <div className="text-xs font-mono text-gray-500">
-                                    Session: {sessionId.substring(0, 16)}... · {processedStats!.file_count} 个文件
+                                    Session: {sessionId.substring(0, 16)}...{processedStats && ` · ${processedStats.file_count} 个文件`}
                                 </div>
                             </div>
                         </div>
+                        <div className="flex items-center gap-3 ml-auto mr-4">
+                            {sourceMessage && (
+                                <div className="text-xs font-mono text-gray-500 max-w-xs truncate" title={sourceMessage}>
+                                    {sourceMessage}
+                                </div>
+                            )}
+                            <div className="flex border-2 border-black">
+                                {SOURCES.map(({ value, label }) => (
+                                    <button
+                                        key={value}
+                                        onClick={() => setSource(value)}
+                                        className={`px-3 py-1 text-xs font-bold uppercase transition-colors ${source === value ? 'bg-black text-white' : 'bg-white hover:bg-primary-yellow'}`}
+                                    >
+                                        {label}
+                                    </button>
+                                ))}
+                            </div>
+                        </div>
                         <button
                             onClick={onClose}
                             className="p-2 hover:bg-red-500 hover:text-white transition-colors border-2 border-transparent hover:border-black rounded-sm"
@@ -131,12 +221,27 @@ export const OneShotDetailsModal: React.FC<OneShotDetailsModalProps> = ({
                         </button>
                     </div>
 
+                    {/* Survival over the commits made since the session ended (git projects) */}
+                    {historyData.length > 0 && (
+                        <div className="h-32 px-4 py-2 border-b-4 border-black bg-white shrink-0">
+                            <ResponsiveContainer width="100%" height="100%">
+                                <LineChart data={historyData}>
+                                    <CartesianGrid strokeDasharray="3 3" vertical={false} />
+                                    <XAxis dataKey="name" tick={{ fontSize: 10 }} />
+                                    <YAxis domain={[0, 100]} width={32} tick={{ fontSize: 10 }} unit="%" />
+                                    <Tooltip />
+                                    <Line type="monotone" dataKey="score" name="存活率 %" stroke="#000" strokeWidth={2} dot={{ r: 2 }} />
+                                </LineChart>
+                            </ResponsiveContainer>
+                        </div>
+                    )}
+
                     {/* Two Column Layout */}
                     <div className="flex-1 flex overflow-hidden">
                         {/* Left Panel - File Tree */}
                         <div className="w-[30%] flex flex-col border-r-4 border-black">
                             <CodeSurvivalFileTree
-                                files={processedStats!.file_stats}
+                                files={processedStats?.file_stats || []}
                                 selectedPath={selectedFile?.path || null}
                                 onFileSelect={handleFileSelect}
                             />
@@ -204,11 +309,13 @@ export const OneShotDetailsModal: React.FC<OneShotDetailsModalProps> = ({
                                             <div className="h-full overflow-auto">
                                                 <div className="min-h-full">
                                                     {/* Inline diff using react-diff-viewer-continued */}
-                                                    {typeof window !== 'undefined' && (
+                                                    {!contents ? (
+                                                        <div className="p-8 text-center">Loading diff...</div>
+                                                    ) : typeof window !== 'undefined' && (
                                                         <React.Suspense fallback={<div className="p-8 text-center">Loading diff...</div>}>
                                                             <DiffViewerLazy
-                                                                oldValue={selectedFile.session_content || ''}
-                                                                newValue={selectedFile.current_content || ''}
+                                                                oldValue={contents.session_content || ''}
+                                                                newValue={contents.current_content || ''}
                                                             />
                                                         </React.Suspense>
                                                     )}
@@ -237,7 +344,11 @@ export const OneShotDetailsModal: React.FC<OneShotDetailsModalProps> = ({
                 <OneShotDiffViewer
                     isOpen={showDiffViewer}
                     onClose={() => setShowDiffViewer(false)}
-                    file={selectedFile}
+                    file={{
+                        ...selectedFile,
+                        session_content: contents?.session_content,
+                        current_content: contents?.current_content ?? undefined
+                    }}
                 />
             )}
         </>
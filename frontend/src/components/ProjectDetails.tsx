@@ -1,6 +1,6 @@
 
-import React, { useEffect, useState, useRef, useCallback } from 'react';
-import type { ProjectDetails as ProjectDetailsType, Session, FileChange } from '../types';
+import React, { useEffect, useState, useCallback } from 'react';
+import type { ProjectDetails as ProjectDetailsType, Session, FileChange, ProjectSurvival, SessionSurvival } from '../types';
 import { api } from '../api';
 import { Folder, GitBranch, FileCode, Activity, MessageSquare, Database, FileText, CheckCircle, Clock, Info, Hammer } from 'lucide-react';
 import { formatDateTime } from '../utils/formatDateTime';
@@ -48,13 +48,14 @@ export const ProjectDetails: React.FC<ProjectDetailsProps> = ({ projectName }) =
     const [oneShotStats, setOneShotStats] = useState<Record<string, OneShotStats>>({});
     const [loadingStats, setLoadingStats] = useState<Record<string, boolean>>({});
 
+    // Project-wide survival: scores of every session from one request
+    const [survival, setSurvival] = useState<ProjectSurvival | null>(null);
+    const [loadingSurvival, setLoadingSurvival] = useState(false);
+
     // One Shot Details Modal
     const [oneShotDetailsOpen, setOneShotDetailsOpen] = useState(false);
     const [showDetailsSessionId, setShowDetailsSessionId] = useState<string | null>(null);
 
-    // Track if we've already triggered auto-load for the current session list
-    const autoLoadTriggered = useRef(false);
-
     const loadOneShotStats = useCallback(async (sessionId: string): Promise<void> => {
         if (loadingStats[sessionId] || oneShotStats[sessionId]) return;
 
@@ -85,7 +86,8 @@ export const ProjectDetails: React.FC<ProjectDetailsProps> = ({ projectName }) =
     };
 
     const handleViewOneShotDetails = (session: Session) => {
-        if (!oneShotStats[session.id]) return;
+        // Per-file stats are loaded on demand; the modal renders once they arrive
+        loadOneShotStats(session.id);
         setShowDetailsSessionId(session.id);
         setOneShotDetailsOpen(true);
     };
@@ -94,7 +96,7 @@ export const ProjectDetails: React.FC<ProjectDetailsProps> = ({ projectName }) =
     useEffect(() => {
         setLoading(true);
         setError(null);
-        autoLoadTriggered.current = false; // Reset trigger
+        setSurvival(null);
         Promise.all([
             api.getProjectDetails(projectName),
             api.getSessions(projectName)
@@ -107,21 +109,19 @@ export const ProjectDetails: React.FC<ProjectDetailsProps> = ({ projectName }) =
             .finally(() => setLoading(false));
     }, [projectName]);
 
-    // Auto-Calculate One Shot Stats
+    // Code survival of all sessions in one request
     useEffect(() => {
-        if (!loading && sessions.length > 0 && !autoLoadTriggered.current) {
-            autoLoadTriggered.current = true;
-
-            // Filter sessions that have file changes
-            const sessionsWithChanges = sessions.filter(s => (s.file_change_count || 0) > 0);
+        let cancelled = false;
+        setLoadingSurvival(true);
+        api.getProjectSurvival(projectName, ['md', 'txt'])
+            .then(data => { if (!cancelled) setSurvival(data); })
+            .catch(e => console.error("Failed to load project survival", e))
+            .finally(() => { if (!cancelled) setLoadingSurvival(false); });
+        return () => { cancelled = true; };
+    }, [projectName]);
 
-            // Limit concurrency? For now just fire them all, browser/server will handle queue
-            // If too many, we might want to batch. Assuming reasonable number for now.
-            sessionsWithChanges.forEach(session => {
-                loadOneShotStats(session.id);
-            });
-        }
-    }, [sessions, loading, loadOneShotStats]);
+    const sessionSurvival: Record<string, SessionSurvival> = {};
+    survival?.sessions?.forEach(s => { sessionSurvival[s.session_id] = s; });
 
     if (loading) {
         return (
@@ -204,6 +204,18 @@ export const ProjectDetails: React.FC<ProjectDetailsProps> = ({ projectName }) =
                                     {(details.stats.tokens / 1000).toFixed(1)}k
                                 </div>
                             </div>
+                            {survival && survival.session_count > 0 && (
+                                <div className="col-span-2">
+                                    <div className="text-gray-500 text-xs font-bold uppercase">{t('project.col_code_survival')}</div>
+                                    <div className="text-2xl font-black flex items-center gap-2">
+                                        <CheckCircle size={20} className="text-gray-400" />
+                                        {survival.overall_score}%
+                                        <span className="text-xs font-mono font-normal text-gray-500">
+                                            {survival.retained_lines.toLocaleString()} / {survival.total_lines.toLocaleString()}
+                                        </span>
+                                    </div>
+                                </div>
+                            )}
                             <div className="col-span-2">
                                 <div className="text-gray-500 text-xs font-bold uppercase">{t('project.last_active')}</div>
                                 <div className="font-mono text-sm border-t-2 border-dashed border-gray-200 pt-1 mt-1">
@@ -302,8 +314,8 @@ export const ProjectDetails: React.FC<ProjectDetailsProps> = ({ projectName }) =
                                 </thead>
                                 <tbody>
                                     {sessions.map((session) => {
-                                        const stats = oneShotStats[session.id];
-                                        const isLoadingStats = loadingStats[session.id];
+                                        const stats = oneShotStats[session.id] || sessionSurvival[session.id];
+                                        const isLoadingStats = loadingStats[session.id] || (loadingSurvival && !stats);
 
                                         // Parse Tool Stats
                                         let toolStats: Record<string, number> = {};
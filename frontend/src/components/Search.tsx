@@ -1,6 +1,6 @@
 import React, { useState } from 'react';
 import { api } from '../api';
-import type { SearchResult } from '../types';
+import type { SearchResponse, SearchResult } from '../types';
 import { Search as SearchIcon } from 'lucide-react';
 import { useTranslation } from 'react-i18next';
 
@@ -12,6 +12,7 @@ export const Search: React.FC<SearchProps> = ({ onResultClick }) => {
     const { t } = useTranslation();
     const [query, setQuery] = useState('');
     const [results, setResults] = useState<SearchResult[]>([]);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
     const [searching, setSearching] = useState(false);
 
     const handleSearch = async (e: React.FormEvent) => {
@@ -19,8 +20,21 @@ export const Search: React.FC<SearchProps> = ({ onResultClick }) => {
         if (!query.trim()) return;
         setSearching(true);
         try {
-            const res = await api.search(query);
-            setResults(res);
+            const res: SearchResponse = await api.search(query);
+            setResults(res.results ?? []);
+            setNextCursor(res.next_cursor ?? null);
+        } finally {
+            setSearching(false);
+        }
+    };
+
+    const handleLoadMore = async () => {
+        if (!nextCursor) return;
+        setSearching(true);
+        try {
+            const res: SearchResponse = await api.search(query, nextCursor);
+            setResults(prev => [...prev, ...(res.results ?? [])]);
+            setNextCursor(res.next_cursor ?? null);
         } finally {
             setSearching(false);
         }
@@ -66,9 +80,9 @@ export const Search: React.FC<SearchProps> = ({ onResultClick }) => {
             </div>
 
             <div className="space-y-4">
-                {results.map((r, i) => (
+                {results.map((r) => (
                     <div
-                        key={i}
+                        key={r.id}
                         onClick={() => onResultClick(r.project_name, r.session_id)}
                         className="p-6 border-4 border-black bg-white shadow-hard-sm hover:shadow-hard-md hover:-translate-y-1 cursor-pointer transition-all group"
                     >
@@ -79,12 +93,23 @@ export const Search: React.FC<SearchProps> = ({ onResultClick }) => {
                             </div>
                             <span className="text-xs font-bold text-gray-500 bg-gray-100 px-2 py-1 border border-black">{new Date(r.timestamp).toLocaleString()}</span>
                         </div>
-                        <div className="text-black font-mono text-sm leading-relaxed p-4 bg-gray-50 border-2 border-black">
-                            {r.content}
-                        </div>
+                        <div
+                            className="text-black font-mono text-sm leading-relaxed p-4 bg-gray-50 border-2 border-black whitespace-pre-wrap break-words [&_mark]:bg-primary-yellow [&_mark]:font-bold"
+                            dangerouslySetInnerHTML={{ __html: r.snippet }}
+                        />
                     </div>
                 ))}
 
+                {nextCursor && (
+                    <button
+                        onClick={handleLoadMore}
+                        disabled={searching}
+                        className="w-full py-4 border-4 border-black bg-white font-black uppercase tracking-wider hover:bg-primary-yellow hover:shadow-hard-md transition-all"
+                    >
+                        {t('search.load_more')}
+                    </button>
+                )}
+
                 {results.length === 0 && !searching && query && (
                     <div className="text-center py-20 border-4 border-black bg-white border-dashed">
                         <div className="text-6xl mb-4">{t('search.rawr')}</div>
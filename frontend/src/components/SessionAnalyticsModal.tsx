@@ -1,7 +1,8 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { AreaChart, Area, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
 import { X, Activity, BookOpen, Compass, Brain, Info } from 'lucide-react';
-import type { Session } from '../types';
+import type { Session, TokenUsagePoint, TokenUsageSeries } from '../types';
+import { api } from '../api';
 import { useTranslation } from 'react-i18next';
 import { Tooltip as UiTooltip } from './Tooltip';
 
@@ -14,23 +15,26 @@ interface SessionAnalyticsModalProps {
 export const SessionAnalyticsModal: React.FC<SessionAnalyticsModalProps> = ({ isOpen, onClose, session }) => {
     const { t } = useTranslation();
 
-    const chartData = useMemo(() => {
-        if (!session.token_usage_history) return [];
-        try {
-            const history = JSON.parse(session.token_usage_history);
-            // eslint-disable-next-line @typescript-eslint/no-explicit-any
-            return history.map((h: any, i: number) => ({
-                name: `${t('analytics.turn')} ${i + 1}`,
-                input: h.input || 0,
-                output: h.output || 0,
-                total: h.total || 0,
-                time: h.timestamp ? new Date(h.timestamp).toLocaleTimeString() : ''
-            }));
-        } catch (e) {
-            console.error("Failed to parse token history", e);
-            return [];
-        }
-    }, [session.token_usage_history, t]);
+    const [usage, setUsage] = useState<TokenUsagePoint[]>([]);
+
+    useEffect(() => {
+        if (!isOpen) return;
+        let cancelled = false;
+        api.getSessionTokenUsage(session.id)
+            .then((series: TokenUsageSeries) => {
+                if (!cancelled) setUsage(series.points || []);
+            })
+            .catch((e) => console.error("Failed to load token usage", e));
+        return () => { cancelled = true; };
+    }, [isOpen, session.id]);
+
+    const chartData = useMemo(() => usage.map((p) => ({
+        name: `${t('analytics.turn')} ${p.seq + 1}`,
+        input: p.input || 0,
+        output: p.output || 0,
+        total: p.total || 0,
+        time: p.timestamp ? new Date(p.timestamp).toLocaleTimeString() : ''
+    })), [usage, t]);
 
     // Parse Tool Stats for exact counts
     const toolStats = useMemo(() => {
@@ -1,7 +1,8 @@
-import React, { useMemo } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
 import { AreaChart, Area, XAxis, YAxis, Tooltip, ResponsiveContainer, CartesianGrid } from 'recharts';
 import { X, Activity, MessageSquare, Zap, Cpu, GitBranch } from 'lucide-react';
-import type { Session } from '../types';
+import type { Session, TokenUsagePoint, TokenUsageSeries } from '../types';
+import { api } from '../api';
 
 interface SessionStatsModalProps {
     isOpen: boolean;
@@ -11,23 +12,26 @@ interface SessionStatsModalProps {
 
 export const SessionStatsModal: React.FC<SessionStatsModalProps> = ({ isOpen, onClose, session }) => {
 
-    const chartData = useMemo(() => {
-        if (!session.token_usage_history) return [];
-        try {
-            const history = JSON.parse(session.token_usage_history);
-            // eslint-disable-next-line @typescript-eslint/no-explicit-any
-            return history.map((h: any, i: number) => ({
-                name: `Turn ${i + 1}`,
-                input: h.input || 0,
-                output: h.output || 0,
-                total: h.total || 0,
-                time: h.timestamp ? new Date(h.timestamp).toLocaleTimeString() : ''
-            }));
-        } catch (e) {
-            console.error("Failed to parse token history", e);
-            return [];
-        }
-    }, [session.token_usage_history]);
+    const [usage, setUsage] = useState<TokenUsagePoint[]>([]);
+
+    useEffect(() => {
+        if (!isOpen) return;
+        let cancelled = false;
+        api.getSessionTokenUsage(session.id)
+            .then((series: TokenUsageSeries) => {
+                if (!cancelled) setUsage(series.points || []);
+            })
+            .catch((e) => console.error("Failed to load token usage", e));
+        return () => { cancelled = true; };
+    }, [isOpen, session.id]);
+
+    const chartData = useMemo(() => usage.map((p) => ({
+        name: `Turn ${p.seq + 1}`,
+        input: p.input || 0,
+        output: p.output || 0,
+        total: p.total || 0,
+        time: p.timestamp ? new Date(p.timestamp).toLocaleTimeString() : ''
+    })), [usage]);
 
     if (!isOpen) return null;
 
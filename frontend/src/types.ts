@@ -31,7 +31,6 @@ export interface Session {
     model_duration_seconds?: number;
     total_messages?: number;
     tool_stats?: string; // JSON string
-    token_usage_history?: string; // JSON string
     read_write_ratio?: number;
     nav_miss_rate?: number;
     avg_prompt_len?: number;
@@ -43,10 +42,58 @@ export interface Message {
     role: "user" | "assistant" | "system" | "tool";
     content: string;
     timestamp: string;
+    truncated?: boolean; // lightweight mode: long bodies were cut
+    content_url?: string; // fetches the full message when truncated
 }
 
-export interface SearchResult extends Message {
+export interface MessagePage {
+    messages: Message[];
+    next_cursor: string | null;
+}
+
+export interface TokenUsagePoint {
+    seq: number; // index of the usage point within the session
+    timestamp: string | null;
+    input: number; // cumulative
+    output: number;
+    total: number;
+    cache_creation: number;
+    cache_read: number;
+}
+
+export interface TokenUsageSeries {
+    points: TokenUsagePoint[]; // downsampled server-side
+    total_points: number;
+}
+
+export interface SearchResult {
+    id: number;
+    session_id: string;
     project_name: string;
+    role: Message["role"];
+    timestamp: string;
+    model: string | null;
+    score: number;
+    snippet: string; // HTML-escaped text with <mark> highlights
+}
+
+export interface SearchResponse {
+    results: SearchResult[];
+    next_cursor: string | null;
+}
+
+export interface ScanProgress {
+    total: number;
+    completed: number;
+    skipped: number;
+    unchanged: number;
+    failed: number;
+    write_errors: number;  // failed database writes (sessions or manifest)
+    percent: number;
+    is_scanning: boolean;
+    recent_ready: boolean;
+    recent_ready_seconds: number | null;
+    elapsed_seconds: number;
 }
 
 export interface AnalyticsData {
@@ -82,11 +129,75 @@ export interface ProjectDetails {
 }
 
 export interface FileChange {
+    id: number;
     tool: string;
     type: string; // 'write' | 'edit'
     path: string;
     timestamp: string;
-    content?: string;
-    target_content?: string;
-    diff?: string;
+    size: number;     // bytes of new content
+    added: number;    // lines added
+    removed: number;  // lines removed
+}
+
+// Contents and diff of one FileChange, fetched when it is opened
+export interface FileChangeDiff {
+    id: number;
+    path: string;
+    content: string | null;
+    target_content: string | null;
+    diff: string;
+}
+
+export interface OneShotFileContents {
+    path: string;
+    session_content: string;
+    current_content: string | null; // null when the file was deleted
+}
+
+// What One-Shot stats score against: the working tree, HEAD, or the first
+// commit made after the session ended
+export type OneShotSource = 'worktree' | 'head' | 'session_end';
+
+export interface SurvivalHistoryPoint {
+    commit: string;
+    commit_time: string;
+    overall_score: number;
+    file_count: number;
+}
+
+export interface SurvivalHistory {
+    session_end: string | null;
+    head: string;
+    total_commits: number;  // commits since the session ended, before sampling
+    points: SurvivalHistoryPoint[];
+    error?: string;
+}
+
+export interface SurvivalTotals {
+    overall_score: number;  // mean of the file scores, in percent
+    total_lines: number;
+    retained_lines: number;
+}
+
+export interface SessionSurvival extends SurvivalTotals {
+    session_id: string;
+    start_time: string | null;
+    file_count: number;
+}
+
+export interface FileSurvival extends SurvivalTotals {
+    path: string;
+    session_count: number;
+    deleted: boolean;
+}
+
+export interface ProjectSurvival extends SurvivalTotals {
+    project_name: string;
+    session_count: number;
+    file_count: number;
+    scored: number;  // writes scored by this request
+    cached: number;  // writes served from the survival cache
+    sessions: SessionSurvival[];
+    files: FileSurvival[];
+    error?: string;
 }
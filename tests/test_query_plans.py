@@ -0,0 +1,180 @@
+"""
+The hot Storage/Analytics queries must not full-scan large tables.
+
+Builds a database with synthetic sessions (running every migration), runs the
+read and write paths the API uses while tracing every statement, then checks
+the EXPLAIN QUERY PLAN of each one: no scan of messages, message_blocks or
+tool_calls without a covering index, no scan of messages_fts without a
+constraint, and no scan of sessions for a keyed lookup.
+"""
+import re
+import sqlite3
+
+import pytest
+
+from claude_viewer.analytics import Analytics
+from claude_viewer.storage import Storage
+
+# Tables that grow with the size of the logs and must always be reached through an index
+UNBOUNDED_TABLES = {"messages", "message_blocks", "messages_fts", "tool_calls", "token_usage", "survival_cache"}
+# Tables that may be aggregated in full but must be searched by index when filtered by equality
+KEYED_TABLES = {"sessions"}
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+_KEYWORDS = {"where", "join", "left", "inner", "on", "group", "order", "limit", "set", "using", "values"}
+
+SESSIONS = 100
+MESSAGES = 30
+
+
+def build_fixture(storage: Storage, sessions: int, messages: int):
+    batch = []
+    for s in range(sessions):
+        session_id = f"session-{s:04d}"
+        msgs = []
+        history = []
+        for m in range(messages):
+            ts = f"2026-01-{1 + s % 28:02d}T{m % 24:02d}:{m % 60:02d}:00"
+            if m % 2:
+                blocks = [
+                    ("text", None, None, None, f"editing file {m}"),
+                    ("tool_use", "Edit", f"toolu_{s}_{m}", '{"file_path":"/tmp/x.py","old_string":"a","new_string":"b"}', None),
+                ]
+                msgs.append({"role": "assistant", "timestamp": ts, "blocks": blocks})
+                history.append({"timestamp": ts, "input": 10 * m, "output": m, "total": 11 * m})
+            else:
+                msgs.append({"role": "user", "timestamp": ts, "blocks": [("text", None, None, None, f"prompt {m}")]})
+        info = {"session_id": session_id, "file_path": f"/logs/proj-{s % 5}/{session_id}.jsonl"}
+        batch.append((f"proj-{s % 5}", info, msgs, {"model": "model-a", "total_tokens": 10, "token_usage_history": history}, f"/nonexistent/proj-{s % 5}"))
+    storage.save_sessions_batch(batch)
+    storage.tag_session("session-0000", "review")
+
+
+def exercise(storage: Storage, analytics: Analytics):
+    storage.get_projects()
+    storage.get_sessions("proj-1")
+    storage.get_messages("session-0001")
+    for direction in ("asc", "desc"):
+        page = storage.get_messages_page("session-0001", limit=10, direction=direction, max_bytes=64)
+        storage.get_messages_page("session-0001", limit=10, cursor=page["next_cursor"], direction=direction)
+    storage.get_message(page["messages"][0]["id"])
+    storage.search_messages("editing")
+    storage.get_all_tags()
+    storage.get_manifest()
+    analytics.get_stats()
+    analytics.get_project_details("proj-1")
+    changes = analytics.get_session_changes("session-0001")
+    analytics.get_change_diff("session-0001", changes[0]["id"])
+    analytics.get_session_token_usage("session-0001", points=10)
+    analytics.calculate_oneshot_stats("session-0001")
+    storage.writer.flush()
+    analytics.calculate_oneshot_stats("session-0001")
+    analytics.get_oneshot_file("session-0001", "/tmp/x.py")
+    analytics.calculate_project_survival("proj-1")
+    analytics.get_token_timeline(start="2026-01-02", end="2026-01-03", points=10, project_name="proj-1")
+
+    info = {"session_id": "session-0002", "file_path": "/logs/proj-2/session-0002.jsonl"}
+    msg = {"role": "user", "timestamp": "2026-02-01T00:00:00", "blocks": [("text", None, None, None, "again")]}
+    storage.save_session("proj-2", info, [msg], {})
+    storage.append_session_messages("proj-2", info, [msg], {})
+    storage.delete_sessions(["session-0003"])
+
+
+def violations(sql: str, plan):
+    """Plan steps of a statement that scan a table they should reach through an index."""
+    aliases = {}
+    for table, alias in _TABLE_REF.findall(sql):
+        aliases[table.lower()] = table.lower()
+        if alias and alias.lower() not in _KEYWORDS:
+            aliases[alias.lower()] = table.lower()
+    where = re.search(r"\bWHERE\b(.*)", sql, re.IGNORECASE | re.DOTALL)
+    where = where.group(1) if where else ""
+
+    def keyed(name):
+        # Equality/IN predicate on a column of this table (qualified, or unqualified in a single-table statement)
+        qualifier = rf"\b{name}\." if len(aliases) > 1 else r"\b"
+        return re.search(rf"{qualifier}\w+\s*(=|IN\b)", where, re.IGNORECASE) is not None
+
+    found = []
+    for row in plan:
+        detail = row[3]
+        match = re.match(r"SCAN (\w+)", detail)
+        if not match or "COVERING INDEX" in detail:
+            continue
+        name = match.group(1).lower()
+        table = aliases.get(name, name)
+        if "VIRTUAL TABLE" in detail:
+            # Full-text tables: "INDEX 0:" with nothing after the colon means no MATCH/rowid constraint
+            if table in UNBOUNDED_TABLES and detail.endswith(":"):
+                found.append(detail)
+            continue
+        if table in UNBOUNDED_TABLES or (table in KEYED_TABLES and keyed(name)):
+            found.append(detail)
+    return found
+
+
+@pytest.fixture(scope="module")
+def traced_statements(tmp_path_factory):
+    """Database path and every distinct data statement the exercised API paths ran."""
+    db_path = tmp_path_factory.mktemp("plans") / "plans.db"
+    storage = Storage(db_path)
+    build_fixture(storage, SESSIONS, MESSAGES)
+    storage.close()
+    conn = sqlite3.connect(db_path)
+    conn.execute("ANALYZE")
+    conn.close()
+
+    statements = []
+    connect = sqlite3.connect
+
+    def connect_traced(*args, **kwargs):
+        conn = connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(sqlite3, "connect", connect_traced)
+        # A fresh instance so its reader and writer connections are opened (and traced) here
+        storage = Storage(db_path)
+        try:
+            exercise(storage, Analytics(db_path, storage=storage))
+        finally:
+            storage.close()
+
+    distinct = []
+    for sql in statements:
+        sql = sql.strip()
+        if sql not in distinct and re.match(r"(SELECT|INSERT|UPDATE|DELETE)\b", sql, re.IGNORECASE):
+            distinct.append(sql)
+    return db_path, distinct
+
+
+def test_hot_statements_use_indexes(traced_statements):
+    db_path, statements = traced_statements
+    assert len(statements) > 50
+    conn = sqlite3.connect(db_path)
+    try:
+        failures = []
+        for sql in statements:
+            plan = conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+            bad = violations(sql, plan)
+            if bad:
+                failures.append(f"{' '.join(sql.split())[:160]}\n    " + "\n    ".join(bad))
+    finally:
+        conn.close()
+    assert not failures, "statements scanning tables:\n" + "\n".join(failures)
+
+
+def test_violations_flag_table_scans(traced_statements):
+    db_path, _ = traced_statements
+    conn = sqlite3.connect(db_path)
+    try:
+        def check(sql):
+            return violations(sql, conn.execute(f"EXPLAIN QUERY PLAN {sql}").fetchall())
+
+        assert check("SELECT id FROM messages WHERE content LIKE '%x%'")
+        assert check("SELECT * FROM sessions WHERE model = 'model-a'")
+        assert not check("SELECT * FROM messages WHERE session_id = 'session-0001'")
+        assert not check("SELECT COUNT(*) FROM sessions")
+    finally:
+        conn.close()
@@ -0,0 +1,38 @@
+import sqlite3
+import threading
+
+import pytest
+
+from claude_viewer.storage import Storage
+
+
+def _read_in_thread(storage: Storage) -> sqlite3.Connection:
+    readers = []
+    thread = threading.Thread(target=lambda: readers.append(storage.reader()))
+    thread.start()
+    thread.join()
+    return readers[0]
+
+
+def test_readers_of_finished_threads_are_closed(tmp_path):
+    storage = Storage(tmp_path / "test.db")
+    try:
+        finished = _read_in_thread(storage)
+        # Opening the next reader releases the one whose thread has ended
+        _read_in_thread(storage)
+        with pytest.raises(sqlite3.ProgrammingError):
+            finished.execute("SELECT 1")
+        assert len(storage._readers) == 1
+    finally:
+        storage.close()
+
+
+def test_close_closes_readers(tmp_path):
+    storage = Storage(tmp_path / "test.db")
+    conn = storage.reader()
+    conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+    storage.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute("SELECT 1")
+    with pytest.raises(RuntimeError):
+        storage.writer.submit(lambda c: None)
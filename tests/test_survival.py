@@ -0,0 +1,45 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from claude_viewer.survival import retained_lines, survival, survival_against_file
+
+CORPUS = json.loads((Path(__file__).parent / "fixtures" / "survival_corpus.json").read_text(encoding="utf-8"))
+
+
+def _case_lines(case):
+    """(session_lines, current_lines) of a corpus case."""
+    base = CORPUS["bases"][case["base"]]
+    session = base[case["session"][0]:case["session"][1]] if case["session"] else base
+    current = [base[line] if isinstance(line, int) else line for line in case["current"]]
+    return session, current
+
+
+@pytest.mark.parametrize("case", CORPUS["cases"], ids=[case["name"] for case in CORPUS["cases"]])
+def test_retained_lines_matches_stored_scores(case):
+    session, current = _case_lines(case)
+    assert len(session) == case["total"]
+    assert retained_lines(session, current) == case["retained"]
+
+
+@pytest.mark.parametrize("base", sorted(CORPUS["bases"]))
+def test_survival_against_file_matches_per_write_scores(tmp_path, base):
+    cases = [case for case in CORPUS["cases"] if case["base"] == base]
+    # One current file against every write of the base, as the project survival job scores it
+    for case in cases:
+        session, current = _case_lines(case)
+        path = tmp_path / "current.txt"
+        path.write_text("\n".join(current), encoding="utf-8")
+        others = [_case_lines(other)[0] for other in cases]
+        results = survival_against_file(str(path), ["\n".join(lines) for lines in others])
+        assert results == [survival("\n".join(lines), "\n".join(current)) for lines in others]
+
+
+def test_unchanged_content_is_fully_retained():
+    lines = CORPUS["bases"]["generated"]
+    assert retained_lines(lines, list(lines)) == len(lines)
+
+
+def test_survival_against_missing_file(tmp_path):
+    assert survival_against_file(str(tmp_path / "missing.py"), ["a\nb"]) is None